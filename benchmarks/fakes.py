@@ -0,0 +1,264 @@
+"""Deterministic local stand-ins for the OpenAI and Firecrawl clients.
+
+Both fakes answer from a seeded random generator, so the same configuration always produces
+the same research tree, while letting benchmarks dial in latency, failures, 429s and page sizes.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+import openai
+import tiktoken
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+WORDS = (
+    "market adoption latency throughput regulation battery solar grid storage policy model "
+    "inference training dataset benchmark supply chain semiconductor fabrication yield cost "
+    "revenue margin forecast survey patent licensing standard protocol security privacy audit "
+    "emissions carbon efficiency capacity demand pricing competition startup investment"
+).split()
+
+
+@dataclass
+class FakeBehaviour:
+    """Knobs shared by the fake clients."""
+    latency: float = 0.05
+    latency_jitter: float = 0.5
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class CallStats:
+    calls: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    by_kind: Dict[str, int] = field(default_factory=dict)
+
+    def count(self, kind: str) -> None:
+        self.calls += 1
+        self.by_kind[kind] = self.by_kind.get(kind, 0) + 1
+
+
+def _rng(*parts: Any) -> random.Random:
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def _phrase(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+# Prompt prefix caching as OpenAI does it: prompts of at least CACHE_MIN_TOKENS are cached in
+# blocks of CACHE_BLOCK_TOKENS, and the blocks a later prompt starts with are served from cache
+CACHE_MIN_TOKENS = 1024
+CACHE_BLOCK_TOKENS = 128
+
+
+def _delay(behaviour: FakeBehaviour, rng: random.Random) -> float:
+    return max(0.0, behaviour.latency * (1 + behaviour.latency_jitter * (rng.random() * 2 - 1)))
+
+
+class _FakeCompletions:
+    def __init__(self, client: "FakeOpenAIClient"):
+        self._client = client
+
+    async def create(self, **kwargs: Any) -> Any:
+        return await self._client._create(**kwargs)
+
+
+class _FakeChat:
+    def __init__(self, client: "FakeOpenAIClient"):
+        self.completions = _FakeCompletions(client)
+
+
+class FakeOpenAIClient:
+    """Async stand-in for `openai.AsyncOpenAI` that recognizes this project's prompts."""
+
+    def __init__(self, behaviour: Optional[FakeBehaviour] = None, report_words: int = 1500):
+        self.behaviour = behaviour or FakeBehaviour()
+        self.report_words = report_words
+        self.stats = CallStats()
+        self.chat = _FakeChat(self)
+        self._faults = random.Random(self.behaviour.seed)
+        # Chained hashes of every cached prompt prefix, one per whole block
+        self._prefixes: set = set()
+
+    def _fault(self) -> None:
+        request = httpx.Request("POST", "http://fake-openai/v1/chat/completions")
+        roll = self._faults.random()
+        if roll < self.behaviour.rate_limit_rate:
+            self.stats.rate_limited += 1
+            raise openai.RateLimitError(
+                "Rate limit reached", response=httpx.Response(429, request=request), body=None
+            )
+        if roll < self.behaviour.rate_limit_rate + self.behaviour.error_rate:
+            self.stats.errors += 1
+            raise openai.InternalServerError(
+                "Server error", response=httpx.Response(500, request=request), body=None
+            )
+
+    def _cached_tokens(self, messages: List[Dict[str, str]]) -> int:
+        """Tokens at the start of the prompt that earlier prompts already sent; caches this one."""
+        text = "".join(f"{m.get('role')}:{m.get('content') or ''}" for m in messages)
+        block = CACHE_BLOCK_TOKENS * 4
+        if len(text) < CACHE_MIN_TOKENS * 4:
+            return 0
+        cached = 0
+        digest = b""
+        for start in range(0, len(text) - block + 1, block):
+            chunk = text[start:start + block].encode("utf-8")
+            digest = hashlib.blake2b(digest + chunk, digest_size=16).digest()
+            if digest in self._prefixes:
+                cached = start + block
+            else:
+                self._prefixes.add(digest)
+        return cached // 4 if cached >= CACHE_MIN_TOKENS * 4 else 0
+
+    def _answer(self, prompt: str, num_default: int = 3) -> Dict[str, Any]:
+        rng = _rng("answer", prompt, self.behaviour.seed)
+        count = re.search(r"<(?:num_queries|num_learnings|max_learnings)>\s*(\d+)", prompt)
+        n = int(count.group(1)) if count else num_default
+
+        if "research directions" in prompt and "'results'" in prompt:
+            ids = re.findall(r'<direction id="([^"]+)">', prompt)
+            return {"results": [
+                {"id": direction_id, "queries": [
+                    {"query": _phrase(rng, 6), "research_goal": _phrase(rng, 12)} for _ in range(n)
+                ]} for direction_id in ids
+            ]}
+        if "SERP queries" in prompt:
+            return {"queries": [
+                {"query": _phrase(rng, 6), "research_goal": _phrase(rng, 12)} for _ in range(n)
+            ]}
+        if "'learnings'" in prompt:
+            follow_ups = re.search(r"<num_follow_up_questions>\s*(\d+)", prompt)
+            return {
+                "learnings": [_phrase(rng, 25) + "." for _ in range(n)],
+                "followUpQuestions": [
+                    _phrase(rng, 10) + "?"
+                    for _ in range(int(follow_ups.group(1)) if follow_ups else 3)
+                ],
+            }
+        if "final report" in prompt or "report" in prompt.lower():
+            return {"reportMarkdown": self._report(rng)}
+        return {"questions": [_phrase(rng, 10) + "?" for _ in range(3)]}
+
+    def _report(self, rng: random.Random) -> str:
+        sections = []
+        remaining = self.report_words
+        while remaining > 0:
+            words = min(remaining, 150)
+            sections.append(f"## {_phrase(rng, 3).title()}\n\n{_phrase(rng, words)}.")
+            remaining -= words
+        return "# Report\n\n" + "\n\n".join(sections)
+
+    async def _create(self, **kwargs: Any) -> Any:
+        self.stats.count("stream" if kwargs.get("stream") else "chat")
+        messages: List[Dict[str, str]] = kwargs.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+        await asyncio.sleep(_delay(self.behaviour, _rng("latency", prompt, self.stats.calls)))
+        self._fault()
+
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": 0, "total_tokens": 0,
+                 "prompt_tokens_details": {"cached_tokens": self._cached_tokens(messages)}}
+        if kwargs.get("response_format"):
+            content = json.dumps(self._answer(prompt))
+        else:
+            content = self._report(_rng("answer", prompt, self.behaviour.seed))
+        usage["completion_tokens"] = len(content) // 4
+        usage["total_tokens"] = prompt_tokens + usage["completion_tokens"]
+
+        if kwargs.get("stream"):
+            return self._stream(content, usage)
+        return ChatCompletion.model_validate({
+            "id": "fake", "object": "chat.completion", "created": 0, "model": kwargs.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        })
+
+    async def _stream(self, content: str, usage: Dict[str, Any]):
+        base = {"id": "fake", "object": "chat.completion.chunk", "created": 0, "model": "fake"}
+        for start in range(0, len(content), 64):
+            await asyncio.sleep(0)
+            yield ChatCompletionChunk.model_validate({
+                **base, "choices": [{"index": 0, "delta": {"content": content[start:start + 64]}}],
+            })
+        yield ChatCompletionChunk.model_validate({
+            **base, "choices": [], "usage": usage,
+        })
+
+
+class FakeFirecrawlApp:
+    """Synchronous stand-in for `FirecrawlApp.search` returning generated markdown pages."""
+
+    def __init__(self, behaviour: Optional[FakeBehaviour] = None, page_kb: int = 40,
+                 results: int = 5, url_pool: int = 200):
+        self.behaviour = behaviour or FakeBehaviour(latency=0.2)
+        self.page_kb = page_kb
+        self.results = results
+        # Results are drawn from a finite pool of URLs so that branches overlap like real searches
+        self.url_pool = url_pool
+        self.stats = CallStats()
+        self._faults = random.Random(self.behaviour.seed + 1)
+        self._lock = threading.Lock()
+
+    def _page(self, url: str) -> str:
+        rng = _rng("page", url, self.behaviour.seed)
+        parts = [
+            "[Home](/) | [About](/about) | [Blog](/blog) | [Contact](/contact)",
+            "We use cookies to improve your experience. Accept all cookies.",
+        ]
+        size = 0
+        while size < self.page_kb * 1024:
+            paragraph = _phrase(rng, rng.randint(40, 120)) + "."
+            if rng.random() < 0.1:
+                paragraph = "\n".join(
+                    f"- [{_phrase(rng, 3)}](https://example.com/{rng.randint(0, 999)})" for _ in range(8)
+                )
+            parts.append(paragraph)
+            size += len(paragraph) + 2
+        parts.append("© 2025 Example Corp. All rights reserved. Privacy Policy | Terms of Service")
+        return "\n\n".join(parts)
+
+    def search(self, query: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self._lock:
+            self.stats.count("search")
+            roll = self._faults.random()
+        rng = _rng("search", query, self.behaviour.seed)
+        time.sleep(_delay(self.behaviour, rng))
+        if roll < self.behaviour.rate_limit_rate:
+            with self._lock:
+                self.stats.rate_limited += 1
+            raise Exception("Unexpected error during search: Status code 429. Rate limit exceeded")
+        if roll < self.behaviour.rate_limit_rate + self.behaviour.error_rate:
+            with self._lock:
+                self.stats.errors += 1
+            raise Exception("Unexpected error during search: Status code 500. Internal error")
+
+        limit = (params or {}).get("limit", self.results)
+        urls = [f"https://site{rng.randrange(self.url_pool)}.example.com/article" for _ in range(limit)]
+        return {"success": True, "data": [
+            {"url": url, "title": _phrase(_rng("title", url), 5), "markdown": self._page(url)}
+            for url in urls
+        ]}
+
+
+def byte_encoding() -> tiktoken.Encoding:
+    """Stand-in for the tiktoken encoding with one token per byte; needs no download."""
+    return tiktoken.Encoding(
+        name="bytes",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
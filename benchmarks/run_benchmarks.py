@@ -0,0 +1,212 @@
+"""Offline end-to-end benchmarks of the research pipeline.
+
+Runs `deep_research()` (or the breadth-first or pipelined engine) and the final report against
+the local fakes in `benchmarks.fakes` for a grid of breadth/depth settings and reports wall
+time, CPU time, peak memory, call counts and the summed duration of page preparation.
+
+    python -m benchmarks.run_benchmarks --grid 2x1 --grid 4x2 --engine dfs --engine bfs
+"""
+import asyncio
+import json
+import os
+import resource
+import time
+import tracemalloc
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.fakes import FakeBehaviour, FakeFirecrawlApp, FakeOpenAIClient, byte_encoding
+from deep_research_py import deep_research as research_module
+from deep_research_py.engines import ENGINES
+from deep_research_py.dedup import ResearchRegistry
+from deep_research_py.runtime import Runtime, get_runtime, set_runtime
+from deep_research_py.scheduler import reset_schedulers
+from deep_research_py.tracing import get_tracer, reset_tracer
+
+if TYPE_CHECKING:
+    import tiktoken
+
+app = typer.Typer()
+console = Console()
+
+# Spans whose durations are summed into prepare_span_s. They overlap when several pages are
+# prepared at once, so the sum is busy time across workers and can exceed the wall time.
+PREPARE_STAGES = ("prepare_pages",)
+
+
+def _children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def run_case(
+    breadth: int,
+    depth: int,
+    engine: str,
+    openai_behaviour: FakeBehaviour,
+    firecrawl_behaviour: FakeBehaviour,
+    page_kb: int,
+    encoder: Optional["tiktoken.Encoding"] = None,
+) -> Dict[str, Any]:
+    """Runs one research + report cycle against fresh fakes and returns its measurements.
+
+    Tokens are counted one per byte unless a real `encoder` is given, so nothing is downloaded.
+    The case is marked failed (`ok` false) when research raised or found no learnings.
+    """
+    openai_client = FakeOpenAIClient(openai_behaviour)
+    firecrawl_app = FakeFirecrawlApp(firecrawl_behaviour, page_kb=page_kb)
+    get_runtime().close_page_executor()
+    set_runtime(Runtime(openai_client=openai_client, firecrawl_app=firecrawl_app,
+                        encoder=encoder or byte_encoding()))
+    reset_schedulers()
+    reset_tracer()
+
+    research = ENGINES[engine]
+
+    tracemalloc.start()
+    cpu_start = time.process_time()
+    children_cpu_start = _children_cpu()
+    wall_start = time.perf_counter()
+
+    registry = ResearchRegistry()
+    error = None
+    try:
+        results = await research(query="offline benchmark topic", breadth=breadth, depth=depth,
+                                 registry=registry)
+    except Exception as e:
+        # A failure before the first node (e.g. planning the queries) aborts the whole engine
+        error = f"{type(e).__name__}: {e}"
+        results = {"learnings": [], "visited_urls": []}
+    research_done = time.perf_counter()
+    report = await research_module.write_final_report(
+        prompt="offline benchmark topic",
+        learnings=results["learnings"],
+        visited_urls=results["visited_urls"],
+        store=registry.learnings,
+    )
+
+    wall = time.perf_counter() - wall_start
+    # Worker processes only show up in the children's usage once they have exited
+    get_runtime().close_page_executor(wait=True)
+    cpu = time.process_time() - cpu_start + _children_cpu() - children_cpu_start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stages = {stage["name"]: stage for stage in get_tracer().summary()}
+    openai_spans = [span for span in get_tracer().spans if span.category == "openai"]
+    # Engines log and skip failed nodes, so look for them in the spans
+    failed_nodes = {span.node for span in get_tracer().spans
+                    if span.error is not None and span.node is not None}
+    return {
+        "ok": error is None and bool(results["learnings"]),
+        "error": error,
+        "engine": engine,
+        "breadth": breadth,
+        "depth": depth,
+        "wall_s": round(wall, 3),
+        "research_s": round(research_done - wall_start, 3),
+        "cpu_s": round(cpu, 3),
+        "prepare_span_s": round(sum(stages[name]["total_time"] for name in PREPARE_STAGES if name in stages), 3),
+        "peak_mb": round(peak / 1024 / 1024, 1),
+        "tokens_saved": sum(span.attrs.get("tokens_saved", 0) for span in get_tracer().spans
+                            if span.name == "prepare_pages"),
+        "prompt_tokens": sum(span.prompt_tokens for span in openai_spans),
+        "cached_tokens": sum(span.cached_tokens for span in openai_spans),
+        "openai_calls": openai_client.stats.calls,
+        "openai_429": openai_client.stats.rate_limited,
+        "openai_errors": openai_client.stats.errors,
+        "search_calls": firecrawl_app.stats.calls,
+        "search_429": firecrawl_app.stats.rate_limited,
+        "search_errors": firecrawl_app.stats.errors,
+        "failed_nodes": len(failed_nodes),
+        "learnings": len(results["learnings"]),
+        "urls": len(results["visited_urls"]),
+        "report_chars": len(report),
+    }
+
+
+def _parse_grid(grid: List[str]) -> List[tuple]:
+    cases = []
+    for item in grid:
+        breadth, _, depth = item.partition("x")
+        cases.append((int(breadth), int(depth)))
+    return cases
+
+
+@app.command()
+def main(
+    grid: List[str] = typer.Option(["2x1", "4x2", "6x2"], help="breadth x depth, repeatable"),
+    engine: List[str] = typer.Option(["dfs"], help="dfs, bfs, pipeline or frontier, repeatable"),
+    llm_latency: float = typer.Option(0.2, help="Mean fake LLM latency in seconds"),
+    search_latency: float = typer.Option(0.3, help="Mean fake search latency in seconds"),
+    error_rate: float = typer.Option(0.0, help="Fraction of calls failing with a 500"),
+    rate_limit_rate: float = typer.Option(0.0, help="Fraction of calls failing with a 429"),
+    page_kb: int = typer.Option(40, help="Size of each fake scraped page"),
+    openai_rpm: float = typer.Option(10_000, help="OPENAI_RPM for the scheduler"),
+    firecrawl_rpm: float = typer.Option(10_000, help="FIRECRAWL_RPM for the scheduler"),
+    seed: int = typer.Option(0, help="Seed for generated content and faults"),
+    page_executor: str = typer.Option(
+        "thread",
+        help="Where pages are prepared: thread or inline keep the work visible to the peak "
+             "memory measurement; process only adds the workers' CPU time",
+    ),
+    real_encoder: bool = typer.Option(
+        False, "--real-encoder",
+        help="Count tokens with tiktoken's cl100k_base (downloaded on first use) instead of one "
+             "token per byte",
+    ),
+    output: Optional[str] = typer.Option(None, help="Write the results as JSON to this path"),
+):
+    """Benchmark the research pipeline offline against deterministic fakes."""
+    # Responses must come from the fakes, never from a cache or index filled by an earlier run
+    os.environ["DEEP_RESEARCH_CACHE"] = "0"
+    os.environ["DEEP_RESEARCH_KNOWLEDGE"] = "0"
+    os.environ["OPENAI_RPM"] = str(openai_rpm)
+    os.environ["FIRECRAWL_RPM"] = str(firecrawl_rpm)
+    os.environ.setdefault("OPENAI_TPM", "100000000")
+    os.environ["DEEP_RESEARCH_PAGE_EXECUTOR"] = page_executor
+    encoder = get_runtime().get_encoder() if real_encoder else None
+
+    results = []
+    for engine_name in engine:
+        for breadth, depth in _parse_grid(grid):
+            result = asyncio.run(run_case(
+                breadth,
+                depth,
+                engine_name,
+                FakeBehaviour(latency=llm_latency, error_rate=error_rate,
+                              rate_limit_rate=rate_limit_rate, seed=seed),
+                FakeBehaviour(latency=search_latency, error_rate=error_rate,
+                              rate_limit_rate=rate_limit_rate, seed=seed),
+                page_kb,
+                encoder,
+            ))
+            results.append(result)
+            status = "" if result["ok"] else f" [red]failed: {result['error'] or 'no learnings'}[/red]"
+            console.print(f"[dim]{engine_name} {breadth}x{depth}: {result['wall_s']}s[/dim]{status}")
+
+    table = Table(title="Offline Benchmark")
+    columns = ["engine", "breadth", "depth", "wall_s", "research_s", "cpu_s", "prepare_span_s",
+               "peak_mb", "tokens_saved", "cached_tokens", "openai_calls", "search_calls", "openai_429", "search_429", "failed_nodes", "learnings"]
+    for column in columns:
+        table.add_column(column, justify="left" if column == "engine" else "right")
+    for result in results:
+        table.add_row(*[str(result[column]) for column in columns])
+    console.print(table)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        console.print(f"[dim]Results have been saved to {output}[/dim]")
+
+    failed = sum(not result["ok"] for result in results)
+    if failed:
+        console.print(f"[red]{failed} of {len(results)} cases failed or found no learnings[/red]")
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,67 @@
+import pytest
+
+from deep_research_py.runtime import Runtime, get_runtime, set_runtime
+from deep_research_py.scheduler import reset_schedulers
+
+from .fakes import FakeBehaviour, FakeFirecrawlApp, FakeOpenAIClient
+from .run_benchmarks import _parse_grid, run_case
+
+
+@pytest.fixture
+def offline(monkeypatch):
+    for name, value in {"DEEP_RESEARCH_CACHE": "0", "DEEP_RESEARCH_KNOWLEDGE": "0",
+                        "DEEP_RESEARCH_PAGE_EXECUTOR": "inline", "OPENAI_RPM": "100000",
+                        "OPENAI_TPM": "100000000", "FIRECRAWL_RPM": "100000"}.items():
+        monkeypatch.setenv(name, value)
+    previous = get_runtime()
+    set_runtime(Runtime())
+    yield
+    get_runtime().close_page_executor()
+    set_runtime(previous)
+    reset_schedulers()
+
+
+async def test_fakes_answer_the_same_prompt_the_same_way():
+    answers = []
+    for _ in range(2):
+        client = FakeOpenAIClient(FakeBehaviour(latency=0))
+        prompt = "Generate a list of SERP queries.\n\n<num_queries>\n2\n</num_queries>"
+        response = await client.chat.completions.create(
+            model="fake", messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+        )
+        answers.append(response.choices[0].message.content)
+    assert answers[0] == answers[1]
+
+    app = FakeFirecrawlApp(FakeBehaviour(latency=0), page_kb=1)
+    assert app.search("solar") == app.search("solar")
+
+
+async def test_injected_faults_are_counted():
+    client = FakeOpenAIClient(FakeBehaviour(latency=0, error_rate=1.0))
+    with pytest.raises(Exception):
+        await client.chat.completions.create(model="fake", messages=[{"role": "user", "content": "x"}])
+    assert client.stats.errors == 1
+
+
+@pytest.mark.parametrize("engine", ["dfs", "frontier"])
+async def test_run_case_measures_a_full_cycle(offline, engine):
+    result = await run_case(2, 2, engine, FakeBehaviour(latency=0.01), FakeBehaviour(latency=0.01),
+                            page_kb=2)
+    assert result["ok"] and result["engine"] == engine
+    assert result["openai_calls"] > 0 and result["search_calls"] > 0
+    assert result["learnings"] > 0 and result["report_chars"] > 0
+    assert result["openai_errors"] == result["search_errors"] == result["failed_nodes"] == 0
+    assert result["wall_s"] >= result["research_s"] > 0
+
+
+async def test_run_case_fails_when_every_search_errors(offline, monkeypatch):
+    monkeypatch.setenv("FIRECRAWL_MAX_RETRIES", "0")
+    result = await run_case(2, 1, "dfs", FakeBehaviour(latency=0),
+                            FakeBehaviour(latency=0, error_rate=1.0), page_kb=1)
+    assert not result["ok"]
+    assert result["search_errors"] > 0
+
+
+def test_parse_grid():
+    assert _parse_grid(["2x1", "4x2"]) == [(2, 1), (4, 2)]
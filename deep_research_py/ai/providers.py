@@ -1,58 +1,215 @@
+import asyncio
 import os
-import tiktoken
-from typing import Optional
-from .text_splitter import RecursiveCharacterTextSplitter
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional
+from ..scheduler import get_scheduler
+from ..cache import ResponseCache, get_cache
+from ..runtime import get_runtime
+from ..tracing import Span, trace_span
 
-# Assuming we're using OpenAI's API
-import openai
+if TYPE_CHECKING:
+    import openai
+    import tiktoken
 
-def create_openai_client(api_key: str, base_url: Optional[str] = None) -> openai.OpenAI:
-    return openai.OpenAI(
-        api_key=api_key,
-        base_url=base_url or "https://api.openai.com/v1"
-    )
+def create_openai_client(
+    api_key: str,
+    base_url: Optional[str] = None,
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 30.0,
+) -> "openai.AsyncOpenAI":
+    """Creates an async OpenAI client backed by a single pooled HTTP connection set."""
+    import httpx
+    import openai
 
-# Initialize OpenAI client with better error handling
-try:
-    api_key = os.environ.get("OPENAI_API_KEY") or os.environ.get("OPENAI_KEY")
-    if not api_key:
-        raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
-        
-    openai_client = create_openai_client(
+    http_client = openai.DefaultAsyncHttpxClient(
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+    )
+    return openai.AsyncOpenAI(
         api_key=api_key,
-        base_url=os.environ.get("OPENAI_API_ENDPOINT")
+        base_url=base_url or "https://api.openai.com/v1",
+        http_client=http_client,
+        # Retries go through the scheduler so that 429s feed back into its concurrency limit
+        max_retries=0,
     )
-except Exception as e:
-    print(f"Error initializing OpenAI client: {e}")
-    raise
+
+def get_openai_client() -> "openai.AsyncOpenAI":
+    """Returns the runtime's async OpenAI client, creating it on first use."""
+    return get_runtime().get_openai_client()
+
+def get_encoder() -> "tiktoken.Encoding":
+    """Returns the runtime's tiktoken encoding, loading it on first use."""
+    return get_runtime().get_encoder()
+
+def count_tokens(text: str) -> int:
+    """Exact token count of a text with the runtime's encoding."""
+    return len(get_encoder().encode_ordinary(text))
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Cheap token estimate of a whole request for rate budgeting (about 4 characters per token).
+
+    Budgets on content (pages, learnings, report sections) use `count_tokens` instead.
+    """
+    return sum(len(message.get("content") or "") for message in messages) // 4
+
+def _record_usage(span: Span, usage: Any) -> None:
+    """Copies a completion's token usage, including prompt tokens served from the prefix cache."""
+    span.prompt_tokens = usage.prompt_tokens
+    span.completion_tokens = usage.completion_tokens
+    details = getattr(usage, "prompt_tokens_details", None)
+    span.cached_tokens = getattr(details, "cached_tokens", None) or 0
+
+async def create_chat_completion(**kwargs: Any) -> Any:
+    """Creates a chat completion through the response cache and the run-wide OpenAI scheduler."""
+    with trace_span("openai.chat", "openai", model=kwargs.get("model")) as span:
+        cache = get_cache()
+        key = None
+        if cache is not None:
+            key = ResponseCache.make_key("chat", {
+                "model": kwargs.get("model"),
+                "messages": kwargs.get("messages"),
+                "response_format": kwargs.get("response_format"),
+            })
+            cached = cache.get(key)
+            if cached is not None:
+                span.cache_hit = True
+                from openai.types.chat import ChatCompletion
+
+                return ChatCompletion.model_validate_json(cached)
+
+        response = await get_scheduler("openai").run(
+            lambda: get_openai_client().chat.completions.create(**kwargs),
+            cost=estimate_tokens(kwargs.get("messages", [])),
+            actual_cost=lambda response: response.usage.total_tokens if response.usage else None,
+            hedge=True,
+        )
+        if response.usage:
+            _record_usage(span, response.usage)
+
+        if key is not None and response.choices and response.choices[0].message.content:
+            cache.set(key, response.model_dump_json())
+        return response
+
+async def stream_chat_completion(**kwargs: Any) -> AsyncIterator[str]:
+    """Streams the text of a chat completion as it is generated.
+
+    Goes through the same cache and scheduler as `create_chat_completion`; a cache hit is
+    yielded as a single chunk.
+    """
+    with trace_span("openai.chat.stream", "openai", model=kwargs.get("model")) as span:
+        cache = get_cache()
+        key = None
+        if cache is not None:
+            key = ResponseCache.make_key("chat-stream", {
+                "model": kwargs.get("model"),
+                "messages": kwargs.get("messages"),
+            })
+            cached = cache.get(key)
+            if cached is not None:
+                span.cache_hit = True
+                yield cached
+                return
+
+        estimate = estimate_tokens(kwargs.get("messages", []))
+        scheduler = get_scheduler("openai")
+        # The concurrency slot is held until the stream has been read or closed
+        async with scheduler.stream(
+            lambda: get_openai_client().chat.completions.create(
+                stream=True,
+                stream_options={"include_usage": True},
+                **kwargs
+            ),
+            cost=estimate,
+        ) as stream:
+            # Only keep the full text around when it needs to be cached
+            parts: Optional[List[str]] = [] if key is not None else None
+            # A stream that stops sending chunks for a whole call timeout is treated as hung
+            idle_timeout = scheduler.limits.timeout or None
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), idle_timeout)
+                except StopAsyncIteration:
+                    break
+                if chunk.usage is not None:
+                    _record_usage(span, chunk.usage)
+                    if scheduler.tokens is not None:
+                        scheduler.tokens.adjust(chunk.usage.total_tokens - estimate)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    if parts is not None:
+                        parts.append(delta)
+                    yield delta
+
+        if parts:
+            cache.set(key, "".join(parts))
 
 MIN_CHUNK_SIZE = 140
-encoder = tiktoken.get_encoding('cl100k_base')  # Updated to use OpenAI's current encoding
 
-def trim_prompt(prompt: str, context_size: int = int(os.environ.get("CONTEXT_SIZE", "128000"))) -> str:
-    """Trims a prompt to fit within the specified context size."""
+DEFAULT_CONTEXT_SIZE = int(os.environ.get("CONTEXT_SIZE", "128000"))
+
+# Boundaries a trimmed prompt may end on, best first (same order as the text splitter)
+TRIM_SEPARATORS = ["\n\n", "\n", ".", ",", ">", "<", " "]
+
+# How far back from the token cut (as a fraction of the kept text) to look for a separator
+TRIM_SNAP_WINDOW = 0.1
+
+def _truncate_tokens(prompt: str, tokens: List[int], context_size: int) -> str:
+    """Cuts an already encoded prompt at `context_size` tokens, then snaps back to a separator."""
+    # Decoding the kept tokens gives the exact byte prefix; drop a trailing partial character
+    kept = get_encoder().decode_bytes(tokens[:context_size]).decode("utf-8", errors="ignore")
+    prefix = prompt[:len(kept)]
+
+    lower_bound = max(MIN_CHUNK_SIZE, int(len(prefix) * (1 - TRIM_SNAP_WINDOW)))
+    for separator in TRIM_SEPARATORS:
+        index = prefix.rfind(separator, lower_bound)
+        if index != -1:
+            return prefix[:index + len(separator)].rstrip()
+    return prefix
+
+def _fits(prompt: str, context_size: int) -> bool:
+    # A token is at least one byte and a character at most four, so short prompts skip encoding
+    return len(prompt) * 4 <= context_size
+
+def trim_prompt(prompt: str, context_size: int = DEFAULT_CONTEXT_SIZE) -> str:
+    """Trims a prompt to fit within the specified context size.
+
+    The prompt is encoded once and cut at the token limit, then moved back to the nearest
+    separator boundary so the kept text ends on a paragraph, line or sentence.
+    """
     if not prompt:
         return ""
-
-    length = len(encoder.encode(prompt))
-    if length <= context_size:
+    if _fits(prompt, context_size):
         return prompt
 
-    overflow_tokens = length - context_size
-    # Estimate characters to remove (3 chars per token on average)
-    chunk_size = len(prompt) - overflow_tokens * 3
-    if chunk_size < MIN_CHUNK_SIZE:
-        return prompt[:MIN_CHUNK_SIZE]
+    with trace_span("trim_prompt", "cpu") as span:
+        span.bytes = len(prompt)
+        tokens = get_encoder().encode_ordinary(prompt)
+        if len(tokens) <= context_size:
+            return prompt
+        return _truncate_tokens(prompt, tokens, context_size)
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=0
-    )
-    
-    trimmed_prompt = splitter.split_text(prompt)[0] if splitter.split_text(prompt) else ""
+def trim_prompts(prompts: List[str], context_size: int = DEFAULT_CONTEXT_SIZE) -> List[str]:
+    """Trims many prompts (e.g. every page of a search response) with one batched encode."""
+    to_encode = [i for i, prompt in enumerate(prompts) if prompt and not _fits(prompt, context_size)]
+    trimmed = [prompt or "" for prompt in prompts]
+    if not to_encode:
+        return trimmed
 
-    # Handle edge case where trimmed prompt is same length
-    if len(trimmed_prompt) == len(prompt):
-        return trim_prompt(prompt[:chunk_size], context_size)
+    with trace_span("trim_prompt", "cpu", prompts=len(to_encode)) as span:
+        span.bytes = sum(len(prompts[i]) for i in to_encode)
+        encoded = get_encoder().encode_ordinary_batch([prompts[i] for i in to_encode])
+        for i, tokens in zip(to_encode, encoded):
+            if len(tokens) > context_size:
+                trimmed[i] = _truncate_tokens(prompts[i], tokens, context_size)
+    return trimmed
 
-    return trim_prompt(trimmed_prompt, context_size) 
\ No newline at end of file
+def __getattr__(name: str) -> Any:
+    # `encoder` used to be created at import time; keep it reachable without the import cost
+    if name == "encoder":
+        return get_encoder()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,67 @@
+import pytest
+
+from ..scheduler import get_scheduler
+from ..tracing import get_tracer
+from .providers import stream_chat_completion, trim_prompt, trim_prompts
+
+PARAGRAPH = "Solar module prices fell by 40% in 2023, while grid connection queues kept growing."
+
+
+def _tokens(runtime, text: str) -> int:
+    return len(runtime.encoder.encode_ordinary(text))
+
+
+@pytest.mark.parametrize("context_size", [200, 1000, 5000])
+def test_trimmed_prompt_is_a_prefix_within_the_token_limit(fake_runtime, context_size):
+    prompt = "\n\n".join(f"{i}. {PARAGRAPH}" for i in range(200))
+    trimmed = trim_prompt(prompt, context_size)
+
+    assert prompt.startswith(trimmed)
+    assert _tokens(fake_runtime, trimmed) <= context_size
+    # Cut back to a separator, losing at most a tenth of what fits
+    assert trimmed[-1] in ".,<>" or prompt[len(trimmed)] in " \n"
+    assert len(trimmed) >= context_size * 0.9 - 1
+
+
+def test_prompts_that_fit_are_returned_unchanged(fake_runtime):
+    assert trim_prompt("", 10) == ""
+    assert trim_prompt(PARAGRAPH, 4 * len(PARAGRAPH)) == PARAGRAPH
+    # Over the quick character bound, but within the limit once counted
+    assert trim_prompt(PARAGRAPH, len(PARAGRAPH)) == PARAGRAPH
+
+
+def test_multibyte_text_is_not_cut_inside_a_character(fake_runtime):
+    prompt = "太阳能组件价格下降。" * 100
+    trimmed = trim_prompt(prompt, 301)
+
+    assert prompt.startswith(trimmed)
+    assert _tokens(fake_runtime, trimmed) <= 301
+    assert trimmed.endswith("。")
+
+
+def test_batch_trimming_matches_single_prompts(fake_runtime):
+    prompts = ["", PARAGRAPH, "\n\n".join([PARAGRAPH] * 50), "x" * 3000]
+    assert trim_prompts(prompts, 500) == [trim_prompt(prompt, 500) for prompt in prompts]
+
+
+async def test_streamed_completion_holds_its_slot_until_read(fake_runtime):
+    scheduler = get_scheduler("openai")
+    messages = [{"role": "user", "content": "Write the final report. " * 100}]
+    stream = stream_chat_completion(model="o3-mini", messages=messages)
+
+    first = await stream.__anext__()
+    assert first and scheduler.concurrency.in_flight == 1
+    rest = [chunk async for chunk in stream]
+    assert rest and scheduler.concurrency.in_flight == 0
+
+    span = get_tracer().spans[-1]
+    assert span.name == "openai.chat.stream"
+    assert span.prompt_tokens > 0 and span.completion_tokens > 0
+
+
+async def test_closing_a_stream_early_releases_its_slot(fake_runtime):
+    scheduler = get_scheduler("openai")
+    stream = stream_chat_completion(model="o3-mini", messages=[{"role": "user", "content": "report"}])
+    await stream.__anext__()
+    await stream.aclose()
+    assert scheduler.concurrency.in_flight == 0
@@ -1,102 +1,211 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict, Any
+from collections import deque
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional, Tuple
+
+Span = Tuple[int, int]
+
 
 class TextSplitter(ABC):
-    """Base text splitter class that handles splitting text into chunks."""
-    
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    """Base text splitter class that handles splitting text into chunks.
+
+    Chunks are produced as (start, end) offsets into the input text, so splitting never copies
+    the document; `split_text` and `iter_split_text` slice the text only for the chunks returned.
+    """
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 length_function: Callable[[str], int] = len):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        
+        self.length_function = length_function
+
         if self.chunk_overlap >= self.chunk_size:
             raise ValueError("Cannot have chunk_overlap >= chunk_size")
 
+    @classmethod
+    def from_tiktoken_encoder(cls, encoding_name: str = "cl100k_base", **kwargs: Any) -> "TextSplitter":
+        """Creates a splitter whose chunk_size and chunk_overlap are measured in tokens."""
+        import tiktoken
+
+        encoding = tiktoken.get_encoding(encoding_name)
+        return cls(length_function=lambda text: len(encoding.encode_ordinary(text)), **kwargs)
+
     @abstractmethod
+    def iter_split_spans(self, text: str) -> Iterator[Span]:
+        """Yields the (start, end) offsets of each chunk of `text`, in order."""
+
+    def split_spans(self, text: str) -> List[Span]:
+        return list(self.iter_split_spans(text))
+
+    def iter_split_text(self, text: str) -> Iterator[str]:
+        """Yields chunks one at a time, so large documents can be processed as a stream."""
+        for start, end in self.iter_split_spans(text):
+            yield text[start:end]
+
     def split_text(self, text: str) -> List[str]:
-        pass
+        return list(self.iter_split_text(text))
 
     def create_documents(self, texts: List[str]) -> List[str]:
         documents = []
         for text in texts:
-            for chunk in self.split_text(text):
+            for chunk in self.iter_split_text(text):
                 documents.append(chunk)
         return documents
 
     def split_documents(self, documents: List[str]) -> List[str]:
         return self.create_documents(documents)
 
-    def _join_docs(self, docs: List[str], separator: str) -> Optional[str]:
-        text = separator.join(docs).strip()
-        return text if text else None
+    def _length(self, text: str, start: int, end: int) -> int:
+        if self.length_function is len:
+            return end - start
+        return self.length_function(text[start:end])
 
-    def merge_splits(self, splits: List[str], separator: str) -> List[str]:
-        docs: List[str] = []
-        current_doc: List[str] = []
+    @staticmethod
+    def _strip_span(text: str, start: int, end: int) -> Optional[Span]:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return (start, end) if start < end else None
+
+    def _merge_spans(self, text: str, splits: Iterable[Tuple[int, int, int]],
+                     separator: str) -> Iterator[Span]:
+        """Greedily merges consecutive (start, end, length) splits into chunks of up to chunk_size.
+
+        Consecutive splits are separated by `separator` in `text`, so a merged chunk is simply
+        the span from its first split's start to its last split's end.
+        """
+        separator_len = self.length_function(separator) if separator else 0
+        current: Deque[Tuple[int, int, int]] = deque()
         total = 0
-        
-        for d in splits:
-            _len = len(d)
-            if total + _len >= self.chunk_size:
+
+        for start, end, length in splits:
+            joined = length + (separator_len if current else 0)
+            if total + joined > self.chunk_size:
                 if total > self.chunk_size:
                     print(f"Created a chunk of size {total}, which is longer than the specified {self.chunk_size}")
-                
-                if current_doc:
-                    doc = self._join_docs(current_doc, separator)
-                    if doc is not None:
-                        docs.append(doc)
-                    
-                    while (total > self.chunk_overlap or 
-                           (total + _len > self.chunk_size and total > 0)):
-                        total -= len(current_doc[0])
-                        current_doc.pop(0)
-            
-            current_doc.append(d)
-            total += _len
-        
-        doc = self._join_docs(current_doc, separator)
-        if doc is not None:
-            docs.append(doc)
-        return docs
+
+                if current:
+                    span = self._strip_span(text, current[0][0], current[-1][1])
+                    if span is not None:
+                        yield span
+
+                    # Keep a tail of the previous chunk as overlap for the next one
+                    while current and (
+                        total > self.chunk_overlap
+                        or total + length + (separator_len if current else 0) > self.chunk_size
+                    ):
+                        _, _, first_length = current.popleft()
+                        total -= first_length + (separator_len if current else 0)
+
+            current.append((start, end, length))
+            total += length + (separator_len if len(current) > 1 else 0)
+
+        if current:
+            span = self._strip_span(text, current[0][0], current[-1][1])
+            if span is not None:
+                yield span
+
+    def merge_splits(self, splits: List[str], separator: str) -> List[str]:
+        text = separator.join(splits)
+        spans = []
+        offset = 0
+        for split in splits:
+            spans.append((offset, offset + len(split), self.length_function(split)))
+            offset += len(split) + len(separator)
+        return [text[start:end] for start, end in self._merge_spans(text, spans, separator)]
+
 
 class RecursiveCharacterTextSplitter(TextSplitter):
     """Splits text recursively by different separators."""
-    
+
     def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
-                 separators: Optional[List[str]] = None):
-        super().__init__(chunk_size, chunk_overlap)
+                 separators: Optional[List[str]] = None,
+                 length_function: Callable[[str], int] = len):
+        super().__init__(chunk_size, chunk_overlap, length_function)
         self.separators = separators or ["\n\n", "\n", ".", ",", ">", "<", " ", ""]
 
-    def split_text(self, text: str) -> List[str]:
-        final_chunks: List[str] = []
-        
-        # Get appropriate separator to use
-        separator = self.separators[-1]
-        for s in self.separators:
+    def iter_split_spans(self, text: str) -> Iterator[Span]:
+        return self._split_spans(text, 0, len(text), self.separators)
+
+    def _split_spans(self, text: str, start: int, end: int, separators: List[str]) -> Iterator[Span]:
+        # Get appropriate separator to use; the remaining ones are for oversized pieces
+        separator = separators[-1]
+        remaining: List[str] = []
+        for i, s in enumerate(separators):
             if s == "":
                 separator = s
                 break
-            if s in text:
+            if text.find(s, start, end) != -1:
                 separator = s
+                remaining = separators[i + 1:]
                 break
 
-        # Split the text
-        splits = text.split(separator) if separator else list(text)
+        if separator == "":
+            yield from self._split_fixed(text, start, end)
+            return
+
+        # Walk the pieces between separators without materializing them
+        good_splits: List[Tuple[int, int, int]] = []
+        position = start
+        while True:
+            index = text.find(separator, position, end)
+            piece_end = end if index == -1 else index
+            length = self._length(text, position, piece_end)
 
-        # Merge splits recursively
-        good_splits: List[str] = []
-        for s in splits:
-            if len(s) < self.chunk_size:
-                good_splits.append(s)
+            if length < self.chunk_size:
+                good_splits.append((position, piece_end, length))
             else:
                 if good_splits:
-                    merged_text = self.merge_splits(good_splits, separator)
-                    final_chunks.extend(merged_text)
+                    yield from self._merge_spans(text, good_splits, separator)
                     good_splits = []
-                other_info = self.split_text(s)
-                final_chunks.extend(other_info)
-        
+                if remaining:
+                    yield from self._split_spans(text, position, piece_end, remaining)
+                else:
+                    span = self._strip_span(text, position, piece_end)
+                    if span is not None:
+                        yield span
+
+            if index == -1:
+                break
+            position = index + len(separator)
+
         if good_splits:
-            merged_text = self.merge_splits(good_splits, separator)
-            final_chunks.extend(merged_text)
-            
-        return final_chunks 
\ No newline at end of file
+            yield from self._merge_spans(text, good_splits, separator)
+
+    def _split_fixed(self, text: str, start: int, end: int) -> Iterator[Span]:
+        """Splits a run of text without separators into windows of chunk_size with overlap."""
+        if self.length_function is len:
+            step = self.chunk_size - self.chunk_overlap
+            position = start
+            while position < end:
+                chunk_end = min(position + self.chunk_size, end)
+                yield (position, chunk_end)
+                if chunk_end == end:
+                    break
+                position += step
+            return
+
+        position = start
+        while position < end:
+            chunk_end = self._longest_prefix_end(text, position, end, self.chunk_size)
+            yield (position, chunk_end)
+            if chunk_end == end:
+                break
+            # Start the next window so that it shares at most chunk_overlap with this one
+            next_position = chunk_end
+            while next_position > position + 1 and self._length(
+                text, next_position - 1, chunk_end
+            ) <= self.chunk_overlap:
+                next_position -= 1
+            position = max(next_position, position + 1)
+
+    def _longest_prefix_end(self, text: str, start: int, end: int, limit: int) -> int:
+        """Largest end offset such that text[start:end] is within `limit`, at least one character."""
+        low, high = start + 1, end
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._length(text, start, middle) <= limit:
+                low = middle
+            else:
+                high = middle - 1
+        return low
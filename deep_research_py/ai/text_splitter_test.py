@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from .text_splitter import RecursiveCharacterTextSplitter
+
+
+def _document(seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = ["solar", "wind", "grid", "storage", "price", "policy", "2024", "capacity"]
+    paragraphs = []
+    for _ in range(30):
+        sentences = [
+            " ".join(rng.choice(words) for _ in range(rng.randint(3, 25))) + "."
+            for _ in range(rng.randint(1, 6))
+        ]
+        paragraphs.append("\n".join(sentences) if rng.random() < 0.3 else " ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def _word_count(text: str) -> int:
+    return len(text.split())
+
+
+@pytest.mark.parametrize("chunk_size, chunk_overlap", [(50, 0), (100, 20), (400, 100), (1000, 200)])
+def test_chunks_respect_size_and_overlap(chunk_size, chunk_overlap):
+    text = _document(chunk_size)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    spans = splitter.split_spans(text)
+
+    assert spans
+    for start, end in spans:
+        assert 0 < end - start <= chunk_size
+        assert not text[start].isspace() and not text[end - 1].isspace()
+    for (_, previous_end), (start, _) in zip(spans, spans[1:]):
+        assert previous_end - start <= chunk_overlap
+    assert splitter.split_text(text) == [text[start:end] for start, end in spans]
+
+
+def test_chunks_cover_every_word():
+    text = _document(7)
+    covered = set()
+    for start, end in RecursiveCharacterTextSplitter(chunk_size=120, chunk_overlap=30).split_spans(text):
+        covered.update(range(start, end))
+    # Separators where a chunk ends are dropped, like in the original splitter; words never are
+    assert all(i in covered for i, char in enumerate(text) if char.isalnum())
+
+
+def test_text_without_separators_is_cut_into_overlapping_windows():
+    splitter = RecursiveCharacterTextSplitter(chunk_size=10, chunk_overlap=3)
+    assert splitter.split_spans("x" * 25) == [(0, 10), (7, 17), (14, 24), (21, 25)]
+
+
+def test_custom_length_function_limits_chunks():
+    text = _document(3)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=40, chunk_overlap=10, length_function=_word_count)
+    chunks = splitter.split_text(text)
+    assert chunks and all(_word_count(chunk) <= 40 for chunk in chunks)
+    assert sum(_word_count(chunk) for chunk in chunks) >= _word_count(text)
+
+
+def test_merge_splits_joins_small_pieces():
+    splitter = RecursiveCharacterTextSplitter(chunk_size=11, chunk_overlap=0)
+    assert splitter.merge_splits(["ab", "cd", "ef", "gh", "ij"], " ") == ["ab cd ef gh", "ij"]
+
+
+def test_overlap_must_be_smaller_than_the_chunk_size():
+    with pytest.raises(ValueError):
+        RecursiveCharacterTextSplitter(chunk_size=10, chunk_overlap=10)
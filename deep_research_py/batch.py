@@ -0,0 +1,204 @@
+import asyncio
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import aiofiles
+
+from .dedup import ResearchRegistry
+from .engines import ENGINES
+from .feedback import combine_query
+from .journal import DEFAULT_RUNS_DIR, RunJournal
+from .report import REPORT_MODE, write_report_stream
+
+DEFAULT_MAX_JOBS = int(os.environ.get("DEEP_RESEARCH_MAX_JOBS", "4"))
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+@dataclass
+class BatchJob:
+    """One research topic of a batch file.
+
+    `follow_ups` holds pre-answered follow-up questions as (question, answer) pairs; the
+    interactive clarification step is skipped for batch jobs.
+    """
+    id: str
+    query: str
+    breadth: int = 4
+    depth: int = 2
+    follow_ups: List[Tuple[str, str]] = field(default_factory=list)
+    # Seconds of research before the report is written from the learnings found so far
+    time_limit: Optional[float] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], default_id: str) -> "BatchJob":
+        follow_ups = data.get("follow_ups") or []
+        if isinstance(follow_ups, dict):
+            follow_ups = list(follow_ups.items())
+        else:
+            follow_ups = [
+                (item["question"], item.get("answer", "")) if isinstance(item, dict) else tuple(item)
+                for item in follow_ups
+            ]
+        return cls(
+            id=str(data.get("id") or default_id),
+            query=data["query"],
+            breadth=int(data.get("breadth", 4)),
+            depth=int(data.get("depth", 2)),
+            follow_ups=follow_ups,
+            time_limit=float(data["time_limit"]) if data.get("time_limit") else None,
+        )
+
+    @property
+    def combined_query(self) -> str:
+        if not self.follow_ups:
+            return self.query
+        questions, answers = zip(*self.follow_ups)
+        return combine_query(self.query, questions, answers)
+
+    def deadline(self) -> Optional[float]:
+        """`time.monotonic()` deadline of research starting now."""
+        return time.monotonic() + self.time_limit if self.time_limit else None
+
+    @property
+    def filename(self) -> str:
+        return re.sub(r"[^\w.-]+", "_", self.id) + ".md"
+
+
+def load_jobs(path: str) -> List[BatchJob]:
+    """Reads a JSONL file with one job per line: {"query", "breadth", "depth", "follow_ups", "id"}."""
+    jobs = []
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            jobs.append(BatchJob.from_dict(json.loads(line), default_id=f"job-{line_number}"))
+
+    ids = [job.id for job in jobs]
+    duplicates = sorted({job_id for job_id in ids if ids.count(job_id) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate job ids in {path}: {', '.join(duplicates)}")
+    return jobs
+
+
+def load_manifest(output_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Latest manifest entry per job id from a previous run into the same directory."""
+    entries: Dict[str, Dict[str, Any]] = {}
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return entries
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash
+                continue
+            entries[entry["id"]] = entry
+    return entries
+
+
+class BatchRunner:
+    """Runs many research jobs concurrently in one process.
+
+    All jobs share the process-wide schedulers, connection pool and response cache, so the
+    rate limits apply to the batch as a whole while the waits of different jobs overlap.
+    Each report is streamed to its own file and every finished job is appended to
+    `manifest.jsonl`. Re-running into the same directory skips finished jobs and resumes
+    failed ones from their run journal.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+        engine: str = "dfs",
+        runs_dir: str = DEFAULT_RUNS_DIR,
+        report_mode: str = REPORT_MODE,
+        on_event: Optional[Callable[[str, BatchJob, Dict[str, Any]], None]] = None,
+    ):
+        self.output_dir = output_dir
+        self.max_jobs = max_jobs
+        self.engine = engine
+        self.runs_dir = runs_dir
+        self.report_mode = report_mode
+        self.on_event = on_event
+        self.manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+        self._manifest_lock = asyncio.Lock()
+
+    def _emit(self, event: str, job: BatchJob, entry: Dict[str, Any]) -> None:
+        if self.on_event is not None:
+            self.on_event(event, job, entry)
+
+    async def _record(self, entry: Dict[str, Any]) -> None:
+        async with self._manifest_lock:
+            async with aiofiles.open(self.manifest_path, "a") as f:
+                await f.write(json.dumps(entry) + "\n")
+
+    async def run_job(self, job: BatchJob, previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Researches one job and streams its report; failures are recorded, not raised."""
+        started = time.perf_counter()
+        output = os.path.join(self.output_dir, job.filename)
+        entry: Dict[str, Any] = {"id": job.id, "query": job.query, "output": output}
+        try:
+            if previous and previous.get("run_id"):
+                journal = RunJournal.load(previous["run_id"], self.runs_dir)
+            else:
+                journal = RunJournal.create(job.combined_query, job.breadth, job.depth, self.runs_dir)
+            entry["run_id"] = journal.run_id
+            self._emit("started", job, entry)
+
+            research = ENGINES[self.engine]
+            registry = ResearchRegistry()
+            results = await research(
+                query=job.combined_query,
+                breadth=job.breadth,
+                depth=job.depth,
+                journal=journal,
+                registry=registry,
+                deadline=job.deadline()
+            )
+
+            async with aiofiles.open(output, "w") as f:
+                async for chunk in write_report_stream(
+                    prompt=job.combined_query,
+                    learnings=results["learnings"],
+                    visited_urls=results["visited_urls"],
+                    store=registry.learnings,
+                    mode=self.report_mode
+                ):
+                    await f.write(chunk)
+
+            entry.update(
+                status="ok",
+                learnings=len(results["learnings"]),
+                urls=len(results["visited_urls"]),
+            )
+        except Exception as e:
+            entry.update(status="error", error=f"{type(e).__name__}: {e}")
+
+        entry["elapsed_s"] = round(time.perf_counter() - started, 2)
+        await self._record(entry)
+        self._emit("finished", job, entry)
+        return entry
+
+    async def run(self, jobs: List[BatchJob]) -> List[Dict[str, Any]]:
+        """Runs the jobs with at most `max_jobs` in flight and returns their manifest entries."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        previous = load_manifest(self.output_dir)
+        semaphore = asyncio.Semaphore(self.max_jobs)
+
+        async def run_bounded(job: BatchJob) -> Dict[str, Any]:
+            entry = previous.get(job.id)
+            if entry is not None and entry.get("status") == "ok":
+                self._emit("skipped", job, entry)
+                return entry
+            async with semaphore:
+                return await self.run_job(job, entry)
+
+        return await asyncio.gather(*[run_bounded(job) for job in jobs])
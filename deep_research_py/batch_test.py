@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from .batch import BatchJob, BatchRunner, load_jobs, load_manifest
+from .engines import ENGINES
+
+
+@pytest.fixture
+def flaky_engine(monkeypatch):
+    """The dfs engine, except that queries mentioning "boom" fail."""
+    async def flaky(query, **kwargs):
+        if "boom" in query:
+            raise RuntimeError("search backend down")
+        return await ENGINES["dfs"](query=query, **kwargs)
+
+    monkeypatch.setitem(ENGINES, "flaky", flaky)
+    return "flaky"
+
+
+def test_load_jobs_parses_each_line(tmp_path):
+    path = tmp_path / "jobs.jsonl"
+    path.write_text(
+        "# comment\n"
+        '{"id": "solar", "query": "solar prices", "breadth": 2, "depth": 1, "time_limit": 30}\n'
+        "\n"
+        '{"query": "wind", "follow_ups": {"Which region?": "Europe"}}\n'
+        '{"query": "tides", "follow_ups": [{"question": "Why?"}, ["When?", "Now"]]}\n'
+    )
+    solar, wind, tides = load_jobs(str(path))
+
+    assert (solar.id, solar.breadth, solar.depth, solar.time_limit) == ("solar", 2, 1, 30.0)
+    assert (wind.id, wind.breadth, wind.depth, wind.time_limit) == ("job-4", 4, 2, None)
+    assert wind.follow_ups == [("Which region?", "Europe")]
+    assert "Europe" in wind.combined_query and solar.combined_query == "solar prices"
+    assert tides.follow_ups == [("Why?", ""), ("When?", "Now")]
+
+
+def test_load_jobs_rejects_duplicate_ids(tmp_path):
+    path = tmp_path / "jobs.jsonl"
+    path.write_text('{"id": "a", "query": "x"}\n{"id": "a", "query": "y"}\n')
+    with pytest.raises(ValueError, match="Duplicate job ids"):
+        load_jobs(str(path))
+
+
+def test_filenames_are_safe():
+    assert BatchJob(id="a/b c", query="q").filename == "a_b_c.md"
+
+
+async def test_each_job_writes_its_report_and_a_failure_does_not_stop_the_rest(
+        fake_runtime, tmp_path, flaky_engine):
+    output_dir = tmp_path / "out"
+    runner = BatchRunner(str(output_dir), max_jobs=2, engine=flaky_engine,
+                         runs_dir=str(tmp_path / "runs"))
+    jobs = [BatchJob(id="solar", query="solar prices", breadth=2, depth=1),
+            BatchJob(id="broken", query="boom", breadth=2, depth=1),
+            BatchJob(id="wind", query="wind power", breadth=2, depth=1)]
+    entries = await runner.run(jobs)
+
+    assert [entry["status"] for entry in entries] == ["ok", "error", "ok"]
+    assert "search backend down" in entries[1]["error"]
+    for entry in (entries[0], entries[2]):
+        assert entry["learnings"] > 0
+        assert (output_dir / f"{entry['id']}.md").read_text()
+    assert not (output_dir / "broken.md").exists()
+
+    lines = (output_dir / "manifest.jsonl").read_text().splitlines()
+    assert sorted(json.loads(line)["id"] for line in lines) == ["broken", "solar", "wind"]
+
+
+async def test_a_rerun_skips_finished_jobs_and_resumes_failed_ones(
+        fake_runtime, tmp_path, flaky_engine):
+    output_dir = tmp_path / "out"
+    runs_dir = str(tmp_path / "runs")
+    jobs = [BatchJob(id="solar", query="solar prices", breadth=2, depth=1),
+            BatchJob(id="broken", query="boom", breadth=2, depth=1)]
+    first = await BatchRunner(str(output_dir), engine=flaky_engine, runs_dir=runs_dir).run(jobs)
+
+    events = []
+    runner = BatchRunner(str(output_dir), engine="dfs", runs_dir=runs_dir,
+                         on_event=lambda event, job, entry: events.append((event, job.id)))
+    second = await runner.run(jobs)
+
+    assert ("skipped", "solar") in events and ("started", "broken") in events
+    assert second[0] == first[0]
+    # The failed job continues in the journal of its first attempt
+    assert second[1]["status"] == "ok" and second[1]["run_id"] == first[1]["run_id"]
+    assert load_manifest(str(output_dir))["broken"]["status"] == "ok"
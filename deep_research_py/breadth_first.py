@@ -0,0 +1,192 @@
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from .deep_research import (
+    NodeResult,
+    ResearchResult,
+    SerpQuery,
+    accept_planned_queries,
+    follow_up_query,
+    gather_until,
+    generate_serp_queries,
+    generate_serp_queries_batch,
+    load_planned_queries,
+    research_serp_query,
+    time_left,
+)
+from .dedup import ResearchRegistry
+from .events import emit
+from .journal import RunJournal
+
+# Number of parent nodes whose follow-up queries are generated in one LLM request
+QUERY_BATCH_SIZE = 8
+
+
+async def deep_research_bfs(
+    query: str,
+    breadth: int,
+    depth: int,
+    journal: Optional[RunJournal] = None,
+    registry: Optional[ResearchRegistry] = None,
+    batch_size: int = QUERY_BATCH_SIZE,
+    deadline: Optional[float] = None
+) -> ResearchResult:
+    """
+    Level-synchronous variant of `deep_research`.
+    
+    Every SERP query of a level is searched and processed together, then the follow-up
+    queries for the whole next level are generated in a few batched requests keyed by parent
+    node. The critical path is a handful of round-trips per level instead of per node.
+    Node ids match `deep_research`, so both engines can resume each other's journals.
+    
+    Args:
+        query: Research query/topic
+        breadth: Number of parallel searches to perform at the first level
+        depth: How many levels deep to research
+        journal: Run journal to record finished nodes in and to resume from
+        registry: Queries and URLs already used anywhere in the run
+        batch_size: Parent nodes per batched query-generation request
+        deadline: `time.monotonic()` time at which unfinished nodes are cancelled and the
+            learnings found so far are returned
+    """
+    registry = registry or ResearchRegistry()
+    
+    serp_queries = load_planned_queries("0", journal, registry)
+    if serp_queries is None:
+        try:
+            planned = await asyncio.wait_for(
+                generate_serp_queries(query=query, num_queries=breadth),
+                time_left(deadline)
+            )
+        except asyncio.TimeoutError:
+            if time_left(deadline) != 0:
+                raise
+            planned = []
+        serp_queries = accept_planned_queries("0", planned, journal, registry)
+    
+    # Each entry: (node id, SERP query); what the nodes find is kept in the run-wide tree
+    level: List[Tuple[str, SerpQuery]] = [
+        (f"0.{i}", serp_query) for i, serp_query in enumerate(serp_queries)
+    ]
+    level_breadth = breadth
+    
+    for remaining_depth in range(depth, 0, -1):
+        if not level:
+            break
+        new_breadth = max(1, level_breadth // 2)
+        
+        async def process_node(node_id: str, serp_query: SerpQuery) -> Optional[NodeResult]:
+            try:
+                return await research_serp_query(
+                    serp_query,
+                    node_id=node_id,
+                    num_follow_up_questions=new_breadth,
+                    journal=journal,
+                    registry=registry
+                )
+            except Exception as e:
+                print(f"Error running query: {serp_query.query}: {e}")
+                return None
+        
+        # All searches and extractions of the level run together
+        results = await gather_until([
+            process_node(node_id, serp_query) for node_id, serp_query in level
+        ], deadline)
+        
+        parents = [
+            (node_id, serp_query, node)
+            for (node_id, serp_query), node in zip(level, results)
+            if node is not None
+        ]
+        
+        if time_left(deadline) == 0:
+            print("Research deadline reached, keeping the learnings found so far")
+            emit("deadline_reached", node="0", branches=sum(node is None for node in results))
+            break
+        
+        if remaining_depth == 1:
+            break
+        
+        print(f"Researching deeper, breadth: {new_breadth}, depth: {remaining_depth - 1}")
+        try:
+            level = await asyncio.wait_for(
+                _plan_next_level(parents, new_breadth, journal, registry, batch_size),
+                time_left(deadline)
+            )
+        except asyncio.TimeoutError:
+            print("Research deadline reached, keeping the learnings found so far")
+            emit("deadline_reached", node="0", branches=0)
+            break
+        level_breadth = new_breadth
+    
+    learnings, urls = registry.tree.subtree("0")
+    return {
+        "learnings": registry.learnings.canonical(learnings),
+        "visited_urls": urls
+    }
+
+
+async def _plan_next_level(
+    parents: List[Tuple[str, SerpQuery, NodeResult]],
+    num_queries: int,
+    journal: Optional[RunJournal],
+    registry: ResearchRegistry,
+    batch_size: int
+) -> List[Tuple[str, SerpQuery]]:
+    """Plans the follow-up queries of every parent, in batches, reusing journaled plans."""
+    planned: Dict[str, List[SerpQuery]] = {}
+    pending = []
+    for node_id, serp_query, node in parents:
+        serp_queries = load_planned_queries(node_id, journal, registry)
+        if serp_queries is not None:
+            planned[node_id] = serp_queries
+        else:
+            pending.append((node_id, serp_query, node))
+    
+    async def plan_batch(batch) -> Dict[str, List[SerpQuery]]:
+        directions = {
+            node_id: follow_up_query(serp_query, node["follow_up_questions"])
+            for node_id, serp_query, node in batch
+        }
+        # The batch's parents share one token budget of what their paths learned
+        learnings = registry.tree.context(directions)
+        try:
+            generated = await generate_serp_queries_batch(directions, num_queries, learnings)
+        except Exception as e:
+            print(f"Error generating follow-up queries: {e}")
+            generated = {}
+        
+        # Directions the batched answer skipped fall back to one request each, all at once
+        async def plan_one(node_id: str) -> List[SerpQuery]:
+            try:
+                return await generate_serp_queries(
+                    query=directions[node_id],
+                    num_queries=num_queries,
+                    learnings=registry.tree.context([node_id])
+                )
+            except Exception as e:
+                print(f"Error generating follow-up queries: {e}")
+                return []
+        
+        missing = [node_id for node_id, _, _ in batch if node_id not in generated]
+        for node_id, serp_queries in zip(missing, await asyncio.gather(*[
+            plan_one(node_id) for node_id in missing
+        ])):
+            generated[node_id] = serp_queries
+        return generated
+    
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    for generated in await asyncio.gather(*[plan_batch(batch) for batch in batches]):
+        planned.update(generated)
+    
+    pending_ids = {node_id for node_id, _, _ in pending}
+    children = []
+    for node_id, _, _ in parents:
+        serp_queries = planned.get(node_id, [])
+        if node_id in pending_ids:
+            serp_queries = accept_planned_queries(node_id, serp_queries, journal, registry)
+        children.extend(
+            (f"{node_id}.{i}", serp_query)
+            for i, serp_query in enumerate(serp_queries)
+        )
+    return children
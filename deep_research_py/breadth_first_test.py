@@ -0,0 +1,64 @@
+import asyncio
+
+from . import breadth_first
+from .dedup import ResearchRegistry
+from .journal import RunJournal
+
+
+async def _research(monkeypatch, **kwargs):
+    """Runs the bfs engine, returning its result and the node ids in the order they started."""
+    started = []
+    research_serp_query = breadth_first.research_serp_query
+
+    async def recording(serp_query, node_id, **kw):
+        started.append(node_id)
+        return await research_serp_query(serp_query, node_id=node_id, **kw)
+
+    monkeypatch.setattr(breadth_first, "research_serp_query", recording)
+    result = await breadth_first.deep_research_bfs(
+        query="offline test topic", registry=ResearchRegistry(), **kwargs
+    )
+    return result, started
+
+
+async def test_levels_run_in_order_with_dfs_node_ids(fake_runtime, monkeypatch, tmp_path):
+    journal = RunJournal.create("offline test topic", 4, 3, str(tmp_path))
+    result, started = await _research(monkeypatch, breadth=4, depth=3, journal=journal)
+
+    assert result["learnings"] and result["visited_urls"]
+    levels = [node_id.count(".") for node_id in started]
+    assert levels == sorted(levels) and set(levels) == {1, 2, 3}
+    # breadth halves with every level, as in the dfs engine
+    assert started[:4] == ["0.0", "0.1", "0.2", "0.3"]
+    children = [node_id for node_id in started if node_id.count(".") == 2]
+    assert sorted(children)[:2] == ["0.0.0", "0.0.1"] and len(children) == 4 * 2
+    grandchildren = [node_id for node_id in started if node_id.count(".") == 3]
+    assert sorted(grandchildren) == sorted(f"{node_id}.0" for node_id in children)
+    # Nodes are journaled under the same ids (ones whose pages were all taken are retried on resume)
+    assert all(journal.get_node(node_id) is not None for node_id in started[:4])
+    assert sum(journal.get_node(node_id) is not None for node_id in started) > 4
+
+
+async def test_directions_the_batch_skipped_are_planned_concurrently(fake_runtime, monkeypatch):
+    async def no_answer(directions, num_queries, learnings):
+        return {}
+
+    in_flight, peak, planned = 0, 0, []
+    generate_serp_queries = breadth_first.generate_serp_queries
+
+    async def tracking(query, num_queries, learnings=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        planned.append(query)
+        return await generate_serp_queries(query=query, num_queries=num_queries, learnings=learnings)
+
+    monkeypatch.setattr(breadth_first, "generate_serp_queries_batch", no_answer)
+    monkeypatch.setattr(breadth_first, "generate_serp_queries", tracking)
+    _, started = await _research(monkeypatch, breadth=4, depth=2)
+
+    # The root plan plus one fallback per first-level node, the fallbacks overlapping
+    assert len(planned) == 5 and peak == 4
+    assert sum(node_id.count(".") == 2 for node_id in started) == 4 * 2
@@ -0,0 +1,68 @@
+import types
+
+import pytest
+
+from . import cache as cache_module
+from .cache import ResponseCache, normalize_query
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable clock standing in for the cache's `time` module."""
+    now = types.SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(cache_module, "time", types.SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def test_hits_misses_and_keys():
+    cache = ResponseCache(":memory:")
+    key = ResponseCache.make_key("chat", {"model": "m", "messages": [1, 2]})
+    assert key == ResponseCache.make_key("chat", {"messages": [1, 2], "model": "m"})
+    assert key.startswith("chat:")
+
+    assert cache.get(key) is None
+    cache.set(key, "value")
+    assert cache.get(key) == "value"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResponseCache(":memory:", ttl=60)
+    cache.set("search:a", "value")
+    clock.value += 59
+    assert cache.get("search:a") == "value"
+    clock.value += 2
+    assert cache.get("search:a") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = ResponseCache(":memory:", max_bytes=30)
+    for key in ("a", "b", "c"):
+        cache.set(key, "x" * 10)
+        clock.value += 1
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") is not None
+    clock.value += 1
+    cache.set("d", "x" * 10)
+
+    assert cache.get("b") is None
+    assert all(cache.get(key) is not None for key in ("a", "c", "d"))
+    assert cache.stats()["bytes"] == 30
+
+
+def test_replacing_an_entry_keeps_the_size_right():
+    cache = ResponseCache(":memory:")
+    cache.set("a", "x" * 10)
+    cache.set("a", "x" * 4)
+    assert cache.stats()["bytes"] == 4
+
+
+def test_values_larger_than_the_cache_are_not_stored():
+    cache = ResponseCache(":memory:", max_bytes=5)
+    cache.set("a", "too large")
+    assert cache.get("a") is None
+
+
+def test_normalize_query():
+    assert normalize_query("  Solar   Prices\n2024 ") == "solar prices 2024"
@@ -0,0 +1,161 @@
+import re
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Set, Tuple
+
+from .dedup import normalize_text
+
+# Whole lines that are site chrome rather than content. Only short lines that consist of
+# nothing but such a phrase match, so prose that merely mentions cookies, copyright or
+# registration is kept.
+BOILERPLATE_LINE = re.compile(
+    r"(?:"
+    r"(?:accept|reject|allow|decline)(?: all)?(?: cookies)?"
+    r"|(?:manage|customi[sz]e) (?:cookies|cookie settings|preferences)"
+    r"|cookie (?:settings|preferences|policy|notice)"
+    r"|(?:we|this (?:site|website)) uses? cookies(?: [^.!?\d]*)?"
+    r"|privacy (?:policy|notice)|terms (?:of (?:service|use)|and conditions)"
+    r"|all rights reserved"
+    r"|subscribe(?: to (?:our|the) newsletter)?"
+    r"|sign (?:in|up|out)|log ?(?:in|out)|register|create (?:an )?account"
+    r"|skip to (?:main )?content|back to top|(?:main )?menu"
+    r"|share(?: this(?: article| page| post)?| on \w+)?|follow us(?: on \w+)?"
+    r"|(?:please )?enable javascript(?: [^.!?\d]*)?"
+    r")\.?",
+    re.IGNORECASE,
+)
+
+# Copyright notices, which carry a year: "© 2024 Example Inc. All rights reserved."
+COPYRIGHT_LINE = re.compile(
+    r"(?:©|\(c\)|copyright(?: ©)?) ?\d{4}(?: ?[-–] ?\d{4})?(?: [^.!?\d]{0,40})?\.?"
+    r"(?: all rights reserved\.?)?",
+    re.IGNORECASE,
+)
+
+# Longer lines are never treated as boilerplate
+BOILERPLATE_MAX_LINE_CHARS = 60
+
+# Separators between items of one footer line ("Privacy Policy | Terms of Use")
+ITEM_SEPARATOR = re.compile(r"\s*[|·•]\s*")
+
+MARKDOWN_LINK = re.compile(r"!?\[([^\]]*)\]\(([^)\s]*)(?:\s+\"[^\"]*\")?\)")
+
+# A block whose text is mostly link syntax (navigation, tag clouds, "related articles")
+LINK_DENSITY = 0.5
+LINK_BLOCK_MIN_LINKS = 3
+# Anchor texts kept when a link-heavy block is collapsed
+LINK_BLOCK_KEEP = 5
+
+# Blocks shorter than this (normalized) are not deduplicated across pages
+DUPLICATE_MIN_CHARS = 20
+
+
+@dataclass
+class PageStats:
+    """What cleaning removed from one page."""
+    url: str
+    chars_before: int
+    chars_after: int
+    boilerplate_blocks: int = 0
+    link_blocks: int = 0
+    duplicate_blocks: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        # Same 4-characters-per-token estimate as the rate budgeting
+        return (self.chars_before - self.chars_after) // 4
+
+
+def iter_blocks(text: str) -> Iterator[str]:
+    """Yields the blank-line separated blocks of a markdown page, one at a time."""
+    position = 0
+    length = len(text)
+    while position < length:
+        index = text.find("\n\n", position)
+        end = length if index == -1 else index
+        block = text[position:end].strip()
+        if block:
+            yield block
+        if index == -1:
+            break
+        position = index + 2
+
+
+def _is_boilerplate_line(line: str) -> bool:
+    line = line.strip(" -*|#>")
+    if len(line) > BOILERPLATE_MAX_LINE_CHARS:
+        return False
+    return all(
+        BOILERPLATE_LINE.fullmatch(item) or COPYRIGHT_LINE.fullmatch(item)
+        for item in ITEM_SEPARATOR.split(line) if item
+    )
+
+
+def _is_boilerplate(block: str) -> bool:
+    """A block made only of short site-chrome lines (cookie buttons, footer links, ...)."""
+    lines = [line for line in block.splitlines() if line.strip(" -*|#>")]
+    return bool(lines) and all(_is_boilerplate_line(line) for line in lines)
+
+
+def _collapse_links(block: str) -> Tuple[str, bool]:
+    """Replaces links with their anchor text; a block made mostly of links shrinks to a short list."""
+    links = MARKDOWN_LINK.findall(block)
+    if not links:
+        return block, False
+
+    link_chars = sum(m.end() - m.start() for m in MARKDOWN_LINK.finditer(block))
+    if len(links) >= LINK_BLOCK_MIN_LINKS and link_chars >= LINK_DENSITY * len(block):
+        anchors = [text.strip() for text, _ in links if text.strip()]
+        if not anchors:
+            return "", True
+        more = len(anchors) - LINK_BLOCK_KEEP
+        collapsed = "Links: " + "; ".join(anchors[:LINK_BLOCK_KEEP])
+        return collapsed + (f" (+{more} more)" if more > 0 else ""), True
+
+    # Keep the anchor text of inline links; URLs and image alt markup cost tokens for nothing
+    return MARKDOWN_LINK.sub(lambda m: m.group(1), block), False
+
+
+def clean_page(text: str, url: str = "", seen: Optional[Set[str]] = None) -> Tuple[str, PageStats]:
+    """Strips boilerplate, collapses link blocks and drops blocks already in `seen`.
+
+    `seen` holds the normalized blocks of the pages cleaned before this one, so passing the
+    same set for every page of a search response removes content they repeat.
+    """
+    seen = seen if seen is not None else set()
+    stats = PageStats(url=url, chars_before=len(text), chars_after=0)
+    kept: List[str] = []
+
+    for block in iter_blocks(text):
+        if _is_boilerplate(block):
+            stats.boilerplate_blocks += 1
+            continue
+
+        block, collapsed = _collapse_links(block)
+        stats.link_blocks += collapsed
+        if not block:
+            continue
+
+        normalized = normalize_text(block)
+        if len(normalized) >= DUPLICATE_MIN_CHARS:
+            if normalized in seen:
+                stats.duplicate_blocks += 1
+                continue
+            seen.add(normalized)
+        kept.append(block)
+
+    cleaned = "\n\n".join(kept)
+    stats.chars_after = len(cleaned)
+    return cleaned, stats
+
+
+def clean_pages(pages: List[str], urls: Optional[List[str]] = None) -> Tuple[List[str], List[PageStats]]:
+    """Cleans the pages of one search response, dropping paragraphs repeated across them."""
+    urls = urls or [""] * len(pages)
+    seen: Set[str] = set()
+    cleaned = []
+    stats = []
+    for page, url in zip(pages, urls):
+        text, page_stats = clean_page(page, url, seen)
+        cleaned.append(text)
+        stats.append(page_stats)
+    return cleaned, stats
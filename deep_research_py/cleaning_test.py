@@ -0,0 +1,67 @@
+import pytest
+
+from .cleaning import _is_boilerplate, clean_page, clean_pages
+
+
+@pytest.mark.parametrize("block", [
+    "Accept",
+    "Accept all cookies",
+    "Reject all\nManage preferences",
+    "We use cookies to improve your experience.",
+    "© 2024 Example Inc. All rights reserved.",
+    "Copyright 2019-2024 Example",
+    "Privacy Policy | Terms of Use | Cookie Policy",
+    "- Sign in\n- Register",
+    "Skip to main content",
+    "Share this article",
+    "Follow us on Twitter",
+    "Subscribe to our newsletter",
+    "Please enable JavaScript to view this page",
+])
+def test_ui_only_blocks_are_boilerplate(block):
+    assert _is_boilerplate(block)
+
+
+@pytest.mark.parametrize("block", [
+    "Copyright law in the EU was reformed in 2019 with the DSM directive.",
+    "Third-party cookies use cross-site tracking to build ad profiles.",
+    "Login attempts rose 20% in 2024 according to the report.",
+    "Register of Deeds fees increased by a third.",
+    "Cookies",
+    "Sign in with a passkey is now supported by 40% of banks.",
+    "Privacy Policy\nThe regulator fined the company EUR 1.2bn over its privacy policy.",
+    "We use cookies. " * 5,
+])
+def test_content_mentioning_ui_words_is_kept(block):
+    assert not _is_boilerplate(block)
+
+
+def test_clean_page_keeps_content_and_drops_chrome():
+    page = (
+        "Skip to content\n\n"
+        "# Solar prices\n\n"
+        "Copyright law in the EU was reformed in 2019.\n\n"
+        "Accept all cookies\n\n"
+        "© 2024 Example Inc. All rights reserved."
+    )
+    cleaned, stats = clean_page(page)
+    assert cleaned == "# Solar prices\n\nCopyright law in the EU was reformed in 2019."
+    assert stats.boilerplate_blocks == 3
+    assert stats.tokens_saved > 0
+
+
+def test_link_blocks_are_collapsed_and_inline_links_unwrapped():
+    page = (
+        "[Home](/) [News](/news) [Sport](/sport) [Weather](/weather)\n\n"
+        "Prices fell, see [the report](https://example.com/report) for details."
+    )
+    cleaned, stats = clean_page(page)
+    assert cleaned == "Links: Home; News; Sport; Weather\n\nPrices fell, see the report for details."
+    assert stats.link_blocks == 1
+
+
+def test_blocks_repeated_across_pages_are_dropped():
+    shared = "Battery storage capacity doubled between 2022 and 2024 in California."
+    cleaned, stats = clean_pages([f"First page.\n\n{shared}", f"{shared}\n\nSecond page."])
+    assert cleaned == [f"First page.\n\n{shared}", "Second page."]
+    assert [s.duplicate_blocks for s in stats] == [0, 1]
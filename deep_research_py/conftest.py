@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks.fakes import FakeBehaviour, FakeFirecrawlApp, FakeOpenAIClient, byte_encoding
+
+from .runtime import Runtime, RuntimeConfig, get_runtime, set_runtime
+from .scheduler import reset_schedulers
+from .tracing import reset_tracer
+
+
+@pytest.fixture
+def fake_runtime(monkeypatch):
+    """A runtime of deterministic fake clients, with no cache, knowledge index or rate limits."""
+    monkeypatch.setenv("DEEP_RESEARCH_CACHE", "0")
+    monkeypatch.setenv("DEEP_RESEARCH_KNOWLEDGE", "0")
+    monkeypatch.setenv("OPENAI_RPM", "100000")
+    monkeypatch.setenv("OPENAI_TPM", "100000000")
+    monkeypatch.setenv("FIRECRAWL_RPM", "100000")
+    previous = get_runtime()
+    runtime = Runtime(
+        config=RuntimeConfig(page_executor="inline"),
+        openai_client=FakeOpenAIClient(FakeBehaviour(latency=0.01)),
+        firecrawl_app=FakeFirecrawlApp(FakeBehaviour(latency=0.01), page_kb=4, url_pool=30),
+        encoder=byte_encoding(),
+    )
+    set_runtime(runtime)
+    reset_schedulers()
+    reset_tracer()
+    yield runtime
+    runtime.close_page_executor()
+    set_runtime(previous)
+    reset_schedulers()
@@ -0,0 +1,126 @@
+import os
+import re
+from typing import TYPE_CHECKING, FrozenSet, List, Set, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+if TYPE_CHECKING:
+    from .deep_research import SearchResponse, SerpQuery
+    from .learnings import LearningStore
+    from .tree import ResearchTree
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src"}
+
+QUERY_SIMILARITY_THRESHOLD = float(os.environ.get("QUERY_SIMILARITY_THRESHOLD", "0.7"))
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL: lowercase host without www, no fragment or tracking params."""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    scheme = parts.scheme.lower()
+    if (scheme, host.rsplit(":", 1)[-1]) in (("http", "80"), ("https", "443")):
+        host = host.rsplit(":", 1)[0]
+    # http and https versions of a page are the same document
+    if scheme in ("http", "https"):
+        scheme = "https"
+
+    params = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(sorted(params)), ""))
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text with punctuation removed and whitespace collapsed."""
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+
+def shingles(text: str, size: int = 2) -> FrozenSet[str]:
+    """Word unigrams plus word n-grams of `size` of the normalized text."""
+    words = normalize_text(text).split()
+    grams = set(words)
+    grams.update(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return frozenset(grams)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class ResearchRegistry:
+    """Run-wide record of issued queries, fetched URLs, learnings and the research tree."""
+
+    def __init__(self, query_similarity: float = QUERY_SIMILARITY_THRESHOLD):
+        # learnings (and through it tree) imports this module for its text helpers
+        from .learnings import LearningStore
+        from .tree import ResearchTree
+
+        self.query_similarity = query_similarity
+        self.learnings: "LearningStore" = LearningStore()
+        self.tree: "ResearchTree" = ResearchTree()
+        self._urls: Set[str] = set()
+        self._queries: List[Tuple[str, FrozenSet[str]]] = []
+        self.skipped_queries = 0
+        self.skipped_urls = 0
+
+    def is_duplicate_query(self, query: str) -> bool:
+        normalized = normalize_text(query)
+        grams = shingles(query)
+        return any(
+            normalized == seen or jaccard(grams, seen_grams) >= self.query_similarity
+            for seen, seen_grams in self._queries
+        )
+
+    def add_query(self, query: str) -> None:
+        self._queries.append((normalize_text(query), shingles(query)))
+
+    def claim_query(self, query: str) -> bool:
+        """Registers the query and returns True, unless it is too similar to an issued one."""
+        if self.is_duplicate_query(query):
+            self.skipped_queries += 1
+            return False
+        self.add_query(query)
+        return True
+
+    def filter_queries(self, serp_queries: List["SerpQuery"]) -> List["SerpQuery"]:
+        """Drops queries that repeat one already issued anywhere in the run."""
+        return [q for q in serp_queries if self.claim_query(q.query)]
+
+    def add_url(self, url: str) -> None:
+        self._urls.add(normalize_url(url))
+
+    def claim_url(self, url: str) -> bool:
+        """Registers the URL and returns True if no branch has fetched it before."""
+        normalized = normalize_url(url)
+        if normalized in self._urls:
+            self.skipped_urls += 1
+            return False
+        self._urls.add(normalized)
+        return True
+
+    def filter_results(self, result: "SearchResponse") -> "SearchResponse":
+        """Keeps only pages that have not been summarized by another branch yet."""
+        return {
+            "data": [
+                item for item in result["data"]
+                if not item.get("url") or self.claim_url(item["url"])
+            ]
+        }
+
+    def release_results(self, result: "SearchResponse") -> None:
+        """Gives up the URLs claimed by `filter_results` for a node that failed before
+        summarizing them, so another branch may still read those pages."""
+        for item in result["data"]:
+            if item.get("url"):
+                self._urls.discard(normalize_url(item["url"]))
@@ -0,0 +1,32 @@
+from .dedup import ResearchRegistry
+
+
+def _response(*urls):
+    return {"data": [{"url": url, "markdown": f"page at {url}"} for url in urls]}
+
+
+def test_urls_are_claimed_once_across_branches():
+    registry = ResearchRegistry()
+    first = registry.filter_results(_response("https://example.com/a", "https://example.com/b"))
+    second = registry.filter_results(_response("https://example.com/a/", "https://example.com/c"))
+
+    assert [item["url"] for item in first["data"]] == ["https://example.com/a", "https://example.com/b"]
+    assert [item["url"] for item in second["data"]] == ["https://example.com/c"]
+    assert registry.skipped_urls == 1
+
+
+def test_released_urls_can_be_claimed_again():
+    registry = ResearchRegistry()
+    failed = registry.filter_results(_response("https://example.com/a", "https://example.com/b"))
+    registry.release_results(failed)
+
+    retried = registry.filter_results(_response("https://example.com/b"))
+    assert [item["url"] for item in retried["data"]] == ["https://example.com/b"]
+
+
+def test_similar_queries_are_dropped():
+    registry = ResearchRegistry()
+    assert registry.claim_query("solar panel prices in 2024")
+    assert not registry.claim_query("Solar panel prices in 2024?")
+    assert registry.claim_query("offshore wind auctions")
+    assert registry.skipped_queries == 1
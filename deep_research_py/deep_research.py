@@ -1,14 +1,35 @@
-from typing import List, Dict, TypedDict, Optional
+from typing import Any, AsyncIterator, Awaitable, List, Dict, TypedDict, TypeVar, Optional
 from dataclasses import dataclass
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-import aiohttp
-import os
-from firecrawl import FirecrawlApp
-from .ai.providers import openai_client, trim_prompt
-from .prompt import system_prompt
+import time
+from .ai.providers import (
+    create_chat_completion,
+    stream_chat_completion,
+)
+from .prompt import (
+    EXTRACT_LEARNINGS,
+    FINAL_REPORT,
+    FINAL_REPORT_MARKDOWN,
+    SERP_QUERIES,
+    SERP_QUERIES_BATCH,
+)
+from .scheduler import get_scheduler
+from .cache import ResponseCache, get_cache, normalize_query
+from .runtime import get_runtime
+from .journal import RunJournal
+from .knowledge import current_run, get_knowledge
+from .pages import prepare_search_response
+from .dedup import ResearchRegistry
+from .learnings import LearningStore
+from .events import emit
+from .tracing import node_context, trace_span, traced
 import json
 
+T = TypeVar("T")
+
+# Pages requested per SERP query
+SEARCH_RESULT_LIMIT = 5
+
 class SearchResponse(TypedDict):
     data: List[Dict[str, str]]
 
@@ -16,36 +37,65 @@ class ResearchResult(TypedDict):
     learnings: List[str]
     visited_urls: List[str]
 
+class NodeResult(TypedDict):
+    learnings: List[str]
+    urls: List[str]
+    follow_up_questions: List[str]
+
 @dataclass
 class SerpQuery:
     query: str
     research_goal: str
 
-# Increase this if you have higher API rate limits
-CONCURRENCY_LIMIT = 1
-
 class Firecrawl:
     """Simple wrapper for Firecrawl SDK."""
-    def __init__(self, api_key: str = "", api_url: Optional[str] = None):
-        self.app = FirecrawlApp(
-            api_key=api_key,
-            api_url=api_url
-        )
+    def __init__(self, api_key: str = "", api_url: Optional[str] = None, app: Optional[Any] = None):
+        # `app` can be any object with FirecrawlApp's `search` method, e.g. a local stand-in
+        if app is None:
+            from firecrawl import FirecrawlApp
+
+            app = FirecrawlApp(
+                api_key=api_key,
+                api_url=api_url
+            )
+        self.app = app
         
     async def search(self, query: str, timeout: int = 15000, limit: int = 5) -> SearchResponse:
-        """Search using Firecrawl SDK in a thread pool to keep it async."""
+        """Search using Firecrawl SDK, serving repeated queries from the response cache."""
+        with trace_span("firecrawl.search", "firecrawl", query=query) as span:
+            cache = get_cache()
+            key = None
+            if cache is not None:
+                key = ResponseCache.make_key("serp", {"query": normalize_query(query), "limit": limit})
+                cached = cache.get(key)
+                if cached is not None:
+                    span.cache_hit = True
+                    return json.loads(cached)
+
+            response = await self._search(query, timeout, limit)
+            span.bytes = sum(
+                len((item.get("markdown") or "").encode("utf-8")) for item in response["data"]
+            )
+            if key is not None and response["data"]:
+                cache.set(key, json.dumps(response, default=str))
+            return response
+
+    async def _search(self, query: str, timeout: int, limit: int) -> SearchResponse:
+        """Runs the synchronous SDK search in a thread pool to keep it async."""
         try:
-            # Run the synchronous SDK call in a thread pool
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.app.search(
-                    query=query,
-                )
+            # Run the synchronous SDK call in a thread pool, paced by the run-wide scheduler
+            response = await get_scheduler("firecrawl").run(
+                lambda: asyncio.get_event_loop().run_in_executor(
+                    None,
+                    lambda: self.app.search(
+                        query=query,
+                        params={"timeout": timeout, "limit": limit}
+                    )
+                ),
+                cost=limit,
+                hedge=True
             )
             
-            # Add delay after request
-            await asyncio.sleep(2)
-            
             # Handle the response format from the SDK
             if isinstance(response, dict) and 'data' in response:
                 # Response is already in the right format
@@ -77,12 +127,20 @@ class Firecrawl:
             print(f"Response type: {type(response) if 'response' in locals() else 'N/A'}")
             return {"data": []}
 
-# Initialize Firecrawl
-firecrawl = Firecrawl(
-    api_key=os.environ.get("FIRECRAWL_KEY", ""),
-    api_url=os.environ.get("FIRECRAWL_BASE_URL")
-)
+def __getattr__(name: str) -> Any:
+    # The shared client now lives on the runtime and is only built when first searched with
+    if name == "firecrawl":
+        return get_runtime().get_firecrawl()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _known_learnings(text: str) -> List[str]:
+    """What earlier runs learned about `text`, empty without a knowledge index."""
+    knowledge = get_knowledge()
+    if knowledge is None:
+        return []
+    return knowledge.learnings_for(text, exclude_run=current_run())
 
+@traced("generate_serp_queries")
 async def generate_serp_queries(
     query: str,
     num_queries: int = 3,
@@ -90,21 +148,16 @@ async def generate_serp_queries(
 ) -> List[SerpQuery]:
     """Generate SERP queries based on user input and previous learnings."""
     
-    prompt = f"""Given the following prompt from the user, generate a list of SERP queries to research the topic. Return a JSON object with a 'queries' array field containing {num_queries} queries (or less if the original prompt is clear). Each query object should have 'query' and 'research_goal' fields. Make sure each query is unique and not similar to each other: <prompt>{query}</prompt>"""
-    
-    if learnings:
-        prompt += f"\n\nHere are some learnings from previous research, use them to generate more specific queries: {' '.join(learnings)}"
-    
-    response = await asyncio.get_event_loop().run_in_executor(
-        None,
-        lambda: openai_client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "system", "content": system_prompt()},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={ "type": "json_object" }
-        )
+    response = await create_chat_completion(
+        model="o3-mini",
+        # Ancestor learnings come root first, so sibling branches share them as a prefix too
+        messages=SERP_QUERIES.messages(
+            learnings=learnings,
+            known_learnings=_known_learnings(query),
+            num_queries=num_queries,
+            prompt=query
+        ),
+        response_format={ "type": "json_object" }
     )
     
     try:
@@ -116,42 +169,84 @@ async def generate_serp_queries(
         print(f"Raw response: {response.choices[0].message.content}")
         return []
 
+@traced("generate_serp_queries_batch")
+async def generate_serp_queries_batch(
+    directions: Dict[str, str],
+    num_queries: int = 3,
+    learnings: Optional[List[str]] = None
+) -> Dict[str, List[SerpQuery]]:
+    """Generate SERP queries for several research directions in one call, keyed by direction id."""
+    
+    directions_str = "\n".join(
+        f"<direction id=\"{direction_id}\">\n{direction}\n</direction>"
+        for direction_id, direction in directions.items()
+    )
+    
+    response = await create_chat_completion(
+        model="o3-mini",
+        messages=SERP_QUERIES_BATCH.messages(
+            learnings=learnings,
+            known_learnings=_known_learnings(" ".join(directions.values())),
+            num_queries=num_queries,
+            directions=directions_str
+        ),
+        response_format={ "type": "json_object" }
+    )
+    
+    try:
+        result = json.loads(response.choices[0].message.content)
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON response: {e}")
+        print(f"Raw response: {response.choices[0].message.content}")
+        return {}
+    
+    queries: Dict[str, List[SerpQuery]] = {}
+    for entry in result.get("results", []):
+        direction_id = str(entry.get("id", ""))
+        if direction_id not in directions:
+            continue
+        queries[direction_id] = [
+            SerpQuery(query=q["query"], research_goal=q.get("research_goal", ""))
+            for q in entry.get("queries", [])
+            if isinstance(q, dict) and q.get("query")
+        ][:num_queries]
+    return queries
+
+@traced("process_serp_result")
 async def process_serp_result(
     query: str,
     result: SearchResponse,
     num_learnings: int = 3,
-    num_follow_up_questions: int = 3
+    num_follow_up_questions: int = 3,
+    research_goal: str = ""
 ) -> Dict[str, List[str]]:
     """Process search results to extract learnings and follow-up questions."""
     
-    contents = [
-        trim_prompt(item.get("markdown", ""), 25_000)
-        for item in result["data"]
-        if item.get("markdown")
-    ]
+    # Tokenizing, cleaning and ranking pages runs in the page pool, not on the event loop
+    contents = await prepare_search_response(result, query=f"{query} {research_goal}".strip())
+    return await extract_learnings(query, contents, num_learnings, num_follow_up_questions)
+
+@traced("extract_learnings")
+async def extract_learnings(
+    query: str,
+    contents: List[str],
+    num_learnings: int = 3,
+    num_follow_up_questions: int = 3
+) -> Dict[str, List[str]]:
+    """Extract learnings and follow-up questions from prepared page contents."""
     
     # Create the contents string separately
     contents_str = "".join(f"<content>\n{content}\n</content>" for content in contents)
     
-    prompt = (
-        f"Given the following contents from a SERP search for the query <query>{query}</query>, "
-        f"generate a list of learnings from the contents. Return a JSON object with 'learnings' "
-        f"and 'followUpQuestions' arrays. Include up to {num_learnings} learnings and "
-        f"{num_follow_up_questions} follow-up questions. The learnings should be unique, "
-        "concise, and information-dense, including entities, metrics, numbers, and dates.\n\n"
-        f"<contents>{contents_str}</contents>"
-    )
-    
-    response = await asyncio.get_event_loop().run_in_executor(
-        None,
-        lambda: openai_client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "system", "content": system_prompt()},
-                {"role": "user", "content": prompt}
-            ],
-            response_format={ "type": "json_object" }
-        )
+    response = await create_chat_completion(
+        model="o3-mini",
+        messages=EXTRACT_LEARNINGS.messages(
+            num_learnings=num_learnings,
+            num_follow_up_questions=num_follow_up_questions,
+            query=query,
+            contents=contents_str
+        ),
+        response_format={ "type": "json_object" }
     )
     
     try:
@@ -165,36 +260,32 @@ async def process_serp_result(
         print(f"Raw response: {response.choices[0].message.content}")
         return {"learnings": [], "followUpQuestions": []}
 
+async def _report_learnings(learnings: List[str], store: Optional[LearningStore] = None) -> str:
+    """Learnings for the report prompt, deduplicated and compacted to the learnings budget."""
+    if store is None:
+        store = LearningStore()
+        store.add_all(learnings)
+    compacted = await store.compact()
+    return "\n".join([f"<learning>\n{learning.text}\n</learning>" for learning in compacted])
+
+def _sources_section(visited_urls: List[str]) -> str:
+    return f"\n\n## Sources\n\n" + "\n".join([f"- {url}" for url in visited_urls])
+
+@traced("write_final_report")
 async def write_final_report(
     prompt: str,
     learnings: List[str],
-    visited_urls: List[str]
+    visited_urls: List[str],
+    store: Optional[LearningStore] = None
 ) -> str:
     """Generate final report based on all research learnings."""
     
-    learnings_string = trim_prompt(
-        "\n".join([f"<learning>\n{learning}\n</learning>" for learning in learnings]),
-        150_000
-    )
+    learnings_string = await _report_learnings(learnings, store)
     
-    user_prompt = (
-        f"Given the following prompt from the user, write a final report on the topic using "
-        f"the learnings from research. Return a JSON object with a 'reportMarkdown' field "
-        f"containing a detailed markdown report (aim for 3+ pages). Include ALL the learnings "
-        f"from research:\n\n<prompt>{prompt}</prompt>\n\n"
-        f"Here are all the learnings from research:\n\n<learnings>\n{learnings_string}\n</learnings>"
-    )
-    
-    response = await asyncio.get_event_loop().run_in_executor(
-        None,
-        lambda: openai_client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "system", "content": system_prompt()},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={ "type": "json_object" }
-        )
+    response = await create_chat_completion(
+        model="o3-mini",
+        messages=FINAL_REPORT.messages(prompt=prompt, learnings=learnings_string),
+        response_format={ "type": "json_object" }
     )
     
     try:
@@ -202,19 +293,244 @@ async def write_final_report(
         report = result.get("reportMarkdown", "")
         
         # Append sources
-        urls_section = f"\n\n## Sources\n\n" + "\n".join([f"- {url}" for url in visited_urls])
-        return report + urls_section
+        return report + _sources_section(visited_urls)
     except json.JSONDecodeError as e:
         print(f"Error parsing JSON response: {e}")
         print(f"Raw response: {response.choices[0].message.content}")
         return "Error generating report"
 
+async def write_final_report_stream(
+    prompt: str,
+    learnings: List[str],
+    visited_urls: List[str],
+    store: Optional[LearningStore] = None
+) -> AsyncIterator[str]:
+    """Stream the final report as markdown chunks while it is generated, ending with the sources."""
+    
+    learnings_string = await _report_learnings(learnings, store)
+    
+    with trace_span("write_final_report_stream"):
+        async for chunk in stream_chat_completion(
+            model="o3-mini",
+            messages=FINAL_REPORT_MARKDOWN.messages(prompt=prompt, learnings=learnings_string)
+        ):
+            yield chunk
+    
+    yield _sources_section(visited_urls)
+
+def load_planned_queries(
+    node_id: str,
+    journal: Optional[RunJournal],
+    registry: ResearchRegistry
+) -> Optional[List[SerpQuery]]:
+    """Returns the queries journaled for a node when resuming, registering them as issued."""
+    journaled_queries = journal.get_queries(node_id) if journal else None
+    if journaled_queries is None:
+        return None
+    serp_queries = [SerpQuery(**q) for q in journaled_queries]
+    for serp_query in serp_queries:
+        registry.add_query(serp_query.query)
+    return serp_queries
+
+def accept_planned_queries(
+    node_id: str,
+    serp_queries: List[SerpQuery],
+    journal: Optional[RunJournal],
+    registry: ResearchRegistry
+) -> List[SerpQuery]:
+    """Drops queries already issued elsewhere in the run and journals the rest for the node."""
+    # Drop queries that another branch (or a sibling in this batch) already issued
+    serp_queries = registry.filter_queries(serp_queries)
+    if journal and serp_queries:
+        journal.record_queries(node_id, [
+            {"query": q.query, "research_goal": q.research_goal} for q in serp_queries
+        ])
+    emit("queries_planned", node=node_id, queries=[q.query for q in serp_queries])
+    return serp_queries
+
+def replay_node(
+    serp_query: SerpQuery,
+    node_id: str,
+    journal: Optional[RunJournal],
+    registry: ResearchRegistry
+) -> Optional[NodeResult]:
+    """Returns a node completed in a previous attempt of the run, or whose query an earlier run
+    already covered, registering its results."""
+    finished = journal.get_node(node_id) if journal else None
+    source = "journal"
+    if finished is None:
+        finished = recall_node(serp_query, node_id, journal)
+        source = "knowledge"
+    if finished is None:
+        return None
+    for url in finished["urls"]:
+        registry.add_url(url)
+    registry.learnings.add_all(finished["learnings"], node_id, serp_query.query, finished["urls"])
+    registry.tree.record(node_id, serp_query.query, finished["learnings"], finished["urls"])
+    emit("node_finished", node=node_id, query=serp_query.query,
+         learnings=finished["learnings"], urls=finished["urls"], replayed=True, source=source)
+    return {
+        "learnings": finished["learnings"],
+        "urls": finished["urls"],
+        "follow_up_questions": finished["follow_up_questions"]
+    }
+
+def recall_node(
+    serp_query: SerpQuery,
+    node_id: str,
+    journal: Optional[RunJournal]
+) -> Optional[Dict[str, Any]]:
+    """Looks up a fresh result for a similar query in the knowledge index of earlier runs."""
+    knowledge = get_knowledge()
+    if knowledge is None:
+        return None
+    known = knowledge.find_covered(serp_query.query, exclude_run=current_run())
+    if known is None:
+        return None
+    print(f"Reusing {len(known.learnings)} learnings from earlier research for: {serp_query.query}")
+    # Journaled like a searched node, so resuming this run does not depend on the index
+    if journal:
+        journal.record_node(
+            node_id,
+            query=serp_query.query,
+            research_goal=serp_query.research_goal,
+            learnings=known.learnings,
+            urls=known.urls,
+            follow_up_questions=known.follow_up_questions
+        )
+    return {
+        "learnings": known.learnings,
+        "urls": known.urls,
+        "follow_up_questions": known.follow_up_questions
+    }
+
+async def search_serp_query(serp_query: SerpQuery, node_id: str, registry: ResearchRegistry) -> SearchResponse:
+    """Searches for one SERP query, leaving out pages another branch already summarized."""
+    emit("node_started", node=node_id, query=serp_query.query,
+         research_goal=serp_query.research_goal)
+    
+    result = await get_runtime().get_firecrawl().search(
+        serp_query.query,
+        timeout=15000,
+        limit=SEARCH_RESULT_LIMIT
+    )
+    return registry.filter_results(result)
+
+def finish_node(
+    serp_query: SerpQuery,
+    node_id: str,
+    result: SearchResponse,
+    new_learnings: Dict[str, List[str]],
+    journal: Optional[RunJournal],
+    registry: ResearchRegistry
+) -> NodeResult:
+    """Journals a researched node and adds its learnings to the run-wide store."""
+    new_urls = [
+        item.get("url") for item in result["data"]
+        if item.get("url")
+    ]
+    
+    # Nodes that produced nothing (e.g. a failed search) are retried on resume
+    if journal and result["data"] and new_learnings["learnings"]:
+        journal.record_node(
+            node_id,
+            query=serp_query.query,
+            research_goal=serp_query.research_goal,
+            learnings=new_learnings["learnings"],
+            urls=new_urls,
+            follow_up_questions=new_learnings["followUpQuestions"]
+        )
+    
+    knowledge = get_knowledge()
+    if knowledge is not None and result["data"] and new_learnings["learnings"]:
+        knowledge.add(
+            serp_query.query,
+            serp_query.research_goal,
+            new_learnings["learnings"],
+            new_urls,
+            new_learnings["followUpQuestions"],
+            run_id=current_run() or (journal.run_id if journal else None)
+        )
+    
+    registry.learnings.add_all(new_learnings["learnings"], node_id, serp_query.query, new_urls)
+    registry.tree.record(node_id, serp_query.query, new_learnings["learnings"], new_urls)
+    emit("node_finished", node=node_id, query=serp_query.query,
+         learnings=new_learnings["learnings"], urls=new_urls, replayed=False)
+    return {
+        "learnings": new_learnings["learnings"],
+        "urls": new_urls,
+        "follow_up_questions": new_learnings["followUpQuestions"]
+    }
+
+async def research_serp_query(
+    serp_query: SerpQuery,
+    node_id: str,
+    num_follow_up_questions: int,
+    journal: Optional[RunJournal],
+    registry: ResearchRegistry
+) -> NodeResult:
+    """Search for one SERP query and extract its learnings, or replay it from the journal."""
+    with node_context(node_id), trace_span("research_serp_query", query=serp_query.query):
+        finished = replay_node(serp_query, node_id, journal, registry)
+        if finished is not None:
+            # Node already completed in a previous attempt of this run
+            return finished
+    
+        result = await search_serp_query(serp_query, node_id, registry)
+    
+        try:
+            # Process the search results
+            if result["data"]:
+                new_learnings = await process_serp_result(
+                    query=serp_query.query,
+                    result=result,
+                    num_follow_up_questions=num_follow_up_questions,
+                    research_goal=serp_query.research_goal
+                )
+            else:
+                new_learnings = {"learnings": [], "followUpQuestions": []}
+        except BaseException:
+            # The pages were never summarized; let other branches read them
+            registry.release_results(result)
+            raise
+    
+        return finish_node(serp_query, node_id, result, new_learnings, journal, registry)
+
+def time_left(deadline: Optional[float]) -> Optional[float]:
+    """Seconds until a `time.monotonic()` deadline, or None without a deadline."""
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+async def gather_until(aws: List[Awaitable[T]], deadline: Optional[float]) -> List[Optional[T]]:
+    """Like `asyncio.gather`, but work still running at `deadline` is cancelled and gives None."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    if not tasks:
+        return []
+    try:
+        await asyncio.wait(tasks, timeout=time_left(deadline))
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return [None if task.cancelled() else task.result() for task in tasks]
+
+def follow_up_query(serp_query: SerpQuery, follow_up_questions: List[str]) -> str:
+    """Builds the prompt for researching the follow-up directions of a finished query."""
+    return f"""
+    Previous research goal: {serp_query.research_goal}
+    Follow-up research directions: {' '.join(follow_up_questions)}
+    """.strip()
+
 async def deep_research(
     query: str,
     breadth: int,
     depth: int,
     learnings: List[str] = None,
-    visited_urls: List[str] = None
+    visited_urls: List[str] = None,
+    journal: Optional[RunJournal] = None,
+    node_id: str = "0",
+    registry: Optional[ResearchRegistry] = None,
+    deadline: Optional[float] = None
 ) -> ResearchResult:
     """
     Main research function that recursively explores a topic.
@@ -223,103 +539,93 @@ async def deep_research(
         query: Research query/topic
         breadth: Number of parallel searches to perform
         depth: How many levels deep to research
-        learnings: Previous learnings to build upon
+        learnings: Previous learnings to build upon, in addition to what the tree holds
         visited_urls: Previously visited URLs
+        journal: Run journal to record finished nodes in and to resume from
+        node_id: Position of this call in the research tree, used as the journal key
+        registry: Queries and URLs already used anywhere in the run, shared by all branches
+        deadline: `time.monotonic()` time at which unfinished branches are cancelled and
+            the learnings found so far are returned
     """
     learnings = learnings or []
     visited_urls = visited_urls or []
+    registry = registry or ResearchRegistry()
     
-    # Generate search queries
-    serp_queries = await generate_serp_queries(
-        query=query,
-        num_queries=breadth,
-        learnings=learnings
-    )
-    
-    # Create a semaphore to limit concurrent requests
-    semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
-    
-    async def process_query(serp_query: SerpQuery) -> ResearchResult:
-        async with semaphore:
+    # Generate search queries, reusing the journaled ones when resuming
+    serp_queries = load_planned_queries(node_id, journal, registry)
+    if serp_queries is None:
+        with node_context(node_id):
             try:
-                # Search for content
-                result = await firecrawl.search(
-                    serp_query.query,
-                    timeout=15000,
-                    limit=5
+                planned = await asyncio.wait_for(
+                    generate_serp_queries(
+                        query=query,
+                        num_queries=breadth,
+                        # What this branch and its ancestors learned, within a token budget
+                        learnings=learnings + registry.tree.context([node_id])
+                    ),
+                    time_left(deadline)
                 )
+            except asyncio.TimeoutError:
+                if time_left(deadline) != 0:
+                    raise
+                serp_queries = []
+            else:
+                serp_queries = accept_planned_queries(node_id, planned, journal, registry)
+    
+    async def process_query(serp_query: SerpQuery, child_id: str) -> bool:
+        # Concurrency and pacing are enforced per service by the run-wide scheduler
+        try:
+            # Calculate new breadth and depth for next iteration
+            new_breadth = max(1, breadth // 2)
+            new_depth = depth - 1
+            
+            # The node's learnings and URLs go into the run-wide tree, not into copied lists
+            node = await research_serp_query(
+                serp_query,
+                node_id=child_id,
+                num_follow_up_questions=new_breadth,
+                journal=journal,
+                registry=registry
+            )
+            
+            # If we have more depth to go, continue research
+            if new_depth > 0:
+                print(f"Researching deeper, breadth: {new_breadth}, depth: {new_depth}")
                 
-                # Collect new URLs
-                new_urls = [
-                    item.get("url") for item in result["data"]
-                    if item.get("url")
-                ]
-                
-                # Calculate new breadth and depth for next iteration
-                new_breadth = max(1, breadth // 2)
-                new_depth = depth - 1
-                
-                # Process the search results
-                new_learnings = await process_serp_result(
-                    query=serp_query.query,
-                    result=result,
-                    num_follow_up_questions=new_breadth
+                await deep_research(
+                    query=follow_up_query(serp_query, node["follow_up_questions"]),
+                    breadth=new_breadth,
+                    depth=new_depth,
+                    journal=journal,
+                    node_id=child_id,
+                    registry=registry,
+                    deadline=deadline
                 )
-                
-                all_learnings = learnings + new_learnings["learnings"]
-                all_urls = visited_urls + new_urls
-                
-                # If we have more depth to go, continue research
-                if new_depth > 0:
-                    print(f"Researching deeper, breadth: {new_breadth}, depth: {new_depth}")
-                    
-                    next_query = f"""
-                    Previous research goal: {serp_query.research_goal}
-                    Follow-up research directions: {' '.join(new_learnings["followUpQuestions"])}
-                    """.strip()
-                    
-                    return await deep_research(
-                        query=next_query,
-                        breadth=new_breadth,
-                        depth=new_depth,
-                        learnings=all_learnings,
-                        visited_urls=all_urls
-                    )
-                
-                return {
-                    "learnings": all_learnings,
-                    "visited_urls": all_urls
-                }
-                
-            except Exception as e:
-                if "Timeout" in str(e):
-                    print(f"Timeout error running query: {serp_query.query}: {e}")
-                else:
-                    print(f"Error running query: {serp_query.query}: {e}")
-                return {
-                    "learnings": [],
-                    "visited_urls": []
-                }
+            return True
+            
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError) or "Timeout" in str(e):
+                print(f"Timeout error running query: {serp_query.query}: {e}")
+            else:
+                print(f"Error running query: {serp_query.query}: {e}")
+            return False
     
     # Process all queries concurrently
-    results = await asyncio.gather(*[
-        process_query(query) for query in serp_queries
-    ])
-    
-    # Combine all results
-    all_learnings = list(set(
-        learning
-        for result in results
-        for learning in result["learnings"]
-    ))
+    results = await gather_until([
+        process_query(serp_query, f"{node_id}.{i}")
+        for i, serp_query in enumerate(serp_queries)
+    ], deadline)
     
-    all_urls = list(set(
-        url
-        for result in results
-        for url in result["visited_urls"]
-    ))
+    unfinished = sum(result is None for result in results)
+    if unfinished:
+        # Cancelled branches keep whatever their finished nodes already put in the tree
+        print(f"Research deadline reached, keeping what {unfinished} unfinished branches found so far")
+        emit("deadline_reached", node=node_id, branches=unfinished)
     
+    # Everything found below this node, read back from the tree, with near-duplicate
+    # learnings folded into one
+    found_learnings, found_urls = registry.tree.subtree(node_id)
     return {
-        "learnings": all_learnings,
-        "visited_urls": all_urls
-    }
\ No newline at end of file
+        "learnings": registry.learnings.canonical(learnings + found_learnings),
+        "visited_urls": list(dict.fromkeys(visited_urls + found_urls))
+    }
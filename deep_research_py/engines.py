@@ -0,0 +1,31 @@
+import functools
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from .breadth_first import deep_research_bfs
+from .deep_research import ResearchResult, deep_research
+from .frontier import deep_research_frontier
+from .journal import RunJournal
+from .knowledge import knowledge_run
+from .pipeline import deep_research_pipeline
+from .scheduler import call_deadline
+
+
+def _run_scope(engine: Callable[..., Awaitable[ResearchResult]]) -> Callable[..., Awaitable[ResearchResult]]:
+    """Makes the engine's deadline also stop the schedulers from retrying calls past it, and
+    keeps the run from reusing its own nodes through the knowledge index."""
+    @functools.wraps(engine)
+    async def run(*args: Any, deadline: Optional[float] = None,
+                  journal: Optional[RunJournal] = None, **kwargs: Any) -> ResearchResult:
+        with call_deadline(deadline), knowledge_run(journal.run_id if journal else None):
+            return await engine(*args, deadline=deadline, journal=journal, **kwargs)
+    return run
+
+
+# Research engines by name; all take (query, breadth, depth, journal, registry, deadline) as
+# keywords and share node ids and journal entries, so a run can be resumed with any of them
+ENGINES: Dict[str, Callable[..., Awaitable[ResearchResult]]] = {
+    "dfs": _run_scope(deep_research),
+    "bfs": _run_scope(deep_research_bfs),
+    "pipeline": _run_scope(deep_research_pipeline),
+    "frontier": _run_scope(deep_research_frontier),
+}
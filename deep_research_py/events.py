@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+EventSink = Callable[[str, Dict[str, Any]], None]
+
+_event_sink: ContextVar[Optional[EventSink]] = ContextVar("event_sink", default=None)
+
+
+def emit(event: str, **data: Any) -> None:
+    """Reports research progress (e.g. "node_started") to the sink of the current run, if any."""
+    sink = _event_sink.get()
+    if sink is not None:
+        sink(event, data)
+
+
+@contextmanager
+def event_sink(sink: EventSink) -> Iterator[None]:
+    """Sends the events emitted inside the block, including by tasks it starts, to `sink`."""
+    token = _event_sink.set(sink)
+    try:
+        yield
+    finally:
+        _event_sink.reset(token)
@@ -1,23 +1,17 @@
-from typing import List
-import asyncio
+from typing import List, Sequence
 import json
-from .ai.providers import openai_client
-from .prompt import system_prompt
+from .ai.providers import create_chat_completion
+from .prompt import FEEDBACK
+from .tracing import traced
 
+@traced("generate_feedback")
 async def generate_feedback(query: str) -> List[str]:
     """Generates follow-up questions to clarify research direction."""
     
-    # Run OpenAI call in thread pool since it's synchronous
-    response = await asyncio.get_event_loop().run_in_executor(
-        None,
-        lambda: openai_client.chat.completions.create(
-            model="o3-mini",
-            messages=[
-                {"role": "system", "content": system_prompt()},
-                {"role": "user", "content": f"Given this research topic: {query}, generate 3-5 follow-up questions to better understand the user's research needs. Return the response as a JSON object with a 'questions' array field."}
-            ],
-            response_format={ "type": "json_object" }
-        )
+    response = await create_chat_completion(
+        model="o3-mini",
+        messages=FEEDBACK.messages(topic=query),
+        response_format={ "type": "json_object" }
     )
     
     # Parse the JSON response
@@ -27,4 +21,12 @@ async def generate_feedback(query: str) -> List[str]:
     except json.JSONDecodeError as e:
         print(f"Error parsing JSON response: {e}")
         print(f"Raw response: {response.choices[0].message.content}")
-        return [] 
\ No newline at end of file
+        return []
+
+def combine_query(query: str, questions: Sequence[str], answers: Sequence[str]) -> str:
+    """Folds the follow-up questions and their answers into the query the research runs on."""
+    return f"""
+        Initial Query: {query}
+        Follow-up Questions and Answers:
+        {chr(10).join(f"Q: {q} A: {a}" for q, a in zip(questions, answers))}
+        """
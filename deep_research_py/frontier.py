@@ -0,0 +1,267 @@
+import asyncio
+import heapq
+import itertools
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+from .deep_research import (
+    SEARCH_RESULT_LIMIT,
+    NodeResult,
+    ResearchResult,
+    SerpQuery,
+    accept_planned_queries,
+    finish_node,
+    follow_up_query,
+    generate_serp_queries,
+    load_planned_queries,
+    process_serp_result,
+    replay_node,
+    search_serp_query,
+    time_left,
+)
+from .dedup import ResearchRegistry
+from .events import emit
+from .journal import RunJournal
+from .tracing import Usage, node_context, trace_span, track_usage
+
+# Research budget of a frontier run; once spent, no further queries are started. 0 is no limit.
+# The time budget is the run's deadline (--time-limit).
+FRONTIER_TOKEN_BUDGET = int(os.environ.get("DEEP_RESEARCH_FRONTIER_TOKENS", "0"))
+FRONTIER_COST_BUDGET = float(os.environ.get("DEEP_RESEARCH_FRONTIER_COST", "0"))
+
+# A node whose learnings were less than this share new to the run is not expanded further
+NOVELTY_THRESHOLD = float(os.environ.get("DEEP_RESEARCH_NOVELTY_THRESHOLD", "0.3"))
+
+# Nodes researched at the same time
+FRONTIER_WORKERS = int(os.environ.get("DEEP_RESEARCH_FRONTIER_WORKERS", "4"))
+
+
+@dataclass
+class FrontierNode:
+    """A planned SERP query waiting on the frontier."""
+    node_id: str
+    serp_query: SerpQuery
+    # Breadth and depth of the `deep_research` call this query was planned in
+    breadth: int
+    depth: int
+    # Estimated information gain of researching it, from what its parent found
+    priority: float = 1.0
+
+    @property
+    def num_follow_up_questions(self) -> int:
+        return max(1, self.breadth // 2)
+
+
+def information_gain(novelty: float, urls: int) -> float:
+    """Estimated value of a node's follow-ups: how new its learnings were to the run, and how
+    many of its search results were pages no other branch had read yet."""
+    return (novelty + min(1.0, urls / SEARCH_RESULT_LIMIT)) / 2
+
+
+class FrontierResearch:
+    """Researches the most promising planned queries first until a budget is spent.
+
+    Planned queries wait in a priority queue ordered by the information gain of the node that
+    planned them: the share of its learnings that were new to the run, and of its search
+    results that were unread pages. A node whose novelty falls below `novelty_threshold` is
+    not expanded, so branches that keep finding what the run already knows stop early, and
+    the budget goes to those that still find something new.
+    """
+
+    def __init__(
+        self,
+        breadth: int,
+        depth: int,
+        journal: Optional[RunJournal] = None,
+        registry: Optional[ResearchRegistry] = None,
+        deadline: Optional[float] = None,
+        token_budget: int = FRONTIER_TOKEN_BUDGET,
+        cost_budget: float = FRONTIER_COST_BUDGET,
+        novelty_threshold: float = NOVELTY_THRESHOLD,
+        workers: int = FRONTIER_WORKERS
+    ):
+        self.breadth = breadth
+        self.depth = depth
+        self.journal = journal
+        self.registry = registry or ResearchRegistry()
+        self.deadline = deadline
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.novelty_threshold = novelty_threshold
+        self.workers = max(1, workers)
+        self.usage = Usage()
+        # Entries: (-priority, depth in the tree, insertion order, node)
+        self._frontier: List[Tuple[float, int, int, FrontierNode]] = []
+        self._order = itertools.count()
+        self.stopped_early = 0
+
+    def spent(self) -> bool:
+        return (
+            (self.token_budget > 0 and self.usage.tokens >= self.token_budget)
+            or (self.cost_budget > 0 and self.usage.cost >= self.cost_budget)
+            or time_left(self.deadline) == 0
+        )
+
+    async def run(self, query: str) -> ResearchResult:
+        with track_usage() as self.usage:
+            serp_queries = load_planned_queries("0", self.journal, self.registry)
+            if serp_queries is None:
+                with node_context("0"):
+                    try:
+                        planned = await asyncio.wait_for(
+                            generate_serp_queries(query=query, num_queries=self.breadth),
+                            time_left(self.deadline)
+                        )
+                    except asyncio.TimeoutError:
+                        if time_left(self.deadline) != 0:
+                            raise
+                        planned = []
+                    serp_queries = accept_planned_queries("0", planned, self.journal, self.registry)
+            self._schedule("0", serp_queries, self.breadth, self.depth, 1.0)
+
+            running: Set["asyncio.Future[None]"] = set()
+            try:
+                while self._frontier or running:
+                    while self._frontier and len(running) < self.workers and not self.spent():
+                        node = heapq.heappop(self._frontier)[-1]
+                        running.add(asyncio.ensure_future(self._research(node)))
+                    if not running:
+                        break
+                    done, running = await asyncio.wait(
+                        running, timeout=time_left(self.deadline), return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if not done:
+                        break
+            finally:
+                for task in running:
+                    task.cancel()
+                await asyncio.gather(*running, return_exceptions=True)
+
+        unfinished = len(running) + len(self._frontier)
+        if time_left(self.deadline) == 0:
+            print(f"Research deadline reached, keeping the learnings found so far "
+                  f"({unfinished} nodes unfinished)")
+            emit("deadline_reached", node="0", branches=unfinished)
+        elif unfinished:
+            print(f"Research budget spent after {self.usage.tokens} tokens "
+                  f"(${self.usage.cost:.3f}), skipping {unfinished} planned queries")
+            emit("budget_spent", node="0", branches=unfinished, tokens=self.usage.tokens,
+                 cost=self.usage.cost)
+        if self.stopped_early:
+            print(f"Stopped {self.stopped_early} branches that found little new")
+
+        learnings, urls = self.registry.tree.subtree("0")
+        return {
+            "learnings": self.registry.learnings.canonical(learnings),
+            "visited_urls": urls
+        }
+
+    def _schedule(self, parent_id: str, serp_queries: List[SerpQuery], breadth: int, depth: int,
+                  priority: float) -> None:
+        for i, serp_query in enumerate(serp_queries):
+            node = FrontierNode(f"{parent_id}.{i}", serp_query, breadth, depth, priority)
+            heapq.heappush(
+                self._frontier, (-priority, node.node_id.count("."), next(self._order), node)
+            )
+
+    async def _research(self, node: FrontierNode) -> None:
+        try:
+            with node_context(node.node_id), trace_span("research_serp_query", query=node.serp_query.query):
+                finished, novelty = await self._research_node(node)
+                gain = information_gain(novelty, len(finished["urls"]))
+                emit("node_scored", node=node.node_id, novelty=novelty, gain=gain)
+                if node.depth - 1 <= 0 or self.spent():
+                    return
+                if novelty < self.novelty_threshold:
+                    self.stopped_early += 1
+                    return
+                await self._expand(node, finished, gain)
+        except Exception as e:
+            print(f"Error running query: {node.serp_query.query}: {e}")
+
+    async def _research_node(self, node: FrontierNode) -> Tuple[NodeResult, float]:
+        """Researches (or replays) a node; also returns the share of its learnings new to the run.
+
+        Learnings are added to the run-wide store synchronously when the node finishes, so the
+        growth of the store across that step is exactly what this node contributed.
+        """
+        known = len(self.registry.learnings)
+        finished = replay_node(node.serp_query, node.node_id, self.journal, self.registry)
+        if finished is None:
+            result = await search_serp_query(node.serp_query, node.node_id, self.registry)
+            try:
+                if result["data"]:
+                    new_learnings = await process_serp_result(
+                        query=node.serp_query.query,
+                        result=result,
+                        num_follow_up_questions=node.num_follow_up_questions,
+                        research_goal=node.serp_query.research_goal
+                    )
+                else:
+                    new_learnings = {"learnings": [], "followUpQuestions": []}
+            except BaseException:
+                self.registry.release_results(result)
+                raise
+            known = len(self.registry.learnings)
+            finished = finish_node(node.serp_query, node.node_id, result, new_learnings,
+                                   self.journal, self.registry)
+        if not finished["learnings"]:
+            return finished, 0.0
+        return finished, (len(self.registry.learnings) - known) / len(finished["learnings"])
+
+    async def _expand(self, node: FrontierNode, finished: NodeResult, gain: float) -> None:
+        """Plans the node's follow-up queries and puts them on the frontier."""
+        new_breadth = node.num_follow_up_questions
+        serp_queries = load_planned_queries(node.node_id, self.journal, self.registry)
+        if serp_queries is None:
+            with trace_span("plan_follow_ups"):
+                serp_queries = accept_planned_queries(
+                    node.node_id,
+                    await generate_serp_queries(
+                        query=follow_up_query(node.serp_query, finished["follow_up_questions"]),
+                        num_queries=new_breadth,
+                        learnings=self.registry.tree.context([node.node_id])
+                    ),
+                    self.journal,
+                    self.registry
+                )
+        self._schedule(node.node_id, serp_queries, new_breadth, node.depth - 1, gain)
+
+
+async def deep_research_frontier(
+    query: str,
+    breadth: int,
+    depth: int,
+    journal: Optional[RunJournal] = None,
+    registry: Optional[ResearchRegistry] = None,
+    deadline: Optional[float] = None,
+    token_budget: int = FRONTIER_TOKEN_BUDGET,
+    cost_budget: float = FRONTIER_COST_BUDGET,
+    novelty_threshold: float = NOVELTY_THRESHOLD
+) -> ResearchResult:
+    """
+    Budget-driven variant of `deep_research`.
+
+    Plans the same tree (same breadth halving, node ids and journal entries, so all engines
+    can resume each other's runs), but researches the planned queries best first by the
+    estimated information gain of their parent, stops expanding branches whose learnings are
+    mostly already known, and starts no new queries once the token, cost or time budget is
+    spent. `depth` is an upper bound rather than the depth every branch reaches.
+
+    Args:
+        query: Research query/topic
+        breadth: Number of parallel searches to perform at the first level
+        depth: How many levels deep to research at most
+        journal: Run journal to record finished nodes in and to resume from
+        registry: Queries and URLs already used anywhere in the run
+        deadline: `time.monotonic()` time at which unfinished nodes are cancelled and the
+            learnings found so far are returned
+        token_budget: Prompt and completion tokens after which no new query is started (0: none)
+        cost_budget: Estimated dollars after which no new query is started (0: none)
+        novelty_threshold: Share of new learnings below which a node is not expanded
+    """
+    return await FrontierResearch(
+        breadth, depth, journal, registry, deadline=deadline, token_budget=token_budget,
+        cost_budget=cost_budget, novelty_threshold=novelty_threshold
+    ).run(query)
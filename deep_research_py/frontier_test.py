@@ -0,0 +1,46 @@
+import pytest
+
+from .dedup import ResearchRegistry
+from .engines import ENGINES
+from .events import event_sink
+
+
+async def _research(**kwargs):
+    events = []
+    with event_sink(lambda event, data: events.append((event, data))):
+        result = await ENGINES["frontier"](
+            query="offline test topic", breadth=4, depth=3, registry=ResearchRegistry(), **kwargs
+        )
+    return result, [event for event, _ in events]
+
+
+async def test_unlimited_run_researches_the_tree(fake_runtime):
+    result, events = await _research(novelty_threshold=0.0)
+
+    assert result["learnings"] and result["visited_urls"]
+    assert "budget_spent" not in events
+    # Queries at every level below the root were researched
+    assert fake_runtime.firecrawl_app.stats.calls > 4
+
+
+@pytest.mark.parametrize("budget", [{"token_budget": 10_000}, {"cost_budget": 0.01}])
+async def test_budget_stops_new_queries(fake_runtime, budget):
+    await _research(novelty_threshold=0.0)
+    unlimited_searches = fake_runtime.firecrawl_app.stats.calls
+    fake_runtime.firecrawl_app.stats.calls = 0
+
+    # Spent by the plan and the first level, before the follow-ups are researched
+    result, events = await _research(novelty_threshold=0.0, **budget)
+
+    assert "budget_spent" in events
+    assert 0 < fake_runtime.firecrawl_app.stats.calls < unlimited_searches
+    assert result["learnings"]
+
+
+async def test_branches_with_little_novelty_are_not_expanded(fake_runtime):
+    _, events = await _research(novelty_threshold=1.1)
+
+    # Only the first level is researched: no node can be more than 100% new
+    assert fake_runtime.firecrawl_app.stats.calls == 4
+    assert events.count("node_scored") == 4
+    assert "budget_spent" not in events
@@ -0,0 +1,98 @@
+import json
+import os
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+DEFAULT_RUNS_DIR = os.environ.get("DEEP_RESEARCH_RUNS_DIR", "runs")
+
+
+class RunJournal:
+    """Append-only JSONL record of a research run, used to resume it after a failure.
+
+    Records are written as soon as each step completes:
+      - "run":     the combined query, breadth and depth the run was started with
+      - "queries": the SERP queries generated for a node of the research tree
+      - "node":    a finished SERP query with its learnings, URLs and follow-up questions
+    """
+
+    def __init__(self, run_id: str, directory: str = DEFAULT_RUNS_DIR):
+        self.run_id = run_id
+        self.path = os.path.join(directory, f"{run_id}.jsonl")
+        self.info: Dict[str, Any] = {}
+        self._queries: Dict[str, List[Dict[str, str]]] = {}
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def create(cls, query: str, breadth: int, depth: int,
+               directory: str = DEFAULT_RUNS_DIR) -> "RunJournal":
+        """Starts a new journal for a fresh run."""
+        run_id = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        os.makedirs(directory, exist_ok=True)
+        journal = cls(run_id, directory)
+        journal._append({"type": "run", "query": query, "breadth": breadth, "depth": depth})
+        return journal
+
+    @classmethod
+    def load(cls, run_id: str, directory: str = DEFAULT_RUNS_DIR) -> "RunJournal":
+        """Reads an existing journal so the run can be resumed."""
+        journal = cls(run_id, directory)
+        if not os.path.exists(journal.path):
+            raise FileNotFoundError(f"No journal found for run {run_id} at {journal.path}")
+
+        with open(journal.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a partially written last line behind
+                    continue
+                journal._apply(record)
+        return journal
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        if record["type"] == "run":
+            self.info = record
+        elif record["type"] == "queries":
+            self._queries[record["node"]] = record["queries"]
+        elif record["type"] == "node":
+            self._nodes[record["node"]] = record
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        self._apply(record)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_queries(self, node_id: str, queries: List[Dict[str, str]]) -> None:
+        self._append({"type": "queries", "node": node_id, "queries": queries})
+
+    def get_queries(self, node_id: str) -> Optional[List[Dict[str, str]]]:
+        return self._queries.get(node_id)
+
+    def record_node(
+        self,
+        node_id: str,
+        query: str,
+        research_goal: str,
+        learnings: List[str],
+        urls: List[str],
+        follow_up_questions: List[str],
+    ) -> None:
+        self._append({
+            "type": "node",
+            "node": node_id,
+            "query": query,
+            "research_goal": research_goal,
+            "learnings": learnings,
+            "urls": urls,
+            "follow_up_questions": follow_up_questions,
+        })
+
+    def get_node(self, node_id: str) -> Optional[Dict[str, Any]]:
+        return self._nodes.get(node_id)
+
+    @property
+    def completed_nodes(self) -> int:
+        return len(self._nodes)
@@ -0,0 +1,55 @@
+import pytest
+
+from .dedup import ResearchRegistry
+from .engines import ENGINES
+from .journal import RunJournal
+
+
+def test_records_survive_a_reload(tmp_path):
+    journal = RunJournal.create("topic", breadth=4, depth=2, directory=str(tmp_path))
+    queries = [{"query": "solar prices", "research_goal": "costs"}]
+    journal.record_queries("0", queries)
+    journal.record_node("0.0", query="solar prices", research_goal="costs",
+                        learnings=["Prices fell."], urls=["https://example.com"],
+                        follow_up_questions=["Why?"])
+
+    loaded = RunJournal.load(journal.run_id, str(tmp_path))
+    assert loaded.info["query"] == "topic" and loaded.info["depth"] == 2
+    assert loaded.get_queries("0") == queries
+    assert loaded.get_node("0.0")["learnings"] == ["Prices fell."]
+    assert loaded.get_node("0.1") is None
+    assert loaded.completed_nodes == 1
+
+
+def test_a_partially_written_last_line_is_ignored(tmp_path):
+    journal = RunJournal.create("topic", breadth=2, depth=1, directory=str(tmp_path))
+    journal.record_queries("0", [{"query": "q", "research_goal": ""}])
+    with open(journal.path, "a") as f:
+        f.write('{"type": "node", "node": "0.0", "lear')
+
+    loaded = RunJournal.load(journal.run_id, str(tmp_path))
+    assert loaded.get_queries("0") is not None
+    assert loaded.completed_nodes == 0
+
+
+def test_missing_journal_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        RunJournal.load("no-such-run", str(tmp_path))
+
+
+@pytest.mark.parametrize("engine", sorted(ENGINES))
+async def test_resumed_run_replays_finished_nodes(fake_runtime, tmp_path, engine):
+    journal = RunJournal.create("offline test topic", breadth=2, depth=2, directory=str(tmp_path))
+    first = await ENGINES[engine](query="offline test topic", breadth=2, depth=2,
+                                  journal=journal, registry=ResearchRegistry())
+    searches = fake_runtime.firecrawl_app.stats.calls
+    completions = fake_runtime.openai_client.stats.calls
+    assert searches > 0
+
+    resumed = await ENGINES[engine](query="offline test topic", breadth=2, depth=2,
+                                    journal=RunJournal.load(journal.run_id, str(tmp_path)),
+                                    registry=ResearchRegistry())
+    assert fake_runtime.firecrawl_app.stats.calls == searches
+    assert fake_runtime.openai_client.stats.calls == completions
+    assert sorted(resumed["learnings"]) == sorted(first["learnings"])
+    assert sorted(resumed["visited_urls"]) == sorted(first["visited_urls"])
@@ -0,0 +1,238 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+
+from .dedup import QUERY_SIMILARITY_THRESHOLD, jaccard, normalize_text, shingles
+from .ranking import tokenize
+
+DEFAULT_KNOWLEDGE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "deep-research-py", "knowledge.sqlite3"
+)
+
+# Findings older than this (in seconds) are neither reused nor kept
+KNOWLEDGE_MAX_AGE = float(os.environ.get("DEEP_RESEARCH_KNOWLEDGE_MAX_AGE", 7 * 24 * 3600))
+
+# A query counts as covered by an earlier one with at least this many learnings
+KNOWLEDGE_MIN_LEARNINGS = int(os.environ.get("DEEP_RESEARCH_KNOWLEDGE_MIN_LEARNINGS", "2"))
+
+# Learnings from earlier runs given to query generation
+KNOWLEDGE_SEED_LEARNINGS = int(os.environ.get("DEEP_RESEARCH_KNOWLEDGE_SEED_LEARNINGS", "10"))
+
+# Share of an entry's query terms that must appear in the lookup text for its learnings to be
+# given to query generation; the full-text match alone accepts any single shared word
+KNOWLEDGE_SEED_OVERLAP = float(os.environ.get("DEEP_RESEARCH_KNOWLEDGE_SEED_OVERLAP", "0.5"))
+
+# Terms of a lookup text used in the full-text query
+MAX_QUERY_TERMS = 32
+
+# Run whose nodes are being added; lookups leave them out, so a run only reuses earlier runs
+_current_run: ContextVar[Optional[str]] = ContextVar("knowledge_run", default=None)
+
+
+def current_run() -> Optional[str]:
+    return _current_run.get()
+
+
+@contextmanager
+def knowledge_run(run_id: Optional[str] = None) -> Iterator[str]:
+    """Tags nodes added to the index inside the block with `run_id` (a fresh id by default)
+    and leaves them out of lookups made inside it."""
+    run_id = run_id or uuid.uuid4().hex
+    token = _current_run.set(run_id)
+    try:
+        yield run_id
+    finally:
+        _current_run.reset(token)
+
+
+@dataclass
+class KnownNode:
+    """A SERP query researched by an earlier run and what it found."""
+    query: str
+    research_goal: str
+    learnings: List[str]
+    urls: List[str]
+    follow_up_questions: List[str]
+    created_at: float
+
+
+class KnowledgeIndex:
+    """Persistent full-text index of researched queries and their learnings, across runs.
+
+    Backed by SQLite FTS5 over each query and its learnings. Entries older than `max_age`
+    seconds are ignored and pruned when the index is opened.
+    """
+
+    def __init__(self, path: str = DEFAULT_KNOWLEDGE_PATH, max_age: float = KNOWLEDGE_MAX_AGE,
+                 similarity: float = QUERY_SIMILARITY_THRESHOLD,
+                 min_learnings: int = KNOWLEDGE_MIN_LEARNINGS):
+        self.path = path
+        self.max_age = max_age
+        self.similarity = similarity
+        self.min_learnings = min_learnings
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            " id INTEGER PRIMARY KEY,"
+            " query TEXT NOT NULL,"
+            " research_goal TEXT NOT NULL,"
+            " learnings TEXT NOT NULL,"
+            " urls TEXT NOT NULL,"
+            " follow_up_questions TEXT NOT NULL,"
+            " run_id TEXT,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS nodes_created ON nodes (created_at)")
+        # Raises sqlite3.OperationalError if this SQLite was built without FTS5
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS nodes_fts USING fts5(query, learnings)"
+        )
+        self.prune()
+
+    def prune(self) -> None:
+        """Deletes entries past `max_age`."""
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM nodes_fts WHERE rowid IN (SELECT id FROM nodes WHERE created_at < ?)",
+                (cutoff,)
+            )
+            self._conn.execute("DELETE FROM nodes WHERE created_at < ?", (cutoff,))
+
+    def add(self, query: str, research_goal: str, learnings: List[str], urls: List[str],
+            follow_up_questions: List[str], run_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                cursor = self._conn.execute(
+                    "INSERT INTO nodes (query, research_goal, learnings, urls, follow_up_questions,"
+                    " run_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (query, research_goal, json.dumps(learnings), json.dumps(urls),
+                     json.dumps(follow_up_questions), run_id, time.time())
+                )
+                self._conn.execute(
+                    "INSERT INTO nodes_fts (rowid, query, learnings) VALUES (?, ?, ?)",
+                    (cursor.lastrowid, query, "\n".join(learnings))
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def search(self, text: str, limit: int = 20,
+               exclude_run: Optional[str] = None) -> List[KnownNode]:
+        """Fresh entries whose query or learnings match `text`, best BM25 match first.
+
+        Entries added by run `exclude_run` are left out.
+        """
+        terms = list(dict.fromkeys(tokenize(text)))[:MAX_QUERY_TERMS]
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT n.query, n.research_goal, n.learnings, n.urls, n.follow_up_questions,"
+                " n.created_at FROM nodes_fts JOIN nodes n ON n.id = nodes_fts.rowid"
+                " WHERE nodes_fts MATCH ? AND n.created_at >= ?"
+                " AND (? IS NULL OR n.run_id IS NOT ?)"
+                " ORDER BY bm25(nodes_fts) LIMIT ?",
+                (match, time.time() - self.max_age, exclude_run, exclude_run, limit)
+            ).fetchall()
+        return [
+            KnownNode(
+                query=query,
+                research_goal=research_goal,
+                learnings=json.loads(learnings),
+                urls=json.loads(urls),
+                follow_up_questions=json.loads(follow_up_questions),
+                created_at=created_at,
+            )
+            for query, research_goal, learnings, urls, follow_up_questions, created_at in rows
+        ]
+
+    def find_covered(self, query: str, exclude_run: Optional[str] = None) -> Optional[KnownNode]:
+        """The most recent fresh entry for a query like `query` with enough learnings, if any.
+
+        Queries match the way the run registry deduplicates them: same normalized text, or
+        word shingles at least `similarity` Jaccard-similar.
+        """
+        normalized = normalize_text(query)
+        grams = shingles(query)
+        covered = [
+            node for node in self.search(query, exclude_run=exclude_run)
+            if len(node.learnings) >= self.min_learnings and (
+                normalize_text(node.query) == normalized
+                or jaccard(grams, shingles(node.query)) >= self.similarity
+            )
+        ]
+        if not covered:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return max(covered, key=lambda node: node.created_at)
+
+    def learnings_for(self, text: str, limit: int = KNOWLEDGE_SEED_LEARNINGS,
+                      exclude_run: Optional[str] = None,
+                      min_overlap: float = KNOWLEDGE_SEED_OVERLAP) -> List[str]:
+        """Up to `limit` distinct learnings of the entries best matching `text`.
+
+        Only entries whose query shares at least `min_overlap` of its terms with `text` count,
+        so an unrelated topic that happens to share a common word seeds nothing.
+        """
+        if limit <= 0:
+            return []
+        terms = set(tokenize(text))
+        learnings: Dict[str, None] = {}
+        for node in self.search(text, exclude_run=exclude_run):
+            node_terms = set(tokenize(node.query))
+            if not node_terms or len(node_terms & terms) / len(node_terms) < min_overlap:
+                continue
+            for learning in node.learnings:
+                learnings[learning] = None
+                if len(learnings) >= limit:
+                    return list(learnings)
+        return list(learnings)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_knowledge: Optional[KnowledgeIndex] = None
+_knowledge_failed = False
+
+
+def get_knowledge() -> Optional[KnowledgeIndex]:
+    """Returns the shared knowledge index, or None when DEEP_RESEARCH_KNOWLEDGE=0."""
+    global _knowledge, _knowledge_failed
+    if os.environ.get("DEEP_RESEARCH_KNOWLEDGE", "1").lower() in ("0", "false", "no", "off"):
+        return None
+    if _knowledge is None and not _knowledge_failed:
+        try:
+            _knowledge = KnowledgeIndex(
+                path=os.environ.get("DEEP_RESEARCH_KNOWLEDGE_PATH", DEFAULT_KNOWLEDGE_PATH),
+            )
+        except sqlite3.Error as e:
+            # e.g. SQLite without FTS5; research works the same, just without reuse
+            print(f"Knowledge index unavailable: {e}")
+            _knowledge_failed = True
+    return _knowledge
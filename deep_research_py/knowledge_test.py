@@ -0,0 +1,83 @@
+import pytest
+
+from .knowledge import KnowledgeIndex, current_run, knowledge_run
+
+
+@pytest.fixture
+def index():
+    knowledge = KnowledgeIndex(":memory:")
+    yield knowledge
+    knowledge.close()
+
+
+def _add(index, query, learnings, run_id=None):
+    index.add(query, f"goal of {query}", learnings, [f"https://example.com/{len(learnings)}"],
+              ["what next?"], run_id=run_id)
+
+
+def test_search_matches_query_and_learnings(index):
+    _add(index, "solar panel prices 2024", ["Module prices fell 40% in 2023."])
+    _add(index, "wind turbine supply chain", ["Blade factories moved to Asia."])
+
+    assert [node.query for node in index.search("solar prices")] == ["solar panel prices 2024"]
+    assert [node.query for node in index.search("blade factories")] == ["wind turbine supply chain"]
+    assert index.search("geothermal") == []
+
+
+def test_find_covered_needs_similar_query_and_enough_learnings(index):
+    _add(index, "solar panel prices 2024", ["Module prices fell 40% in 2023.", "Polysilicon is cheap."])
+    _add(index, "solar panel efficiency", ["Record cells reach 33%."])
+
+    covered = index.find_covered("Solar panel prices 2024")
+    assert covered is not None and covered.learnings[0] == "Module prices fell 40% in 2023."
+    # Too few learnings to count as covered
+    assert index.find_covered("solar panel efficiency") is None
+    assert index.find_covered("offshore wind auctions") is None
+    assert (index.hits, index.misses) == (1, 2)
+
+
+def test_lookups_leave_out_the_current_run(index):
+    learnings = ["Module prices fell 40% in 2023.", "Polysilicon is cheap."]
+    _add(index, "solar panel prices 2024", learnings, run_id="earlier")
+    _add(index, "solar panel prices in europe", ["EU tariffs were dropped."], run_id="current")
+
+    assert [n.query for n in index.search("solar panel prices", exclude_run="current")] == [
+        "solar panel prices 2024"
+    ]
+    assert index.find_covered("solar panel prices 2024", exclude_run="earlier") is None
+    assert index.learnings_for("solar prices", exclude_run="current") == learnings
+    assert len(index.search("solar panel prices")) == 2
+
+
+def test_knowledge_run_sets_and_restores_the_current_run():
+    assert current_run() is None
+    with knowledge_run("run-1") as run_id:
+        assert run_id == current_run() == "run-1"
+        with knowledge_run() as fresh:
+            assert fresh != "run-1" and current_run() == fresh
+        assert current_run() == "run-1"
+    assert current_run() is None
+
+
+def test_old_entries_are_ignored(index):
+    _add(index, "solar panel prices 2024", ["Module prices fell 40% in 2023."])
+    index.max_age = -1
+    assert index.search("solar") == []
+    index.prune()
+    assert index.stats()["entries"] == 0
+
+
+def test_unrelated_topics_seed_no_learnings(index):
+    _add(index, "medieval castle architecture", [
+        "Research on 2024 excavations in Europe dated the keep to 1150.",
+        "Castle prices at auction rose in 2024.",
+    ], run_id="earlier")
+
+    text = "solar panel prices in 2024 across europe research"
+    assert index.search(text)
+    assert index.learnings_for(text) == []
+    assert index.find_covered(text) is None
+    assert index.learnings_for("medieval castle architecture in europe") == [
+        "Research on 2024 excavations in Europe dated the keep to 1150.",
+        "Castle prices at auction rose in 2024.",
+    ]
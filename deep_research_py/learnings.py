@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from .ai.providers import count_tokens, create_chat_completion, get_encoder
+from .dedup import jaccard, normalize_text, shingles
+from .prompt import SUMMARIZE_LEARNINGS
+from .tracing import traced
+
+LEARNING_SIMILARITY_THRESHOLD = float(os.environ.get("LEARNING_SIMILARITY_THRESHOLD", "0.6"))
+
+# Token budget of the learnings in the final report prompt (the same 150k the report prompt
+# was always trimmed to)
+LEARNINGS_TOKEN_BUDGET = int(os.environ.get("DEEP_RESEARCH_LEARNINGS_BUDGET", "150000"))
+
+# "rank" keeps the best supported learnings when over budget; "summarize" first condenses them
+# with the LLM, which costs extra calls and is not deterministic
+COMPACT_MODE = os.environ.get("DEEP_RESEARCH_COMPACT_LEARNINGS", "rank")
+
+# Learnings per summarization request are capped at this many tokens
+SUMMARY_BATCH_TOKENS = 20_000
+
+# MinHash signature of MINHASH_BANDS * MINHASH_ROWS values; learnings sharing any band are
+# compared exactly. With 20 bands of 3, pairs at 0.6 similarity become candidates 99% of the time.
+MINHASH_BANDS = 20
+MINHASH_ROWS = 3
+_seed = random.Random(0x5EED)
+# One random 64-bit mask per signature position; XOR-ing the shingle hashes with a mask acts
+# as a cheap permutation of the hash space
+_MASKS = [_seed.getrandbits(64) for _ in range(MINHASH_BANDS * MINHASH_ROWS)]
+
+
+def _hash(gram: str) -> int:
+    return int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(grams: FrozenSet[str]) -> Tuple[int, ...]:
+    """MinHash signature of a shingle set; equal positions estimate Jaccard similarity."""
+    hashes = [_hash(gram) for gram in grams]
+    if not hashes:
+        return ()
+    return tuple(min(map(mask.__xor__, hashes)) for mask in _MASKS)
+
+
+@dataclass
+class Learning:
+    """A distinct learning and where it came from."""
+    text: str
+    nodes: List[str] = field(default_factory=list)
+    queries: List[str] = field(default_factory=list)
+    urls: List[str] = field(default_factory=list)
+    # Number of (near-)identical learnings folded into this one
+    occurrences: int = 1
+
+    @property
+    def support(self) -> int:
+        return self.occurrences + len(self.urls)
+
+    def merge(self, node: Optional[str], query: Optional[str], urls: Iterable[str]) -> None:
+        self.occurrences += 1
+        if node and node not in self.nodes:
+            self.nodes.append(node)
+        if query and query not in self.queries:
+            self.queries.append(query)
+        self.urls.extend(url for url in urls if url not in self.urls)
+
+
+class LearningStore:
+    """Run-wide learnings with near-duplicates merged and their provenance kept.
+
+    A learning whose normalized text matches an earlier one, or whose word shingles are at
+    least `similarity` Jaccard-similar to it (candidates found through MinHash banding), is
+    folded into the earlier learning, which gains its URLs, query and node.
+    """
+
+    def __init__(self, similarity: float = LEARNING_SIMILARITY_THRESHOLD):
+        self.similarity = similarity
+        self.items: List[Learning] = []
+        self._grams: List[FrozenSet[str]] = []
+        self._by_text: Dict[str, int] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def _find(self, normalized: str, grams: FrozenSet[str], signature: Tuple[int, ...]) -> Optional[int]:
+        if normalized in self._by_text:
+            return self._by_text[normalized]
+        candidates = set()
+        for band in range(MINHASH_BANDS if signature else 0):
+            key = (band, signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])
+            candidates.update(self._buckets.get(key, ()))
+        best = None
+        best_similarity = self.similarity
+        for index in sorted(candidates):
+            similarity = jaccard(grams, self._grams[index])
+            if similarity >= best_similarity:
+                best, best_similarity = index, similarity
+        return best
+
+    def add(self, text: str, node: Optional[str] = None, query: Optional[str] = None,
+            urls: Iterable[str] = ()) -> Learning:
+        """Adds a learning, or merges it into a near-duplicate; returns the stored learning."""
+        urls = list(urls)
+        normalized = normalize_text(text)
+        grams = shingles(text)
+        signature = minhash(grams)
+
+        index = self._find(normalized, grams, signature)
+        if index is not None:
+            self.items[index].merge(node, query, urls)
+            self._by_text.setdefault(normalized, index)
+            return self.items[index]
+
+        index = len(self.items)
+        learning = Learning(
+            text=text,
+            nodes=[node] if node else [],
+            queries=[query] if query else [],
+            urls=list(dict.fromkeys(urls)),
+        )
+        self.items.append(learning)
+        self._grams.append(grams)
+        self._by_text[normalized] = index
+        for band in range(MINHASH_BANDS if signature else 0):
+            key = (band, signature[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS])
+            self._buckets.setdefault(key, []).append(index)
+        return learning
+
+    def add_all(self, texts: Iterable[str], node: Optional[str] = None, query: Optional[str] = None,
+                urls: Iterable[str] = ()) -> None:
+        urls = list(urls)
+        for text in texts:
+            self.add(text, node, query, urls)
+
+    def canonical(self, texts: Iterable[str]) -> List[str]:
+        """Maps learnings to the stored learning they were merged into, without repeats.
+
+        Texts the store has never seen are kept as they are.
+        """
+        result: Dict[str, None] = {}
+        for text in texts:
+            index = self._by_text.get(normalize_text(text))
+            result[self.items[index].text if index is not None else text] = None
+        return list(result)
+
+    def texts(self) -> List[str]:
+        return [learning.text for learning in self.items]
+
+    async def compact(self, budget: int = LEARNINGS_TOKEN_BUDGET,
+                      mode: str = COMPACT_MODE) -> List[Learning]:
+        """Learnings that fit in `budget` tokens, condensed rather than cut off at an arbitrary point.
+
+        In "summarize" mode, learnings are condensed with the LLM branch by branch, from the
+        deepest level of the research tree up to the root, until they fit. Whatever is still
+        over budget (or everything, in "rank" mode) keeps the best supported learnings.
+        """
+        learnings = list(self.items)
+        if _total_tokens(learnings) <= budget:
+            return learnings
+
+        if mode == "summarize":
+            depth = max((node.count(".") for learning in learnings for node in learning.nodes), default=0)
+            for level in range(depth, -1, -1):
+                learnings = await _summarize_level(learnings, level, budget)
+                if _total_tokens(learnings) <= budget:
+                    return learnings
+
+        # Keep the learnings seen most often and from most sources, in their original order
+        ranked = sorted(range(len(learnings)), key=lambda i: (-learnings[i].support, i))
+        kept = set()
+        used = 0
+        for i in ranked:
+            tokens = count_tokens(learnings[i].text)
+            if used + tokens <= budget:
+                kept.add(i)
+                used += tokens
+        if len(kept) < len(learnings):
+            print(f"Left out {len(learnings) - len(kept)} of {len(learnings)} learnings to fit the report budget")
+        return [learnings[i] for i in sorted(kept)]
+
+
+def _total_tokens(learnings: List[Learning]) -> int:
+    encoded = get_encoder().encode_ordinary_batch([learning.text for learning in learnings])
+    return sum(len(tokens) for tokens in encoded)
+
+
+def branch(node: str, level: int) -> str:
+    """Ancestor of a node at `level` (0 is the root "0")."""
+    return ".".join(node.split(".")[:level + 1])
+
+
+async def _summarize_level(learnings: List[Learning], level: int, budget: int) -> List[Learning]:
+    """Condenses the learnings of every branch at `level` in parallel."""
+    groups: Dict[str, List[Learning]] = {}
+    for learning in learnings:
+        key = branch(learning.nodes[0], level) if learning.nodes else "0"
+        groups.setdefault(key, []).append(learning)
+
+    ratio = budget / _total_tokens(learnings)
+
+    async def condense(key: str, group: List[Learning]) -> List[Learning]:
+        if len(group) < 2:
+            return group
+        condensed = []
+        batch: List[Learning] = []
+        batches = []
+        for learning in group:
+            if batch and _total_tokens(batch) + count_tokens(learning.text) > SUMMARY_BATCH_TOKENS:
+                batches.append(batch)
+                batch = []
+            batch.append(learning)
+        batches.append(batch)
+
+        for batch in batches:
+            try:
+                texts = await summarize_learnings(
+                    [learning.text for learning in batch],
+                    max(1, int(len(batch) * ratio))
+                )
+            except Exception as e:
+                print(f"Error summarizing learnings: {e}")
+                texts = []
+            if not texts:
+                condensed.extend(batch)
+                continue
+            # A summary stands for the whole batch, so it inherits all of its provenance
+            urls = list(dict.fromkeys(url for learning in batch for url in learning.urls))
+            queries = list(dict.fromkeys(q for learning in batch for q in learning.queries))
+            occurrences = sum(learning.occurrences for learning in batch)
+            condensed.extend(
+                Learning(text=text, nodes=[key], queries=queries, urls=urls,
+                         occurrences=max(1, occurrences // len(texts)))
+                for text in texts
+            )
+        return condensed
+
+    results = await asyncio.gather(*[condense(key, group) for key, group in groups.items()])
+    return [learning for group in results for learning in group]
+
+
+@traced("summarize_learnings")
+async def summarize_learnings(learnings: List[str], max_learnings: int) -> List[str]:
+    """Condenses a list of learnings into at most `max_learnings`, keeping distinct facts."""
+    learnings_string = "\n".join(f"<learning>\n{learning}\n</learning>" for learning in learnings)
+    response = await create_chat_completion(
+        model="o3-mini",
+        messages=SUMMARIZE_LEARNINGS.messages(max_learnings=max_learnings, learnings=learnings_string),
+        response_format={ "type": "json_object" }
+    )
+    try:
+        result = json.loads(response.choices[0].message.content)
+        return [str(learning) for learning in result.get("learnings", [])][:max_learnings]
+    except json.JSONDecodeError as e:
+        print(f"Error parsing JSON response: {e}")
+        return []
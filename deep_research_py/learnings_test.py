@@ -0,0 +1,83 @@
+import pytest
+
+from .ai.providers import count_tokens
+from .dedup import jaccard, shingles
+from .learnings import LearningStore, _total_tokens, minhash
+
+FACT = "Solar module prices in Europe fell by 25 percent during 2023 because of Chinese oversupply."
+REWORDED = "Solar module prices in Europe fell by 25 percent during 2023 due to Chinese oversupply."
+OTHER = "Offshore wind auctions in the North Sea attracted no bidders in the autumn 2023 round."
+
+
+def test_minhash_estimates_jaccard_similarity():
+    a, b = shingles(FACT), shingles(REWORDED)
+    signature_a, signature_b = minhash(a), minhash(b)
+    agreement = sum(x == y for x, y in zip(signature_a, signature_b)) / len(signature_a)
+    assert abs(agreement - jaccard(a, b)) < 0.2
+    assert minhash(frozenset()) == ()
+
+
+def test_near_duplicates_are_merged_with_their_provenance():
+    store = LearningStore(similarity=0.6)
+    # Enough unrelated learnings that the duplicate is only found through its MinHash bands
+    for i in range(50):
+        store.add(" ".join(f"t{i}w{j}" for j in range(12)) + ".")
+    first = store.add(FACT, node="0.0", query="solar prices", urls=["https://a.example"])
+    merged = store.add(REWORDED, node="0.1", query="module costs", urls=["https://b.example"])
+    store.add(OTHER, node="0.2")
+
+    assert merged is first and len(store) == 52
+    assert first.nodes == ["0.0", "0.1"] and first.queries == ["solar prices", "module costs"]
+    assert first.urls == ["https://a.example", "https://b.example"]
+    assert first.occurrences == 2 and first.support == 4
+    assert store.canonical([REWORDED, FACT, "never seen"]) == [FACT, "never seen"]
+
+
+def test_normalized_duplicates_are_merged_below_the_threshold():
+    store = LearningStore(similarity=1.0)
+    store.add(FACT)
+    store.add(FACT.upper() + "  ")
+    store.add(REWORDED)
+    assert store.texts() == [FACT, REWORDED]
+
+
+async def test_compact_by_rank_keeps_the_best_supported_learnings(fake_runtime):
+    store = LearningStore()
+    texts = [f"Learning {i}: " + " ".join(f"fact{i}x{j}" for j in range(8)) for i in range(6)]
+    for i, text in enumerate(texts):
+        store.add(text, node=f"0.{i}", urls=[f"https://{i}.example/{j}" for j in range(i % 3)])
+    budget = _total_tokens(store.items[:3])
+
+    kept = await store.compact(budget=budget, mode="rank")
+
+    assert _total_tokens(kept) <= budget and len(kept) == 3
+    # Two URLs each for learnings 2 and 5, one for 1 and 4; ties go to the earlier learning
+    assert [learning.text for learning in kept] == [texts[1], texts[2], texts[5]]
+    assert await store.compact(budget=10 ** 6, mode="rank") == store.items
+
+
+async def test_compact_by_summarize_condenses_each_branch(fake_runtime):
+    store = LearningStore()
+    for branch in range(2):
+        for i in range(6):
+            store.add(f"Branch {branch} learning {i}: " + " ".join(f"w{branch}{i}{j}" for j in range(60)),
+                      node=f"0.{branch}.{i}", query=f"query {branch}", urls=[f"https://{branch}.example/{i}"])
+    budget = _total_tokens(store.items) // 2
+
+    kept = await store.compact(budget=budget, mode="summarize")
+
+    assert _total_tokens(kept) <= budget
+    assert fake_runtime.openai_client.stats.by_kind
+    # Summaries stand for a whole branch and keep its sources
+    summaries = [learning for learning in kept if learning.text not in store.texts()]
+    assert summaries and {learning.nodes[0] for learning in summaries} <= {"0.0", "0.1"}
+    for learning in summaries:
+        branch = learning.nodes[0][-1]
+        assert learning.queries == [f"query {branch}"]
+        assert learning.urls == [f"https://{branch}.example/{i}" for i in range(6)]
+
+
+@pytest.mark.parametrize("text", ["plain ascii", "日本語のテキスト", ""])
+def test_learning_budgets_count_real_tokens(fake_runtime, text):
+    # The byte-level test encoding makes every UTF-8 byte a token
+    assert count_tokens(text) == len(text.encode("utf-8"))
@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import os
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from .ai.providers import count_tokens, get_encoder, trim_prompts
+from .cleaning import PageStats, clean_pages
+from .events import emit
+from .ranking import select_chunks
+from .runtime import get_runtime
+from .tracing import reset_tracer, trace_span
+
+if TYPE_CHECKING:
+    from .deep_research import SearchResponse
+
+# Token budget of each page in the learnings prompt when pages are not ranked
+PAGE_CONTEXT_SIZE = 25_000
+
+# Token budget shared by all pages of a search response when their chunks are ranked
+PAGE_TOKEN_BUDGET = int(os.environ.get("DEEP_RESEARCH_PAGE_TOKEN_BUDGET", "15000"))
+
+RANK_CHUNKS = os.environ.get("DEEP_RESEARCH_RANK_CHUNKS", "1") != "0"
+
+# Responses smaller than this (in characters) are prepared inline; shipping them to a worker
+# would cost more than the work itself
+PAGE_OFFLOAD_MIN_CHARS = int(os.environ.get("DEEP_RESEARCH_PAGE_OFFLOAD_MIN_CHARS", "50000"))
+
+CLEAN_PAGES = os.environ.get("DEEP_RESEARCH_CLEAN_PAGES", "1") != "0"
+
+
+def prepare_pages(
+    pages: List[str],
+    urls: Optional[List[str]] = None,
+    context_size: int = PAGE_CONTEXT_SIZE,
+    clean: bool = CLEAN_PAGES,
+    query: Optional[str] = None,
+    budget: int = PAGE_TOKEN_BUDGET
+) -> Tuple[List[str], List[PageStats]]:
+    """Turns the scraped markdown of one search response into prompt-ready page texts.
+
+    With a `query`, the pages' chunks most relevant to it are packed into `budget` tokens
+    shared by all pages; otherwise each page is cut to its first `context_size` tokens.
+    Pure CPU work on plain strings, so it can run in a worker process.
+    """
+    stats: List[PageStats] = []
+    if clean:
+        pages, stats = clean_pages(pages, urls)
+    if query is None:
+        return trim_prompts(pages, context_size), stats
+    # A token is at least one byte and a character at most four (CJK text can be a token per
+    # character or more), so only responses under a quarter of the budget skip counting
+    if sum(len(page) for page in pages) * 4 <= budget:
+        return pages, stats
+    return select_chunks(pages, query, budget, count_tokens), stats
+
+
+def init_page_worker() -> None:
+    """Initializer of page worker processes."""
+    # Spans recorded in a worker would never reach the parent's tracer, so don't keep them
+    reset_tracer(max_spans=0)
+    get_encoder()
+
+
+async def prepare_search_response(
+    result: "SearchResponse",
+    query: Optional[str] = None,
+    context_size: int = PAGE_CONTEXT_SIZE
+) -> List[str]:
+    """Prepares the pages of a search response off the event loop, in one batch per response.
+
+    `query` (the search query and its research goal) selects the relevant parts of the pages,
+    unless ranking is turned off with DEEP_RESEARCH_RANK_CHUNKS=0.
+    """
+    query = query if RANK_CHUNKS else None
+    items = [item for item in result["data"] if item.get("markdown")]
+    pages = [item["markdown"] for item in items]
+    urls = [item.get("url") or "" for item in items]
+    with trace_span("prepare_pages", "cpu", pages=len(pages)) as span:
+        span.bytes = sum(len(page) for page in pages)
+        contents, stats = await _run_prepare_pages(pages, urls, query, context_size, span.bytes)
+
+        if stats:
+            saved = sum(page.tokens_saved for page in stats)
+            span.attrs["tokens_saved"] = saved
+            emit("pages_cleaned", pages=[
+                {"url": page.url, "tokens_saved": page.tokens_saved,
+                 "boilerplate_blocks": page.boilerplate_blocks,
+                 "link_blocks": page.link_blocks, "duplicate_blocks": page.duplicate_blocks}
+                for page in stats
+            ], tokens_saved=saved)
+        # Pages that were nothing but boilerplate or repeats
+        return [content for content in contents if content]
+
+
+async def _run_prepare_pages(
+    pages: List[str],
+    urls: List[str],
+    query: Optional[str],
+    context_size: int,
+    size: int
+) -> Tuple[List[str], List[PageStats]]:
+    runtime = get_runtime()
+    executor = runtime.get_page_executor()
+    if executor is None or size < PAGE_OFFLOAD_MIN_CHARS:
+        return prepare_pages(pages, urls, context_size, query=query)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            executor, functools.partial(prepare_pages, pages, urls, context_size, query=query)
+        )
+    except BrokenProcessPool as e:
+        # A worker died (e.g. killed for memory); start a new pool for the next response
+        print(f"Page worker pool failed, preparing pages inline: {e}")
+        runtime.close_page_executor()
+        return prepare_pages(pages, urls, context_size, query=query)
@@ -0,0 +1,86 @@
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from benchmarks.fakes import FakeBehaviour, FakeFirecrawlApp, byte_encoding
+
+from .pages import PAGE_OFFLOAD_MIN_CHARS, prepare_pages, prepare_search_response
+from .runtime import Runtime, RuntimeConfig, set_runtime
+
+
+def _init_offline_worker() -> None:
+    """Worker initializer that counts tokens per byte, as the tests' runtime does."""
+    set_runtime(Runtime(config=RuntimeConfig(page_executor="inline"), encoder=byte_encoding()))
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(1)
+        self.submitted = 0
+
+    def submit(self, *args, **kwargs):
+        self.submitted += 1
+        return super().submit(*args, **kwargs)
+
+
+class BrokenExecutor:
+    def submit(self, *args, **kwargs):
+        future = Future()
+        future.set_exception(BrokenProcessPool("worker killed"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def _response(page_kb: int, results: int = 5):
+    return FakeFirecrawlApp(FakeBehaviour(latency=0), page_kb=page_kb, results=results).search("solar prices")
+
+
+def _inline(response, query):
+    items = [item for item in response["data"] if item.get("markdown")]
+    contents, _ = prepare_pages([item["markdown"] for item in items],
+                                [item["url"] for item in items], query=query)
+    return [content for content in contents if content]
+
+
+@pytest.mark.parametrize("query", ["solar prices", None])
+async def test_large_responses_are_prepared_in_the_pool(fake_runtime, query):
+    response = _response(page_kb=40)
+    assert sum(len(item["markdown"]) for item in response["data"]) >= PAGE_OFFLOAD_MIN_CHARS
+    executor = fake_runtime._page_executor = CountingExecutor()
+
+    assert await prepare_search_response(response, query) == _inline(response, query)
+    assert executor.submitted == 1
+
+
+async def test_small_responses_are_prepared_inline(fake_runtime):
+    response = _response(page_kb=1, results=2)
+    executor = fake_runtime._page_executor = CountingExecutor()
+
+    assert await prepare_search_response(response, "solar prices") == _inline(response, "solar prices")
+    assert executor.submitted == 0
+
+
+async def test_process_pool_matches_inline_preparation(fake_runtime, capsys):
+    response = _response(page_kb=40)
+    fake_runtime._page_executor = ProcessPoolExecutor(
+        1, mp_context=multiprocessing.get_context("spawn"), initializer=_init_offline_worker
+    )
+    try:
+        assert await prepare_search_response(response, "solar prices") == _inline(response, "solar prices")
+    finally:
+        fake_runtime.close_page_executor(wait=True)
+    # Not the inline fallback of a failed pool
+    assert "Page worker pool failed" not in capsys.readouterr().out
+
+
+async def test_a_broken_pool_falls_back_to_inline_and_is_replaced(fake_runtime, capsys):
+    response = _response(page_kb=40)
+    fake_runtime._page_executor = BrokenExecutor()
+
+    assert await prepare_search_response(response, "solar prices") == _inline(response, "solar prices")
+    assert fake_runtime._page_executor is None
+    assert "Page worker pool failed" in capsys.readouterr().out
@@ -0,0 +1,246 @@
+import asyncio
+import os
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .deep_research import (
+    NodeResult,
+    ResearchResult,
+    SearchResponse,
+    SerpQuery,
+    accept_planned_queries,
+    extract_learnings,
+    finish_node,
+    follow_up_query,
+    generate_serp_queries,
+    load_planned_queries,
+    replay_node,
+    search_serp_query,
+    time_left,
+)
+from .dedup import ResearchRegistry
+from .events import emit
+from .journal import RunJournal
+from .pages import prepare_search_response
+from .tracing import node_context, trace_span
+
+# Workers per stage; each stage only ever waits on its own service (Firecrawl, the page
+# pool, OpenAI), whose pacing is still left to the run-wide schedulers
+SEARCH_WORKERS = int(os.environ.get("DEEP_RESEARCH_PIPELINE_SEARCH_WORKERS", "4"))
+PREPARE_WORKERS = int(os.environ.get("DEEP_RESEARCH_PIPELINE_PREPARE_WORKERS", "2"))
+EXTRACT_WORKERS = int(os.environ.get("DEEP_RESEARCH_PIPELINE_EXTRACT_WORKERS", "8"))
+
+# Capacity of the queues between stages; a full queue stops the stage before it from
+# searching or preparing further ahead of what the next stage can take
+STAGE_QUEUE_SIZE = int(os.environ.get("DEEP_RESEARCH_PIPELINE_QUEUE_SIZE", "4"))
+
+
+@dataclass
+class NodeTask:
+    """One SERP query of the research tree on its way through the pipeline."""
+    node_id: str
+    serp_query: SerpQuery
+    # Breadth and depth of the `deep_research` call this query was planned in
+    breadth: int
+    depth: int
+    result: Optional[SearchResponse] = None
+    contents: List[str] = field(default_factory=list)
+    # Set once the node is finished, or when it was replayed from the journal instead of searched
+    node: Optional[NodeResult] = None
+
+    @property
+    def num_follow_up_questions(self) -> int:
+        return max(1, self.breadth // 2)
+
+
+class ResearchPipeline:
+    """Search, page preparation and learning extraction as stages with their own workers.
+
+    Nodes flow from the frontier through a search stage, a bounded queue, a preparation
+    stage, another bounded queue and an extraction stage, which also plans the node's
+    follow-up queries and puts them back on the frontier. The frontier is unbounded so that
+    extraction never waits on searching; the forward queues are bounded, so a slow stage
+    holds back the ones before it instead of letting finished work pile up.
+    """
+
+    def __init__(
+        self,
+        breadth: int,
+        depth: int,
+        journal: Optional[RunJournal] = None,
+        registry: Optional[ResearchRegistry] = None,
+        search_workers: int = SEARCH_WORKERS,
+        prepare_workers: int = PREPARE_WORKERS,
+        extract_workers: int = EXTRACT_WORKERS,
+        queue_size: int = STAGE_QUEUE_SIZE,
+        deadline: Optional[float] = None
+    ):
+        self.breadth = breadth
+        self.depth = depth
+        self.deadline = deadline
+        self.journal = journal
+        self.registry = registry or ResearchRegistry()
+        self.workers = {"search": search_workers, "prepare": prepare_workers, "extract": extract_workers}
+        self.frontier: "asyncio.Queue[NodeTask]" = asyncio.Queue()
+        self.searched: "asyncio.Queue[NodeTask]" = asyncio.Queue(maxsize=queue_size)
+        self.prepared: "asyncio.Queue[NodeTask]" = asyncio.Queue(maxsize=queue_size)
+        self._pending = 0
+        self._done = asyncio.Event()
+
+    async def run(self, query: str) -> ResearchResult:
+        serp_queries = load_planned_queries("0", self.journal, self.registry)
+        if serp_queries is None:
+            with node_context("0"):
+                try:
+                    planned = await asyncio.wait_for(
+                        generate_serp_queries(query=query, num_queries=self.breadth),
+                        time_left(self.deadline)
+                    )
+                except asyncio.TimeoutError:
+                    if time_left(self.deadline) != 0:
+                        raise
+                    planned = []
+                serp_queries = accept_planned_queries("0", planned, self.journal, self.registry)
+        self._schedule("0", serp_queries, self.breadth, self.depth)
+
+        stages = {"search": self._search_worker, "prepare": self._prepare_worker,
+                  "extract": self._extract_worker}
+        tasks = [
+            asyncio.create_task(stages[stage]())
+            for stage, count in self.workers.items()
+            for _ in range(max(1, count))
+        ]
+        try:
+            if self._pending:
+                await asyncio.wait_for(self._done.wait(), time_left(self.deadline))
+        except asyncio.TimeoutError:
+            # Everything still queued or in flight is dropped; finished nodes are kept
+            print(f"Research deadline reached, keeping the learnings found so far "
+                  f"({self._pending} nodes unfinished)")
+            emit("deadline_reached", node="0", branches=self._pending)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        learnings, urls = self.registry.tree.subtree("0")
+        return {
+            "learnings": self.registry.learnings.canonical(learnings),
+            "visited_urls": urls
+        }
+
+    def _schedule(self, parent_id: str, serp_queries: List[SerpQuery], breadth: int, depth: int) -> None:
+        for i, serp_query in enumerate(serp_queries):
+            self._pending += 1
+            self.frontier.put_nowait(NodeTask(f"{parent_id}.{i}", serp_query, breadth, depth))
+
+    def _finish(self, task: NodeTask) -> None:
+        self._pending -= 1
+        if self._pending == 0:
+            self._done.set()
+
+    def _fail(self, task: NodeTask, e: Exception) -> None:
+        print(f"Error running query: {task.serp_query.query}: {e}")
+        if task.node is None and task.result is not None:
+            # The pages were never summarized; let other branches read them
+            self.registry.release_results(task.result)
+        self._finish(task)
+
+    async def _search_worker(self) -> None:
+        while True:
+            task = await self.frontier.get()
+            try:
+                with node_context(task.node_id):
+                    # Nodes completed in a previous attempt of this run only need their follow-ups
+                    task.node = replay_node(task.serp_query, task.node_id, self.journal, self.registry)
+                    if task.node is None:
+                        task.result = await search_serp_query(task.serp_query, task.node_id, self.registry)
+            except Exception as e:
+                self._fail(task, e)
+                continue
+            await self.searched.put(task)
+
+    async def _prepare_worker(self) -> None:
+        while True:
+            task = await self.searched.get()
+            if task.node is None and task.result["data"]:
+                try:
+                    with node_context(task.node_id):
+                        query = f"{task.serp_query.query} {task.serp_query.research_goal}".strip()
+                        task.contents = await prepare_search_response(task.result, query=query)
+                except Exception as e:
+                    self._fail(task, e)
+                    continue
+            await self.prepared.put(task)
+
+    async def _extract_worker(self) -> None:
+        while True:
+            task = await self.prepared.get()
+            try:
+                with node_context(task.node_id):
+                    if task.node is not None:
+                        await self._expand(task, task.node)
+                        continue
+                    if task.result["data"]:
+                        new_learnings = await extract_learnings(
+                            task.serp_query.query,
+                            task.contents,
+                            num_follow_up_questions=task.num_follow_up_questions
+                        )
+                    else:
+                        new_learnings = {"learnings": [], "followUpQuestions": []}
+                    task.node = finish_node(task.serp_query, task.node_id, task.result,
+                                            new_learnings, self.journal, self.registry)
+                    await self._expand(task, task.node)
+            except Exception as e:
+                self._fail(task, e)
+
+    async def _expand(self, task: NodeTask, node: NodeResult) -> None:
+        """Puts a finished node's follow-up queries on the frontier."""
+        new_breadth = task.num_follow_up_questions
+        new_depth = task.depth - 1
+        if new_depth > 0:
+            serp_queries = load_planned_queries(task.node_id, self.journal, self.registry)
+            if serp_queries is None:
+                with trace_span("plan_follow_ups"):
+                    serp_queries = accept_planned_queries(
+                        task.node_id,
+                        await generate_serp_queries(
+                            query=follow_up_query(task.serp_query, node["follow_up_questions"]),
+                            num_queries=new_breadth,
+                            learnings=self.registry.tree.context([task.node_id])
+                        ),
+                        self.journal,
+                        self.registry
+                    )
+            self._schedule(task.node_id, serp_queries, new_breadth, new_depth)
+        self._finish(task)
+
+
+async def deep_research_pipeline(
+    query: str,
+    breadth: int,
+    depth: int,
+    journal: Optional[RunJournal] = None,
+    registry: Optional[ResearchRegistry] = None,
+    deadline: Optional[float] = None
+) -> ResearchResult:
+    """
+    Pipelined variant of `deep_research`.
+
+    Explores the same tree (same breadth halving, node ids and journal entries, so all
+    engines can resume each other's runs), but searching, page preparation and learning
+    extraction run as separate stages connected by bounded queues. Firecrawl keeps searching
+    while earlier results are being summarized, instead of every branch holding on to its
+    turn from search to extraction.
+
+    Args:
+        query: Research query/topic
+        breadth: Number of parallel searches to perform at the first level
+        depth: How many levels deep to research
+        journal: Run journal to record finished nodes in and to resume from
+        registry: Queries and URLs already used anywhere in the run
+        deadline: `time.monotonic()` time at which unfinished nodes are cancelled and the
+            learnings found so far are returned
+    """
+    return await ResearchPipeline(breadth, depth, journal, registry, deadline=deadline).run(query)
@@ -0,0 +1,52 @@
+from . import pipeline as pipeline_module
+from .dedup import ResearchRegistry, normalize_url
+from .engines import ENGINES
+from .journal import RunJournal
+from .pipeline import ResearchPipeline
+
+
+async def _finished_nodes(engine, tmp_path):
+    journal = RunJournal.create("offline test topic", breadth=3, depth=2,
+                                directory=str(tmp_path / engine))
+    await ENGINES[engine](query="offline test topic", breadth=3, depth=2, journal=journal,
+                          registry=ResearchRegistry())
+    loaded = RunJournal.load(journal.run_id, str(tmp_path / engine))
+    return {node_id: loaded.get_node(node_id)["query"] for node_id in loaded._nodes}
+
+
+async def test_pipeline_researches_the_same_tree_as_dfs(fake_runtime, tmp_path):
+    dfs = await _finished_nodes("dfs", tmp_path)
+    pipelined = await _finished_nodes("pipeline", tmp_path)
+    assert pipelined == dfs
+    assert any(node_id.count(".") == 2 for node_id in dfs)
+
+
+async def test_failed_node_releases_its_pages_and_the_run_finishes(fake_runtime, monkeypatch):
+    search = pipeline_module.search_serp_query
+    extract = pipeline_module.extract_learnings
+    results = {}
+    failed = []
+
+    async def recording_search(serp_query, node_id, registry):
+        results[serp_query.query] = await search(serp_query, node_id, registry)
+        return results[serp_query.query]
+
+    async def failing_extract(query, contents, **kwargs):
+        if not failed:
+            failed.append(query)
+            raise RuntimeError("extraction failed")
+        return await extract(query, contents, **kwargs)
+
+    monkeypatch.setattr(pipeline_module, "search_serp_query", recording_search)
+    monkeypatch.setattr(pipeline_module, "extract_learnings", failing_extract)
+    registry = ResearchRegistry()
+    pipeline = ResearchPipeline(breadth=3, depth=1, registry=registry, queue_size=1)
+    result = await pipeline.run("offline test topic")
+
+    assert pipeline._pending == 0
+    assert result["learnings"]
+    failed_urls = {normalize_url(item["url"]) for item in results[failed[0]]["data"]}
+    only_failed = failed_urls - {normalize_url(url) for url in result["visited_urls"]}
+    # Pages only the failed node had claimed are free for other branches again
+    assert only_failed
+    assert not only_failed & registry._urls
@@ -1,9 +1,20 @@
-from datetime import datetime
+from dataclasses import dataclass
+from datetime import date
+from functools import lru_cache
+from typing import Any, Dict, List
+
 
 def system_prompt() -> str:
-    """Creates the system prompt with current timestamp."""
-    now = datetime.now().isoformat()
-    return f"""You are an expert researcher. Today is {now}. Follow these instructions when responding:
+    """Creates the system prompt with the current date.
+
+    Only the date is included so the prompt (and cache keys built from it) stay stable during a day.
+    """
+    return _system_prompt(date.today().isoformat())
+
+
+@lru_cache(maxsize=1)
+def _system_prompt(today: str) -> str:
+    return f"""You are an expert researcher. Today is {today}. Follow these instructions when responding:
     - You may be asked to research subjects that is after your knowledge cutoff, assume the user is right when presented with news.
     - The user is a highly experienced analyst, no need to simplify it, be as detailed as possible and make sure your response is correct.
     - Be highly organized.
@@ -14,4 +25,116 @@ def system_prompt() -> str:
     - Provide detailed explanations, I'm comfortable with lots of detail.
     - Value good arguments over authorities, the source is irrelevant.
     - Consider new technologies and contrarian ideas, not just the conventional wisdom.
-    - You may use high levels of speculation or prediction, just flag it for me.""" 
\ No newline at end of file
+    - You may use high levels of speculation or prediction, just flag it for me."""
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """A user prompt with fixed instructions first and the per-call inputs after them.
+
+    Providers cache prompts by their longest previously seen prefix, so the inputs (counts,
+    the query, page contents, learnings) only appear in tagged sections at the end, in the
+    order given. The system prompt and instructions alone are a few hundred tokens, below
+    OpenAI's 1024-token caching minimum; a call only hits the cache when it also shares its
+    leading sections with an earlier call, so long inputs common to several calls go first.
+    """
+    instructions: str
+
+    def render(self, **sections: Any) -> str:
+        """The instructions followed by a `<name>` section per non-empty keyword, in order.
+
+        Lists are joined one item per line.
+        """
+        parts = [self.instructions]
+        for name, value in sections.items():
+            if isinstance(value, (list, tuple)):
+                value = "\n".join(str(item) for item in value)
+            if value is None or value == "":
+                continue
+            parts.append(f"<{name}>\n{value}\n</{name}>")
+        return "\n\n".join(parts)
+
+    def messages(self, **sections: Any) -> List[Dict[str, str]]:
+        """Chat messages for the template: the system prompt, then the rendered user prompt."""
+        return [
+            {"role": "system", "content": system_prompt()},
+            {"role": "user", "content": self.render(**sections)}
+        ]
+
+
+FEEDBACK = PromptTemplate(
+    "Generate 3-5 follow-up questions to better understand the user's research needs for the "
+    "research topic below. Return the response as a JSON object with a 'questions' array field."
+)
+
+SERP_QUERIES = PromptTemplate(
+    "Generate a list of SERP queries to research the topic of the prompt from the user below. "
+    "Return a JSON object with a 'queries' array field containing as many queries as "
+    "<num_queries> (or less if the original prompt is clear). Each query object should have "
+    "'query' and 'research_goal' fields. Make sure each query is unique and not similar to each "
+    "other. If <learnings> from previous research are given, use them to generate more specific "
+    "queries. If <known_learnings> are given, earlier research already established them: "
+    "generate queries for what they leave open rather than repeating them."
+)
+
+SERP_QUERIES_BATCH = PromptTemplate(
+    "For each of the research directions below, generate a list of SERP queries to research it "
+    "further. Return a JSON object with a 'results' array field containing one object per "
+    "direction, with the direction's 'id' and a 'queries' array of at most <num_queries> queries. "
+    "Each query object should have 'query' and 'research_goal' fields. Make sure each query is "
+    "unique and not similar to any other query, across all directions. If <learnings> from "
+    "previous research are given, use them to generate more specific queries. If "
+    "<known_learnings> are given, earlier research already established them: generate queries "
+    "for what they leave open rather than repeating them."
+)
+
+EXTRACT_LEARNINGS = PromptTemplate(
+    "Generate a list of learnings from the contents of a SERP search for the query below. Return "
+    "a JSON object with 'learnings' and 'followUpQuestions' arrays. Include at most "
+    "<num_learnings> learnings and <num_follow_up_questions> follow-up questions. The learnings "
+    "should be unique, concise, and information-dense, including entities, metrics, numbers, "
+    "and dates."
+)
+
+FINAL_REPORT = PromptTemplate(
+    "Write a final report on the topic of the prompt from the user below using the learnings "
+    "from research. Return a JSON object with a 'reportMarkdown' field containing a detailed "
+    "markdown report (aim for 3+ pages). Include ALL the learnings from research."
+)
+
+# Plain markdown instead of JSON, so every token can be shown as soon as it arrives
+FINAL_REPORT_MARKDOWN = PromptTemplate(
+    "Write a final report on the topic of the prompt from the user below using the learnings "
+    "from research. Respond with the detailed markdown report only (aim for 3+ pages), without "
+    "wrapping it in JSON or a code block. Include ALL the learnings from research."
+)
+
+REPORT_SECTION = PromptTemplate(
+    "You are writing one section of a research report for the prompt below. Write the section "
+    "covering the research <direction> using the learnings from research. Respond with markdown "
+    "only, starting with a '## ' heading, without an introduction or conclusion for the whole "
+    "report. Include ALL the learnings."
+)
+
+# The introduction and conclusion only differ in their last section, so the second call is
+# served the drafts from the prompt cache
+REPORT_FRAME = PromptTemplate(
+    "Below are the section drafts of a research report for the prompt below. Write only the "
+    "<part> of the report. Respond with markdown only; the sections are used unchanged."
+)
+
+REPORT_INTRODUCTION = (
+    "beginning of the report: a '# ' title and an executive summary of the key findings across "
+    "all sections, which follow it"
+)
+
+REPORT_CONCLUSION = (
+    "end of the report: a '## Conclusion' section that connects the findings across sections, "
+    "with implications and open questions"
+)
+
+SUMMARIZE_LEARNINGS = PromptTemplate(
+    "Condense the learnings from research below into a list of at most <max_learnings> "
+    "learnings. Merge overlapping learnings and keep every distinct fact, entity, metric, "
+    "number and date. Return a JSON object with a 'learnings' array."
+)
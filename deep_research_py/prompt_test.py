@@ -0,0 +1,16 @@
+from .prompt import REPORT_CONCLUSION, REPORT_FRAME, REPORT_INTRODUCTION, PromptTemplate
+
+
+def test_sections_follow_the_instructions_in_order():
+    template = PromptTemplate("Do the thing.")
+    rendered = template.render(learnings=["a", "b"], empty="", missing=None, prompt="topic")
+    assert rendered == "Do the thing.\n\n<learnings>\na\nb\n</learnings>\n\n<prompt>\ntopic\n</prompt>"
+
+
+def test_introduction_and_conclusion_share_everything_but_the_last_section():
+    drafts = "## Section\n\n" + "A finding. " * 500
+    introduction = REPORT_FRAME.render(prompt="topic", sections=drafts, part=REPORT_INTRODUCTION)
+    conclusion = REPORT_FRAME.render(prompt="topic", sections=drafts, part=REPORT_CONCLUSION)
+    shared = introduction.index("\n\n<part>\n")
+    assert introduction[:shared] == conclusion[:shared]
+    assert drafts in introduction[:shared]
@@ -0,0 +1,115 @@
+import math
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .ai.text_splitter import RecursiveCharacterTextSplitter
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Words too common to say anything about relevance
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to "
+    "was what when where which who why will with about into than then there these those".split()
+)
+
+# Size of the chunks pages are ranked in, in characters (roughly 300 tokens)
+RANK_CHUNK_CHARS = 1200
+
+# Marks text left out between two selected chunks of the same page
+GAP_MARKER = "\n\n[...]\n\n"
+
+# Stop looking for a chunk that still fits after this many in a row did not
+MAX_REJECTED = 20
+
+
+def tokenize(text: str) -> List[str]:
+    return [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index of short documents."""
+
+    def __init__(self, documents: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.lengths: List[int] = []
+        for doc_id, document in enumerate(documents):
+            counts = Counter(tokenize(document))
+            self.lengths.append(sum(counts.values()))
+            for term, frequency in counts.items():
+                self.postings.setdefault(term, []).append((doc_id, frequency))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+
+    def idf(self, term: str) -> float:
+        matching = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.lengths) - matching + 0.5) / (matching + 0.5))
+
+    def scores(self, query: str) -> List[float]:
+        """BM25 score of every document for the query, indexed by document id."""
+        scores = [0.0] * len(self.lengths)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return scores
+
+
+def select_chunks(
+    pages: List[str],
+    query: str,
+    budget: int,
+    count_tokens: Callable[[str], int],
+    splitter: Optional[RecursiveCharacterTextSplitter] = None
+) -> List[str]:
+    """Packs the chunks of `pages` most relevant to `query` into `budget` tokens.
+
+    Pages are split into chunks, ranked together with BM25, and taken best first until the
+    budget is spent; chunks that score the same go in reading order, leads of every page first.
+    Each page's selected chunks are returned in their original order, pages without any
+    selected chunk are left out. Every chunk is charged for the separator or `GAP_MARKER` that
+    may precede it, so the joined pages never exceed the budget.
+    """
+    splitter = splitter or RecursiveCharacterTextSplitter(chunk_size=RANK_CHUNK_CHARS, chunk_overlap=0)
+    # (page index, position in page, text) in document order
+    chunks: List[Tuple[int, int, str]] = [
+        (page_index, position, chunk)
+        for page_index, page in enumerate(pages)
+        for position, chunk in enumerate(splitter.iter_split_text(page))
+    ]
+    scores = BM25Index(chunk for _, _, chunk in chunks).scores(query)
+    order = sorted(range(len(chunks)), key=lambda i: (-scores[i], chunks[i][1], chunks[i][0]))
+
+    # Which separator a chunk gets depends on its selected neighbours, so charge the longest
+    separator_tokens = count_tokens(GAP_MARKER)
+    selected = []
+    used = 0
+    rejected = 0
+    for i in order:
+        tokens = count_tokens(chunks[i][2]) + separator_tokens
+        if used + tokens > budget:
+            rejected += 1
+            if rejected >= MAX_REJECTED:
+                break
+            continue
+        rejected = 0
+        selected.append(i)
+        used += tokens
+
+    pages_out: Dict[int, List[str]] = {}
+    previous: Dict[int, int] = {}
+    for i in sorted(selected):
+        page_index, position, chunk = chunks[i]
+        parts = pages_out.setdefault(page_index, [])
+        if parts:
+            parts.append(GAP_MARKER if position > previous[page_index] + 1 else "\n\n")
+        elif position > 0:
+            parts.append(GAP_MARKER.lstrip())
+        parts.append(chunk)
+        previous[page_index] = position
+    return ["".join(pages_out[page_index]) for page_index in sorted(pages_out)]
@@ -0,0 +1,72 @@
+from .ai.text_splitter import RecursiveCharacterTextSplitter
+from .ranking import GAP_MARKER, BM25Index, select_chunks, tokenize
+
+
+def count_words(text: str) -> int:
+    return len(text.split()) + text.count("[...]") + text.count("\n\n")
+
+
+# One chunk per paragraph
+SPLITTER = RecursiveCharacterTextSplitter(chunk_size=60, chunk_overlap=0)
+
+PAGE = "\n\n".join([
+    "Wind farms in the North Sea produced record output.",
+    "Solar panel prices fell sharply as factories expanded.",
+    "Grid operators reported fewer outages this winter.",
+    "Battery storage smoothed the evening demand peak.",
+    "Solar panel installers hired thousands of workers.",
+])
+
+
+def test_tokenize_drops_stopwords_and_case():
+    assert tokenize("The Price of SOLAR panels, in 2024!") == ["price", "solar", "panels", "2024"]
+
+
+def test_bm25_ranks_matching_and_rarer_terms_higher():
+    index = BM25Index([
+        "solar panel prices",
+        "wind turbine prices",
+        "solar solar solar panel prices and more words here",
+        "grid outages",
+    ])
+    scores = index.scores("solar prices")
+    assert scores[3] == 0
+    # "solar" is rarer than "prices", so it weighs more
+    assert index.idf("solar") > index.idf("prices")
+    assert scores[0] > scores[1] > 0
+
+
+def test_most_relevant_chunks_are_kept_in_page_order():
+    (page,) = select_chunks([PAGE], "solar panel", budget=10 ** 6, count_tokens=count_words,
+                            splitter=SPLITTER)
+    assert page == PAGE
+
+    (page,) = select_chunks([PAGE], "solar panel", budget=30, count_tokens=count_words,
+                            splitter=SPLITTER)
+    assert page == GAP_MARKER.lstrip() + (
+        "Solar panel prices fell sharply as factories expanded." + GAP_MARKER
+        + "Solar panel installers hired thousands of workers."
+    )
+
+
+def test_adjacent_chunks_are_joined_without_a_gap_marker():
+    (page,) = select_chunks([PAGE], "grid battery", budget=30, count_tokens=count_words,
+                            splitter=SPLITTER)
+    assert page == GAP_MARKER.lstrip() + (
+        "Grid operators reported fewer outages this winter.\n\n"
+        "Battery storage smoothed the evening demand peak."
+    )
+
+
+def test_budget_covers_chunks_and_their_separators():
+    pages = [PAGE, PAGE.replace("Solar", "Hydro"), PAGE.replace("Wind", "Tidal")]
+    for budget in range(0, 120, 7):
+        selected = select_chunks(pages, "solar wind grid", budget, count_words, splitter=SPLITTER)
+        assert sum(count_words(page) for page in selected) <= budget
+
+
+def test_pages_without_selected_chunks_are_left_out():
+    pages = ["Nothing relevant here at all.", PAGE]
+    selected = select_chunks(pages, "battery storage", budget=15, count_tokens=count_words,
+                             splitter=SPLITTER)
+    assert len(selected) == 1 and "Battery storage" in selected[0]
@@ -0,0 +1,171 @@
+import asyncio
+import os
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .ai.providers import count_tokens, stream_chat_completion, trim_prompt
+from .deep_research import _sources_section, write_final_report, write_final_report_stream
+from .learnings import Learning, LearningStore, branch
+from .prompt import REPORT_CONCLUSION, REPORT_FRAME, REPORT_INTRODUCTION, REPORT_SECTION, PromptTemplate
+from .tracing import trace_span
+
+# "single" writes the report in one call, "map-reduce" drafts a section per research branch in
+# parallel, "auto" picks map-reduce once there are at least REPORT_MAP_REDUCE_MIN_LEARNINGS
+REPORT_MODE = os.environ.get("DEEP_RESEARCH_REPORT_MODE", "auto")
+REPORT_MAP_REDUCE_MIN_LEARNINGS = int(os.environ.get("DEEP_RESEARCH_REPORT_MAP_REDUCE_MIN_LEARNINGS", "40"))
+
+# Learnings per section draft are capped at this many tokens; larger branches get more sections
+SECTION_TOKEN_BUDGET = 12_000
+
+# Branches are merged into at most this many sections, in tree order
+MAX_SECTIONS = 12
+
+# Token budget of the section drafts given to the introduction and conclusion writers
+DRAFTS_TOKEN_BUDGET = 60_000
+
+
+def resolve_report_mode(mode: str, learnings: List[str]) -> str:
+    if mode == "auto":
+        return "map-reduce" if len(learnings) >= REPORT_MAP_REDUCE_MIN_LEARNINGS else "single"
+    return mode
+
+
+def plan_sections(learnings: List[Learning]) -> List[Tuple[str, List[Learning]]]:
+    """Groups learnings by their first-level branch of the research tree into section inputs.
+
+    Returns (research direction, learnings) pairs in tree order; the direction is the SERP
+    query that opened the branch.
+    """
+    groups: Dict[str, List[Learning]] = {}
+    for learning in learnings:
+        groups.setdefault(branch(learning.nodes[0], 1) if learning.nodes else "0", []).append(learning)
+
+    # Too many branches: neighbouring branches share a section
+    keys = sorted(groups, key=lambda key: [int(part) for part in key.split(".")])
+    per_section = -(-len(keys) // MAX_SECTIONS)
+    merged = [
+        [learning for key in keys[i:i + per_section] for learning in groups[key]]
+        for i in range(0, len(keys), per_section)
+    ]
+
+    sections = []
+    for group in merged:
+        direction = next((q for learning in group for q in learning.queries), "")
+        part: List[Learning] = []
+        used = 0
+        for learning in group:
+            tokens = count_tokens(learning.text)
+            if part and used + tokens > SECTION_TOKEN_BUDGET:
+                sections.append((direction, part))
+                part, used = [], 0
+            part.append(learning)
+            used += tokens
+        if part:
+            sections.append((direction, part))
+    return sections
+
+
+async def _complete(template: PromptTemplate, **sections: str) -> str:
+    parts = []
+    async for chunk in stream_chat_completion(model="o3-mini", messages=template.messages(**sections)):
+        parts.append(chunk)
+    return "".join(parts)
+
+
+async def write_report_section(prompt: str, direction: str, learnings: List[Learning]) -> str:
+    """Drafts the report section for one branch of the research tree."""
+    learnings_string = "\n".join(f"<learning>\n{learning.text}\n</learning>" for learning in learnings)
+    with trace_span("write_report_section", direction=direction):
+        return (await _complete(
+            REPORT_SECTION, prompt=prompt, direction=direction, learnings=learnings_string
+        )).strip()
+
+
+async def _stream_introduction(prompt: str, drafts: str) -> AsyncIterator[str]:
+    with trace_span("write_report_introduction"):
+        async for chunk in stream_chat_completion(
+            model="o3-mini",
+            messages=REPORT_FRAME.messages(prompt=prompt, sections=drafts, part=REPORT_INTRODUCTION)
+        ):
+            yield chunk
+
+
+async def _write_conclusion(prompt: str, drafts: str) -> str:
+    with trace_span("write_report_conclusion"):
+        return (await _complete(
+            REPORT_FRAME, prompt=prompt, sections=drafts, part=REPORT_CONCLUSION
+        )).strip()
+
+
+async def write_report_map_reduce_stream(
+    prompt: str,
+    learnings: List[str],
+    visited_urls: List[str],
+    store: Optional[LearningStore] = None
+) -> AsyncIterator[str]:
+    """Writes the report as parallel per-branch section drafts joined by a short final pass.
+
+    Section drafts run concurrently (paced by the OpenAI scheduler). The final pass only writes
+    the title, executive summary and conclusion around them, so no single call has to read or
+    write the whole report. Streams the introduction as it is generated, then the sections,
+    the conclusion and the sources.
+    """
+    if store is None:
+        store = LearningStore()
+        store.add_all(learnings)
+
+    with trace_span("write_report_map_reduce"):
+        sections = plan_sections(store.items)
+        drafts = [
+            draft for draft in await asyncio.gather(*[
+                write_report_section(prompt, direction, group) for direction, group in sections
+            ])
+            if draft
+        ]
+        drafts_string = trim_prompt("\n\n".join(drafts), DRAFTS_TOKEN_BUDGET)
+
+        conclusion: Optional["asyncio.Future[str]"] = None
+        try:
+            async for chunk in _stream_introduction(prompt, drafts_string):
+                if conclusion is None:
+                    # The introduction's prompt has been read once its first token arrives, so
+                    # the conclusion, which only differs in its last section, hits the cache
+                    conclusion = asyncio.ensure_future(_write_conclusion(prompt, drafts_string))
+                yield chunk
+            if conclusion is None:
+                conclusion = asyncio.ensure_future(_write_conclusion(prompt, drafts_string))
+            for draft in drafts:
+                yield "\n\n" + draft
+            yield "\n\n" + await conclusion
+        finally:
+            if conclusion is not None:
+                conclusion.cancel()
+
+    yield _sources_section(visited_urls)
+
+
+def write_report_stream(
+    prompt: str,
+    learnings: List[str],
+    visited_urls: List[str],
+    store: Optional[LearningStore] = None,
+    mode: str = REPORT_MODE
+) -> AsyncIterator[str]:
+    """Streams the final report with the writer chosen by `mode`."""
+    if resolve_report_mode(mode, learnings) == "map-reduce":
+        return write_report_map_reduce_stream(prompt, learnings, visited_urls, store)
+    return write_final_report_stream(prompt, learnings, visited_urls, store)
+
+
+async def write_report(
+    prompt: str,
+    learnings: List[str],
+    visited_urls: List[str],
+    store: Optional[LearningStore] = None,
+    mode: str = REPORT_MODE
+) -> str:
+    """Writes the complete final report with the writer chosen by `mode`."""
+    if resolve_report_mode(mode, learnings) == "map-reduce":
+        return "".join([
+            chunk async for chunk in write_report_map_reduce_stream(prompt, learnings, visited_urls, store)
+        ])
+    return await write_final_report(prompt, learnings, visited_urls, store)
@@ -0,0 +1,98 @@
+import pytest
+
+from . import report
+from .learnings import Learning, LearningStore
+from .prompt import REPORT_CONCLUSION, REPORT_INTRODUCTION
+from .report import plan_sections, resolve_report_mode, write_report, write_report_stream
+
+
+@pytest.fixture
+def requests(fake_runtime, monkeypatch):
+    """User prompts of the chat requests sent to the fake client."""
+    prompts = []
+    client = fake_runtime.openai_client
+    create = client._create
+
+    async def recording(**kwargs):
+        prompts.append(kwargs["messages"][-1]["content"])
+        return await create(**kwargs)
+
+    monkeypatch.setattr(client, "_create", recording)
+    return prompts
+
+
+def _store() -> LearningStore:
+    store = LearningStore()
+    for branch, topic in enumerate(["solar prices", "wind auctions", "grid storage"]):
+        for i in range(3):
+            store.add(f"Finding {i} about {topic}: " + " ".join(f"w{branch}{i}{j}" for j in range(20)),
+                      node=f"0.{branch}.{i}", query=topic, urls=[f"https://{branch}.example/{i}"])
+    return store
+
+
+def test_sections_follow_the_first_level_branches_in_tree_order(fake_runtime):
+    learnings = [
+        Learning("ten", nodes=["0.10.1"], queries=["q10"]),
+        Learning("two", nodes=["0.2"], queries=["q2"]),
+        Learning("two deeper", nodes=["0.2.0.1"], queries=["q2 deeper"]),
+        Learning("orphan"),
+    ]
+    sections = plan_sections(learnings)
+    assert [(direction, [learning.text for learning in group]) for direction, group in sections] == [
+        ("", ["orphan"]),
+        ("q2", ["two", "two deeper"]),
+        ("q10", ["ten"]),
+    ]
+
+
+def test_sections_are_merged_and_split_to_their_limits(fake_runtime, monkeypatch):
+    learnings = [Learning(f"branch {i} " + "x" * 100, nodes=[f"0.{i}"], queries=[f"q{i}"])
+                 for i in range(6)]
+
+    monkeypatch.setattr(report, "MAX_SECTIONS", 2)
+    sections = plan_sections(learnings)
+    assert [direction for direction, _ in sections] == ["q0", "q3"]
+    assert [len(group) for _, group in sections] == [3, 3]
+
+    monkeypatch.setattr(report, "SECTION_TOKEN_BUDGET", 250)
+    sections = plan_sections(learnings)
+    assert [(direction, len(group)) for direction, group in sections] == [
+        ("q0", 2), ("q0", 1), ("q3", 2), ("q3", 1)
+    ]
+
+
+def test_auto_mode_switches_to_map_reduce_on_many_learnings(monkeypatch):
+    monkeypatch.setattr(report, "REPORT_MAP_REDUCE_MIN_LEARNINGS", 3)
+    assert resolve_report_mode("auto", ["a", "b"]) == "single"
+    assert resolve_report_mode("auto", ["a", "b", "c"]) == "map-reduce"
+    assert resolve_report_mode("single", ["a", "b", "c"]) == "single"
+
+
+async def test_map_reduce_drafts_a_section_per_branch(requests):
+    store = _store()
+    urls = [url for learning in store.items for url in learning.urls]
+
+    text = await write_report("energy markets", store.texts(), urls, store=store, mode="map-reduce")
+
+    section_prompts = [prompt for prompt in requests if "<direction>" in prompt]
+    assert len(section_prompts) == 3 and len(requests) == 5
+    for topic in ["solar prices", "wind auctions", "grid storage"]:
+        assert sum(topic in prompt for prompt in section_prompts) == 1
+    assert all(url in text for url in urls)
+
+    chunks = [chunk async for chunk in write_report_stream(
+        "energy markets", store.texts(), urls, store=store, mode="map-reduce"
+    )]
+    assert len(chunks) > 5 and "".join(chunks) == text
+
+
+async def test_introduction_and_conclusion_share_their_prompt_prefix(requests):
+    store = _store()
+    await write_report("energy markets", store.texts(), [], store=store, mode="map-reduce")
+
+    (introduction,) = [prompt for prompt in requests if REPORT_INTRODUCTION in prompt]
+    (conclusion,) = [prompt for prompt in requests if REPORT_CONCLUSION in prompt]
+    # Only the closing <part> section differs, so the drafts are read from the prompt cache
+    assert introduction.replace(REPORT_INTRODUCTION, REPORT_CONCLUSION) == conclusion
+    shared = introduction[:introduction.index("\n\n<part>\n")]
+    assert conclusion.startswith(shared) and "energy markets" in shared and "<sections>" in shared
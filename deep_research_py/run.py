@@ -1,111 +1,402 @@
 import typer
 from rich.console import Console
 from rich.panel import Panel
+from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn
 from rich import print as rprint
 import asyncio
-from prompt_toolkit import PromptSession
+import time
+from enum import Enum
+from typing import TYPE_CHECKING, Optional
 
-from deep_research_py.deep_research import deep_research, write_final_report
-from deep_research_py.feedback import generate_feedback
+import aiofiles
+
+from deep_research_py.report import write_report, write_report_stream
+from deep_research_py.engines import ENGINES
+from deep_research_py.feedback import combine_query, generate_feedback
+from deep_research_py.batch import DEFAULT_MAX_JOBS, BatchJob, BatchRunner, load_jobs
+from deep_research_py.cache import get_cache
+from deep_research_py.knowledge import get_knowledge
+from deep_research_py.dedup import ResearchRegistry
+from deep_research_py.journal import RunJournal
+from deep_research_py.runtime import get_runtime
+from deep_research_py.tracing import Tracer, get_tracer
+
+if TYPE_CHECKING:
+    from prompt_toolkit import PromptSession
+
+class Engine(str, Enum):
+    dfs = "dfs"
+    bfs = "bfs"
+    pipeline = "pipeline"
+    frontier = "frontier"
+
+class ReportMode(str, Enum):
+    auto = "auto"
+    single = "single"
+    map_reduce = "map-reduce"
 
 app = typer.Typer()
 console = Console()
-session = PromptSession()
+
+# Research tree nodes listed in the per-node table shown with --trace
+NODE_SUMMARY_ROWS = 10
+_session: Optional["PromptSession"] = None
+
+def get_session() -> "PromptSession":
+    """Returns the interactive prompt session, created the first time input is needed."""
+    global _session
+    if _session is None:
+        from prompt_toolkit import PromptSession
+
+        _session = PromptSession()
+    return _session
 
 async def async_prompt(message: str, default: str = "") -> str:
     """Async wrapper for prompt_toolkit."""
-    return await session.prompt_async(message)
+    return await get_session().prompt_async(message)
 
-@app.command()
-async def main():
-    """Deep Research CLI"""
-    
-    console.print(Panel.fit(
-        "[bold blue]Deep Research Assistant[/bold blue]\n"
-        "[dim]An AI-powered research tool[/dim]"
-    ))
-    
-    # Get initial inputs with clear formatting
-    query = await async_prompt("\n🔍 What would you like to research? ")
-    console.print()
-    
-    breadth_prompt = f"📊 Research breadth (recommended 2-10) [4]: "
-    breadth = int((await async_prompt(breadth_prompt)) or "4")
+def print_trace_summary(trace_path: Optional[str] = None):
+    """Shows where the run spent its time, tokens and money, and optionally saves the trace."""
+    tracer = get_tracer()
+    table = Table(title="Run Summary")
+    table.add_column("Stage", no_wrap=True)
+    for column in ("Calls", "Err", "Time s", "Max s", "Queue s",
+                   "In tok", "Cached", "Out tok", "Cost $", "KB", "Hits"):
+        table.add_column(column, justify="right")
+    for stage in tracer.summary():
+        table.add_row(
+            stage["name"],
+            str(stage["calls"]),
+            str(stage["errors"]),
+            f"{stage['total_time']:.1f}",
+            f"{stage['max_time']:.1f}",
+            f"{stage['queue_wait']:.1f}",
+            str(stage["prompt_tokens"]),
+            str(stage["cached_tokens"]),
+            str(stage["completion_tokens"]),
+            f"{stage['cost']:.3f}",
+            f"{stage['bytes'] / 1024:.0f}",
+            str(stage["cache_hits"]),
+        )
     console.print()
+    console.print(table)
     
-    depth_prompt = f"🔍 Research depth (recommended 1-5) [2]: "
-    depth = int((await async_prompt(depth_prompt)) or "2")
-    console.print()
-
-    # First show progress for research plan
-    console.print("\n[yellow]Creating research plan...[/yellow]")
-    follow_up_questions = await generate_feedback(query)
+    saved = sum(span.attrs.get("tokens_saved", 0) for span in tracer.spans if span.name == "prepare_pages")
+    if saved:
+        console.print(f"[dim]Page cleaning saved about {saved} prompt tokens[/dim]")
     
-    # Then collect answers separately from progress display
-    console.print("\n[bold yellow]Follow-up Questions:[/bold yellow]")
-    answers = []
-    for i, question in enumerate(follow_up_questions, 1):
-        console.print(f"\n[bold blue]Q{i}:[/bold blue] {question}")
-        answer = await async_prompt("➤ Your answer: ")
-        answers.append(answer)
-        console.print()
-
-    # Combine information
-    combined_query = f"""
-    Initial Query: {query}
-    Follow-up Questions and Answers:
-    {chr(10).join(f"Q: {q} A: {a}" for q, a in zip(follow_up_questions, answers))}
-    """
+    prompt_tokens = sum(span.prompt_tokens for span in tracer.spans)
+    cached = sum(span.cached_tokens for span in tracer.spans)
+    if cached:
+        console.print(f"[dim]Prompt caching served {cached} of {prompt_tokens} prompt tokens "
+                      f"({cached / prompt_tokens:.0%})[/dim]")
     
-    # Now use Progress for the research phase
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-    ) as progress:
-        # Do research
-        task = progress.add_task("[yellow]Researching your topic...[/yellow]", total=None)
-        research_results = await deep_research(
-            query=combined_query,
-            breadth=breadth,
-            depth=depth
+    if trace_path:
+        print_node_summary(tracer)
+        tracer.write_chrome_trace(trace_path)
+        console.print(f"[dim]Trace has been saved to {trace_path}[/dim]")
+
+def print_node_summary(tracer: Tracer, limit: int = NODE_SUMMARY_ROWS):
+    """Shows the research tree nodes that took the most time."""
+    nodes = sorted(tracer.node_summary().items(), key=lambda item: item[1]["time"], reverse=True)
+    if not nodes:
+        return
+    table = Table(title=f"Slowest Nodes ({min(limit, len(nodes))} of {len(nodes)})")
+    table.add_column("Node", no_wrap=True)
+    for column in ("Time s", "In tok", "Cached", "Out tok", "Cost $", "KB", "Hits"):
+        table.add_column(column, justify="right")
+    for node_id, node in nodes[:limit]:
+        table.add_row(
+            node_id,
+            f"{node['time']:.1f}",
+            str(node["prompt_tokens"]),
+            str(node["cached_tokens"]),
+            str(node["completion_tokens"]),
+            f"{node['cost']:.3f}",
+            f"{node['bytes'] / 1024:.0f}",
+            str(node["cache_hits"]),
         )
-        progress.remove_task(task)
+    console.print(table)
+
+async def main(
+    resume: Optional[str] = None,
+    stream: bool = False,
+    engine: Engine = Engine.dfs,
+    trace_path: Optional[str] = None,
+    report_mode: ReportMode = ReportMode.auto,
+    time_limit: Optional[float] = None,
+    token_budget: Optional[int] = None,
+    cost_budget: Optional[float] = None
+):
+    """Deep Research CLI"""
+    try:
+        console.print(Panel.fit(
+            "[bold blue]Deep Research Assistant[/bold blue]\n"
+            "[dim]An AI-powered research tool[/dim]"
+        ))
         
-        # Show learnings
-        console.print("\n[yellow]Learnings:[/yellow]")
-        for learning in research_results["learnings"]:
-            rprint(f"• {learning}")
+        if resume:
+            journal = RunJournal.load(resume)
+            combined_query = journal.info["query"]
+            breadth = journal.info["breadth"]
+            depth = journal.info["depth"]
+            console.print(
+                f"\n[yellow]Resuming run {journal.run_id} "
+                f"({journal.completed_nodes} finished queries)...[/yellow]"
+            )
+        else:
+            # Get initial inputs with clear formatting
+            query = await async_prompt("\n🔍 What would you like to research? ")
+            console.print()
+            
+            breadth_prompt = f"📊 Research breadth (recommended 2-10) [4]: "
+            breadth = int((await async_prompt(breadth_prompt)) or "4")
+            console.print()
+            
+            depth_prompt = f"🔍 Research depth (recommended 1-5) [2]: "
+            depth = int((await async_prompt(depth_prompt)) or "2")
+            console.print()
+
+            # First show progress for research plan
+            console.print("\n[yellow]Creating research plan...[/yellow]")
+            follow_up_questions = await generate_feedback(query)
+            
+            # Then collect answers separately from progress display
+            console.print("\n[bold yellow]Follow-up Questions:[/bold yellow]")
+            answers = []
+            for i, question in enumerate(follow_up_questions, 1):
+                console.print(f"\n[bold blue]Q{i}:[/bold blue] {question}")
+                answer = await async_prompt("➤ Your answer: ")
+                answers.append(answer)
+                console.print()
+
+            # Combine information
+            combined_query = combine_query(query, follow_up_questions, answers)
+
+            journal = RunJournal.create(combined_query, breadth, depth)
+            console.print(
+                f"[dim]Run ID: {journal.run_id} (resume with --resume {journal.run_id})[/dim]"
+            )
         
-        # Generate report
-        task = progress.add_task("Writing final report...", total=None)
-        report = await write_final_report(
-            prompt=combined_query,
-            learnings=research_results["learnings"],
-            visited_urls=research_results["visited_urls"]
-        )
-        progress.remove_task(task)
+        # Now use Progress for the research phase
+        with Progress(
+            SpinnerColumn(),
+            TextColumn("[progress.description]{task.description}"),
+            console=console,
+        ) as progress:
+            # Do research
+            task = progress.add_task("[yellow]Researching your topic...[/yellow]", total=None)
+            research = ENGINES[engine.value]
+            registry = ResearchRegistry()
+            # Only the frontier engine has budgets; unset ones keep their environment defaults
+            budgets = {
+                name: value for name, value in
+                (("token_budget", token_budget), ("cost_budget", cost_budget))
+                if value is not None
+            }
+            research_results = await research(
+                query=combined_query,
+                breadth=breadth,
+                depth=depth,
+                journal=journal,
+                registry=registry,
+                deadline=time.monotonic() + time_limit if time_limit else None,
+                **budgets
+            )
+            progress.remove_task(task)
+            
+            # Show learnings
+            console.print("\n[yellow]Learnings:[/yellow]")
+            for learning in research_results["learnings"]:
+                rprint(f"• {learning}")
+            
+            if not stream:
+                # Generate report
+                task = progress.add_task("Writing final report...", total=None)
+                report = await write_report(
+                    prompt=combined_query,
+                    learnings=research_results["learnings"],
+                    visited_urls=research_results["visited_urls"],
+                    store=registry.learnings,
+                    mode=report_mode.value
+                )
+                progress.remove_task(task)
+                
+                # Show results
+                console.print("\n[bold green]Research Complete![/bold green]")
+                console.print("\n[yellow]Final Report:[/yellow]")
+                console.print(Panel(report, title="Research Report"))
         
-        # Show results
-        console.print("\n[bold green]Research Complete![/bold green]")
-        console.print("\n[yellow]Final Report:[/yellow]")
-        console.print(Panel(report, title="Research Report"))
+        if stream:
+            # Write the report to the console and to output.md as it is generated
+            console.print("\n[bold green]Research Complete![/bold green]")
+            console.print("\n[yellow]Final Report:[/yellow]\n")
+            async with aiofiles.open("output.md", "w") as f:
+                async for chunk in write_report_stream(
+                    prompt=combined_query,
+                    learnings=research_results["learnings"],
+                    visited_urls=research_results["visited_urls"],
+                    store=registry.learnings,
+                    mode=report_mode.value
+                ):
+                    console.print(chunk, end="", markup=False, highlight=False)
+                    await f.write(chunk)
+            console.print()
+        else:
+            # Save report
+            with open("output.md", "w") as f:
+                f.write(report)
         
         # Show sources
         console.print("\n[yellow]Sources:[/yellow]")
         for url in research_results["visited_urls"]:
             rprint(f"• {url}")
         
-        # Save report
-        with open("output.md", "w") as f:
-            f.write(report)
         console.print("\n[dim]Report has been saved to output.md[/dim]")
 
+        cache = get_cache()
+        if cache is not None:
+            console.print(f"[dim]Cache: {cache.hits} hits, {cache.misses} misses[/dim]")
+        knowledge = get_knowledge()
+        if knowledge is not None and knowledge.hits:
+            console.print(f"[dim]Reused earlier research for {knowledge.hits} queries[/dim]")
+        
+        print_trace_summary(trace_path)
+    finally:
+        get_runtime().close_page_executor()
+
+
+@app.callback(invoke_without_command=True)
+def cli(
+    ctx: typer.Context,
+    resume: Optional[str] = typer.Option(
+        None, "--resume", help="Resume an interrupted run by its run ID."
+    ),
+    stream: bool = typer.Option(
+        False, "--stream/--no-stream", help="Stream the final report as it is written."
+    ),
+    engine: Engine = typer.Option(
+        Engine.dfs, "--engine",
+        help="dfs explores each branch recursively; bfs expands the tree level by level "
+             "with batched query generation; pipeline runs search, page preparation and "
+             "extraction as separate stages; frontier researches the most promising queries "
+             "first within a budget.",
+    ),
+    trace: Optional[str] = typer.Option(
+        None, "--trace",
+        help="Write a Chrome trace-event JSON of the run to this path and show the slowest "
+             "research tree nodes.",
+    ),
+    report_mode: ReportMode = typer.Option(
+        ReportMode.auto, "--report-mode",
+        help="single writes the report in one call; map-reduce drafts a section per research "
+             "branch in parallel; auto picks map-reduce for runs with many learnings.",
+    ),
+    time_limit: Optional[float] = typer.Option(
+        None, "--time-limit",
+        help="Stop researching after this many seconds and write the report from the "
+             "learnings found so far.",
+    ),
+    token_budget: Optional[int] = typer.Option(
+        None, "--token-budget", min=0,
+        help="Frontier engine: start no new queries after this many prompt and completion "
+             "tokens (0 is no limit). Defaults to DEEP_RESEARCH_FRONTIER_TOKENS.",
+    ),
+    cost_budget: Optional[float] = typer.Option(
+        None, "--cost-budget", min=0,
+        help="Frontier engine: start no new queries after this many estimated dollars "
+             "(0 is no limit). Defaults to DEEP_RESEARCH_FRONTIER_COST.",
+    ),
+):
+    """Deep Research CLI"""
+    if ctx.invoked_subcommand is not None:
+        return
+    if (token_budget is not None or cost_budget is not None) and engine != Engine.frontier:
+        raise typer.BadParameter("--token-budget and --cost-budget need --engine frontier")
+    asyncio.run(main(resume=resume, stream=stream, engine=engine, trace_path=trace,
+                     report_mode=report_mode, time_limit=time_limit,
+                     token_budget=token_budget, cost_budget=cost_budget))
+
+
+async def main_batch(
+    jobs_path: str,
+    output_dir: str,
+    max_jobs: int,
+    engine: Engine = Engine.dfs,
+    trace_path: Optional[str] = None,
+    report_mode: ReportMode = ReportMode.auto
+):
+    """Runs every job of a JSONL file without prompting."""
+    try:
+        jobs = load_jobs(jobs_path)
+        console.print(f"[yellow]Running {len(jobs)} jobs, up to {max_jobs} at a time...[/yellow]")
+
+        def on_event(event: str, job: BatchJob, entry: dict):
+            if event == "finished" and entry["status"] == "ok":
+                console.print(f"[green]✓[/green] {job.id} ({entry['elapsed_s']}s) → {entry['output']}")
+            elif event == "finished":
+                console.print(f"[red]✗[/red] {job.id}: {entry['error']}")
+            elif event == "skipped":
+                console.print(f"[dim]- {job.id} already finished[/dim]")
+
+        runner = BatchRunner(output_dir, max_jobs=max_jobs, engine=engine.value,
+                             report_mode=report_mode.value, on_event=on_event)
+        entries = await runner.run(jobs)
+
+        failed = sum(entry["status"] != "ok" for entry in entries)
+        console.print(
+            f"\n[bold]{len(entries) - failed} succeeded, {failed} failed.[/bold] "
+            f"[dim]Manifest: {runner.manifest_path}[/dim]"
+        )
+        print_trace_summary(trace_path)
+    finally:
+        get_runtime().close_page_executor()
+
+
+@app.command()
+def batch(
+    jobs: str = typer.Argument(
+        ..., help="JSONL file with one job per line: query, breadth, depth, optional follow_ups and id."
+    ),
+    output_dir: str = typer.Option(
+        "reports", "--output-dir", help="Directory for the reports and manifest.jsonl."
+    ),
+    max_jobs: int = typer.Option(
+        DEFAULT_MAX_JOBS, "--max-jobs", help="Number of jobs researched at the same time."
+    ),
+    engine: Engine = typer.Option(Engine.dfs, "--engine", help="Research engine used for every job."),
+    report_mode: ReportMode = typer.Option(
+        ReportMode.auto, "--report-mode", help="Report writer used for every job."
+    ),
+    trace: Optional[str] = typer.Option(
+        None, "--trace", help="Write a Chrome trace-event JSON of the batch to this path."
+    ),
+):
+    """Run many research jobs concurrently from a JSONL file, without prompts."""
+    asyncio.run(main_batch(jobs, output_dir, max_jobs, engine=engine, trace_path=trace,
+                           report_mode=report_mode))
+
+
+@app.command()
+def serve(
+    host: str = typer.Option("127.0.0.1", "--host", help="Interface to listen on."),
+    port: int = typer.Option(8080, "--port", help="Port to listen on."),
+    max_jobs: Optional[int] = typer.Option(
+        None, "--max-jobs",
+        help="Number of jobs researched at the same time; others wait in a queue. "
+             "Defaults to DEEP_RESEARCH_SERVER_MAX_JOBS or 4.",
+    ),
+):
+    """Serve research jobs over HTTP, streaming their progress as Server-Sent Events."""
+    from deep_research_py.server import run_server
+
+    run_server(host=host, port=port, max_jobs=max_jobs)
+
 
 def run():
     """Synchronous entry point for the CLI tool."""
-    asyncio.run(main())
+    app()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    run() 
\ No newline at end of file
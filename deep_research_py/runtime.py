@@ -0,0 +1,133 @@
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    import openai
+    import tiktoken
+    from .deep_research import Firecrawl
+
+
+@dataclass
+class RuntimeConfig:
+    """Settings for the external clients, read from the environment by default."""
+    openai_api_key: Optional[str] = None
+    openai_base_url: Optional[str] = None
+    # Connection pool shared by every OpenAI request in the process
+    openai_max_connections: int = 100
+    openai_max_keepalive_connections: int = 20
+    openai_keepalive_expiry: float = 30.0
+    firecrawl_api_key: str = ""
+    firecrawl_base_url: Optional[str] = None
+    encoding_name: str = "cl100k_base"
+    # Where scraped pages are prepared: "process", "thread" or "inline" (on the event loop)
+    page_executor: str = "process"
+    page_workers: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> "RuntimeConfig":
+        return cls(
+            openai_api_key=os.environ.get("OPENAI_API_KEY") or os.environ.get("OPENAI_KEY"),
+            openai_base_url=os.environ.get("OPENAI_API_ENDPOINT"),
+            openai_max_connections=int(os.environ.get("OPENAI_MAX_CONNECTIONS", "100")),
+            openai_max_keepalive_connections=int(os.environ.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20")),
+            openai_keepalive_expiry=float(os.environ.get("OPENAI_KEEPALIVE_EXPIRY", "30")),
+            firecrawl_api_key=os.environ.get("FIRECRAWL_KEY", ""),
+            firecrawl_base_url=os.environ.get("FIRECRAWL_BASE_URL"),
+            page_executor=os.environ.get("DEEP_RESEARCH_PAGE_EXECUTOR", "process"),
+            page_workers=int(os.environ["DEEP_RESEARCH_PAGE_WORKERS"])
+            if os.environ.get("DEEP_RESEARCH_PAGE_WORKERS") else None,
+        )
+
+
+@dataclass
+class Runtime:
+    """Clients and encoders used by a run, each created on first use.
+
+    Nothing here touches the network, the filesystem or a heavy import until it is needed, so
+    importing the package is cheap and commands that never call a provider need no keys.
+    Pass ready-made objects (e.g. local stand-ins) to use them instead of the real clients.
+    """
+    config: RuntimeConfig = field(default_factory=RuntimeConfig.from_env)
+    openai_client: Optional["openai.AsyncOpenAI"] = None
+    firecrawl_app: Optional[Any] = None
+    encoder: Optional["tiktoken.Encoding"] = None
+    _firecrawl: Optional["Firecrawl"] = field(default=None, init=False, repr=False)
+    _page_executor: Optional[Executor] = field(default=None, init=False, repr=False)
+
+    def get_openai_client(self) -> "openai.AsyncOpenAI":
+        if self.openai_client is None:
+            if not self.config.openai_api_key:
+                raise ValueError("OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
+
+            from .ai.providers import create_openai_client
+
+            self.openai_client = create_openai_client(
+                api_key=self.config.openai_api_key,
+                base_url=self.config.openai_base_url,
+                max_connections=self.config.openai_max_connections,
+                max_keepalive_connections=self.config.openai_max_keepalive_connections,
+                keepalive_expiry=self.config.openai_keepalive_expiry,
+            )
+        return self.openai_client
+
+    def get_firecrawl(self) -> "Firecrawl":
+        if self._firecrawl is None:
+            from .deep_research import Firecrawl
+
+            self._firecrawl = Firecrawl(
+                api_key=self.config.firecrawl_api_key,
+                api_url=self.config.firecrawl_base_url,
+                app=self.firecrawl_app,
+            )
+        return self._firecrawl
+
+    def get_encoder(self) -> "tiktoken.Encoding":
+        if self.encoder is None:
+            import tiktoken
+
+            self.encoder = tiktoken.get_encoding(self.config.encoding_name)
+        return self.encoder
+
+    def get_page_executor(self) -> Optional[Executor]:
+        """Pool that prepares scraped pages, or None to prepare them on the event loop."""
+        if self._page_executor is None and self.config.page_executor != "inline":
+            workers = self.config.page_workers or os.cpu_count() or 1
+            if self.config.page_executor == "thread":
+                # tiktoken releases the GIL while encoding, so threads also spread the work
+                self._page_executor = ThreadPoolExecutor(workers, thread_name_prefix="pages")
+            else:
+                from .pages import init_page_worker
+
+                # Created lazily, once the event loop, HTTP pools and executor threads exist;
+                # forking that multithreaded process could copy locks held by other threads
+                self._page_executor = ProcessPoolExecutor(
+                    workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_page_worker
+                )
+        return self._page_executor
+
+    def close_page_executor(self, wait: bool = False) -> None:
+        if self._page_executor is not None:
+            self._page_executor.shutdown(wait=wait, cancel_futures=True)
+            self._page_executor = None
+
+
+_runtime: Optional[Runtime] = None
+
+
+def get_runtime() -> Runtime:
+    """Returns the process-wide runtime, configured from the environment on first use."""
+    global _runtime
+    if _runtime is None:
+        _runtime = Runtime()
+    return _runtime
+
+
+def set_runtime(runtime: Optional[Runtime]) -> None:
+    """Replaces the process-wide runtime; None makes the next `get_runtime()` start fresh."""
+    global _runtime
+    _runtime = runtime
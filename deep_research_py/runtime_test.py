@@ -0,0 +1,69 @@
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.fakes import FakeFirecrawlApp, byte_encoding
+
+from .runtime import Runtime, RuntimeConfig, get_runtime, set_runtime
+
+
+def test_importing_the_cli_loads_no_client_library():
+    code = (
+        "import sys, deep_research_py.run, deep_research_py.server; "
+        "print(sorted({'openai', 'tiktoken', 'firecrawl'} & set(sys.modules)))"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == "[]"
+
+
+def test_clients_are_created_on_first_use():
+    runtime = Runtime(config=RuntimeConfig(openai_api_key="sk-test"))
+    assert runtime.openai_client is None and runtime.encoder is None
+
+    client = runtime.get_openai_client()
+    assert runtime.get_openai_client() is client
+    assert client.api_key == "sk-test" and client.max_retries == 0
+
+
+def test_a_missing_key_only_fails_when_the_client_is_needed():
+    runtime = Runtime(config=RuntimeConfig(openai_api_key=None))
+    with pytest.raises(ValueError, match="OPENAI_API_KEY"):
+        runtime.get_openai_client()
+
+
+def test_injected_clients_are_used_as_they_are():
+    app = FakeFirecrawlApp(page_kb=1)
+    encoder = byte_encoding()
+    runtime = Runtime(config=RuntimeConfig(), firecrawl_app=app, encoder=encoder)
+    firecrawl = runtime.get_firecrawl()
+    assert runtime.get_firecrawl() is firecrawl and firecrawl.app is app
+    assert runtime.get_encoder() is encoder
+
+
+@pytest.mark.parametrize("kind, executor_type", [
+    ("inline", type(None)), ("thread", ThreadPoolExecutor), ("process", ProcessPoolExecutor)
+])
+def test_page_executor_is_created_once_and_closed(kind, executor_type):
+    runtime = Runtime(config=RuntimeConfig(page_executor=kind, page_workers=1))
+    executor = runtime.get_page_executor()
+    assert isinstance(executor, executor_type)
+    assert runtime.get_page_executor() is executor
+
+    runtime.close_page_executor()
+    assert runtime._page_executor is None
+    if executor is not None:
+        # The next response gets a fresh pool
+        assert runtime.get_page_executor() is not executor
+        runtime.close_page_executor(wait=True)
+
+
+def test_set_runtime_none_starts_fresh():
+    previous = get_runtime()
+    try:
+        set_runtime(None)
+        fresh = get_runtime()
+        assert fresh is not previous and get_runtime() is fresh
+    finally:
+        set_runtime(previous)
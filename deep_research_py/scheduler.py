@@ -0,0 +1,431 @@
+import asyncio
+import os
+import random
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, Optional, TypeVar
+
+from .tracing import current_span
+
+T = TypeVar("T")
+
+
+@dataclass
+class ServiceLimits:
+    """Rate limits and concurrency bounds for one external service."""
+    requests_per_minute: float
+    tokens_per_minute: Optional[float] = None
+    initial_concurrency: int = 4
+    max_concurrency: int = 16
+    target_latency: float = 30.0
+    max_retries: int = 5
+    # Seconds an attempt may take before it is abandoned and retried; 0 waits forever
+    timeout: float = 0.0
+    # Fire a duplicate of calls that are still running after the p95 latency of recent calls
+    hedge: bool = False
+
+
+# Attempts abandoned after the call timeout are retried at most this many times; a hung
+# service would otherwise hold a caller for max_retries full timeouts
+MAX_TIMEOUT_RETRIES = 1
+
+# `time.monotonic()` time after which calls started in this context are no longer retried
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+
+@contextmanager
+def call_deadline(deadline: Optional[float]) -> Iterator[None]:
+    """Calls made inside the block, including by tasks it starts, are not retried past `deadline`."""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+# A p95 latency is only trusted for hedging once this many calls have completed
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200
+
+
+# Defaults per service, each field can be overridden with <SERVICE>_<FIELD> env vars,
+# e.g. OPENAI_RPM, OPENAI_TPM, FIRECRAWL_RPM, FIRECRAWL_MAX_CONCURRENCY, OPENAI_TIMEOUT,
+# FIRECRAWL_HEDGE.
+DEFAULT_LIMITS: Dict[str, ServiceLimits] = {
+    "openai": ServiceLimits(
+        requests_per_minute=500,
+        tokens_per_minute=200_000,
+        initial_concurrency=4,
+        max_concurrency=32,
+        target_latency=60.0,
+        timeout=180.0,
+    ),
+    # Firecrawl "tokens" are result credits, one per requested search result
+    "firecrawl": ServiceLimits(
+        requests_per_minute=30,
+        tokens_per_minute=None,
+        initial_concurrency=2,
+        max_concurrency=8,
+        target_latency=20.0,
+        # Firecrawl is asked to give up after 15s itself (see `Firecrawl.search`)
+        timeout=45.0,
+    ),
+}
+
+
+class TokenBucket:
+    """Bucket refilled continuously at `per_minute` units per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Waits until `amount` units are available and takes them, first come first served."""
+        # A single oversized request must not wait forever
+        amount = min(amount, self.capacity)
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            if self._waiters[0] is not fut:
+                await fut
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+        finally:
+            self._waiters.remove(fut)
+            if self._waiters and not self._waiters[0].done():
+                self._waiters[0].set_result(None)
+
+    def adjust(self, delta: float) -> None:
+        """Charges (or refunds, if negative) `delta` units after the fact."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit: grows while calls are fast, shrinks on throttling or slowness."""
+
+    def __init__(self, initial: int, max_limit: int, target_latency: float, min_limit: int = 1):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = float(min(max(initial, min_limit), self.max_limit))
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.current_limit and not self._waiters:
+            self.in_flight += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        self._wake()
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # The slot was handed to us just before cancellation, give it back
+                self.release()
+            elif fut in self._waiters:
+                # `_wake` may already have dropped the cancelled future
+                self._waiters.remove(fut)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self.current_limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.in_flight += 1
+                fut.set_result(None)
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.target_latency:
+            self.limit = max(self.min_limit, self.limit * 0.9)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._wake()
+
+    def on_rate_limited(self) -> None:
+        self.limit = max(self.min_limit, self.limit / 2)
+
+    def on_timeout(self) -> None:
+        # A hung call is throttling by another name, whatever the target latency
+        self.on_rate_limited()
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    """Best-effort HTTP status code of an error raised by an SDK."""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status
+    match = re.search(r"[Ss]tatus code:? (\d{3})", str(error))
+    return int(match.group(1)) if match else None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    return error_status_code(error) == 429 or "rate limit" in str(error).lower()
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    if is_rate_limit_error(error):
+        return True
+    status = error_status_code(error)
+    if status is not None:
+        return status in (408, 409) or status >= 500
+    return isinstance(error, (ConnectionError, asyncio.TimeoutError)) or (
+        "Connection" in type(error).__name__
+    )
+
+
+def _parse_flag(value: str) -> bool:
+    return value.strip().lower() not in ("", "0", "false", "no", "off", "n", "f")
+
+
+class ServiceScheduler:
+    """Run-wide gate for one service: RPM and TPM budgets plus adaptive in-flight concurrency."""
+
+    def __init__(self, name: str, limits: ServiceLimits):
+        self.name = name
+        self.limits = limits
+        self.requests = TokenBucket(limits.requests_per_minute)
+        self.tokens = TokenBucket(limits.tokens_per_minute) if limits.tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial=limits.initial_concurrency,
+            max_limit=limits.max_concurrency,
+            target_latency=limits.target_latency,
+        )
+        self.rate_limited_count = 0
+        self.timed_out_count = 0
+        self.hedged_count = 0
+        self.latencies: Deque[float] = deque(maxlen=HEDGE_WINDOW)
+
+    @classmethod
+    def from_env(cls, name: str) -> "ServiceScheduler":
+        defaults = DEFAULT_LIMITS.get(name, ServiceLimits(requests_per_minute=60))
+        prefix = name.upper()
+
+        def env(key: str, default: Any, cast: Callable[[str], Any]) -> Any:
+            value = os.environ.get(f"{prefix}_{key}")
+            return cast(value) if value else default
+
+        tpm = env("TPM", defaults.tokens_per_minute, float)
+        return cls(name, ServiceLimits(
+            requests_per_minute=env("RPM", defaults.requests_per_minute, float),
+            tokens_per_minute=tpm or None,
+            initial_concurrency=env("INITIAL_CONCURRENCY", defaults.initial_concurrency, int),
+            max_concurrency=env("MAX_CONCURRENCY", defaults.max_concurrency, int),
+            target_latency=env("TARGET_LATENCY", defaults.target_latency, float),
+            max_retries=env("MAX_RETRIES", defaults.max_retries, int),
+            timeout=env("TIMEOUT", defaults.timeout, float),
+            hedge=env("HEDGE", defaults.hedge, _parse_flag),
+        ))
+
+    def hedge_delay(self) -> Optional[float]:
+        """p95 latency of recent calls, or None until there are enough of them."""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    async def run(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        cost: float = 0,
+        actual_cost: Optional[Callable[[T], Optional[float]]] = None,
+        hedge: bool = False,
+        timeout: Optional[float] = None,
+    ) -> T:
+        """Runs `fn` once budgets and a concurrency slot allow, retrying throttled calls.
+
+        `cost` is the estimated token spend, charged once up front however many attempts the
+        call takes and refunded if it fails; `actual_cost` extracts the real spend from the result so the token budget
+        can be corrected afterwards. Each attempt is abandoned after `timeout` seconds, the
+        service's timeout by default, and retried at most MAX_TIMEOUT_RETRIES times. No retry
+        starts past the `call_deadline` of the caller.
+        `hedge` marks `fn` as safe to run twice: if the service has hedging turned on, an
+        attempt still running after the recent p95 latency gets a duplicate, and whichever
+        finishes first wins.
+        """
+        result = await self._call(fn, cost, hedge, timeout)
+        if self.tokens is not None and actual_cost is not None:
+            actual = actual_cost(result)
+            if actual is not None:
+                self.tokens.adjust(actual - cost)
+        return result
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        cost: float = 0,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[T]:
+        """Like `run`, for calls whose result is read after `fn` returns, e.g. a streamed response.
+
+        The concurrency slot is held until the block exits, so streams being read count
+        against the limit like any other call in flight. Correct the token charge with
+        `self.tokens.adjust` inside the block once the real usage is known.
+        """
+        result = await self._call(fn, cost, False, timeout, hold=True)
+        try:
+            yield result
+        finally:
+            self.concurrency.release()
+
+    async def _call(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        cost: float,
+        hedge: bool,
+        timeout: Optional[float],
+        hold: bool = False,
+    ) -> T:
+        if self.tokens is not None and cost:
+            span = current_span()
+            requested = time.monotonic()
+            await self.tokens.acquire(cost)
+            if span is not None:
+                span.queue_wait += time.monotonic() - requested
+
+        try:
+            return await self._attempts(fn, hedge, timeout, hold)
+        except BaseException:
+            # Failed, timed out or cancelled calls are not billed by the provider
+            if self.tokens is not None and cost:
+                self.tokens.adjust(-cost)
+            raise
+
+    async def _attempts(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        hedge: bool,
+        timeout: Optional[float],
+        hold: bool,
+    ) -> T:
+        attempt = 0
+        timeouts = 0
+        while True:
+            try:
+                if hedge and self.limits.hedge:
+                    result = await self._run_hedged(fn, timeout)
+                else:
+                    result = await self._run_once(fn, timeout, hold)
+            except Exception as e:
+                if not is_retryable_error(e) or attempt >= self.limits.max_retries:
+                    raise
+                if isinstance(e, asyncio.TimeoutError):
+                    timeouts += 1
+                    if timeouts > MAX_TIMEOUT_RETRIES:
+                        raise
+                if is_rate_limit_error(e):
+                    self.rate_limited_count += 1
+                    self.concurrency.on_rate_limited()
+                attempt += 1
+                backoff = min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+                deadline = _deadline.get()
+                if deadline is not None and time.monotonic() + backoff >= deadline:
+                    raise
+                await asyncio.sleep(backoff)
+                continue
+            return result
+
+    async def _run_once(
+        self,
+        fn: Callable[[], Awaitable[T]],
+        timeout: Optional[float],
+        hold: bool = False,
+    ) -> T:
+        """One attempt; with `hold`, a successful attempt keeps its concurrency slot for the caller."""
+        span = current_span()
+        requested = time.monotonic()
+        await self.requests.acquire()
+        await self.concurrency.acquire()
+        start = time.monotonic()
+        if span is not None:
+            span.queue_wait += start - requested
+        timeout = timeout if timeout is not None else self.limits.timeout
+        try:
+            result = await asyncio.wait_for(fn(), timeout or None)
+        except asyncio.TimeoutError:
+            self.concurrency.release()
+            self.timed_out_count += 1
+            # Hung calls shrink the concurrency limit, and stay out of the latencies, where
+            # they would push the hedging delay up to the timeout
+            self.concurrency.on_timeout()
+            raise
+        except BaseException:
+            self.concurrency.release()
+            raise
+        if not hold:
+            self.concurrency.release()
+        latency = time.monotonic() - start
+        self.latencies.append(latency)
+        self.concurrency.on_success(latency)
+        return result
+
+    async def _run_hedged(self, fn: Callable[[], Awaitable[T]], timeout: Optional[float]) -> T:
+        delay = self.hedge_delay()
+        attempts = {asyncio.ensure_future(self._run_once(fn, timeout))}
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(attempts, timeout=delay)
+                if not done:
+                    self.hedged_count += 1
+                    span = current_span()
+                    if span is not None:
+                        span.attrs["hedged"] = True
+                    attempts.add(asyncio.ensure_future(self._run_once(fn, timeout)))
+            error: Optional[BaseException] = None
+            while attempts:
+                done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                for attempt in done:
+                    if attempt.exception() is None:
+                        return attempt.result()
+                    error = attempt.exception()
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+
+_schedulers: Dict[str, ServiceScheduler] = {}
+
+
+def get_scheduler(name: str) -> ServiceScheduler:
+    """Returns the process-wide scheduler for a service ("openai" or "firecrawl")."""
+    if name not in _schedulers:
+        _schedulers[name] = ServiceScheduler.from_env(name)
+    return _schedulers[name]
+
+
+def reset_schedulers() -> None:
+    """Drops all schedulers so the next use re-reads their limits from the environment."""
+    _schedulers.clear()
@@ -0,0 +1,243 @@
+import asyncio
+import time
+
+import pytest
+
+from . import scheduler as scheduler_module
+from .scheduler import (
+    AdaptiveConcurrencyLimiter,
+    ServiceLimits,
+    ServiceScheduler,
+    TokenBucket,
+    _parse_flag,
+    call_deadline,
+)
+
+
+# The backoffs fixture replaces asyncio.sleep; the fake calls keep the real one
+_sleep = asyncio.sleep
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"Status code {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """Records retry backoffs instead of sleeping through them."""
+    delays = []
+
+    async def fast_sleep(delay, *args, **kwargs):
+        delays.append(delay)
+        await _sleep(0)
+
+    monkeypatch.setattr(scheduler_module.asyncio, "sleep", fast_sleep)
+    return delays
+
+
+def _scheduler(**limits) -> ServiceScheduler:
+    return ServiceScheduler("test", ServiceLimits(requests_per_minute=60_000, **limits))
+
+
+def _flaky(*errors, result="ok", delay=0.0):
+    """A call that raises `errors` in turn, then returns `result`; counts its attempts."""
+    attempts = []
+
+    async def call():
+        attempts.append(time.monotonic())
+        if len(attempts) <= len(errors):
+            raise errors[len(attempts) - 1]
+        await _sleep(delay)
+        return result
+
+    return call, attempts
+
+
+async def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(per_minute=600)
+    start = time.monotonic()
+    await bucket.acquire(600)
+    assert time.monotonic() - start < 0.05
+    await bucket.acquire(2)
+    # 10 units a second
+    assert time.monotonic() - start >= 0.15
+
+
+async def test_token_bucket_caps_oversized_requests_and_refunds():
+    bucket = TokenBucket(per_minute=60)
+    await bucket.acquire(1000)
+    assert bucket.tokens == pytest.approx(0, abs=0.1)
+    bucket.adjust(-30)
+    assert bucket.tokens == pytest.approx(30, abs=0.1)
+    bucket.adjust(-1000)
+    assert bucket.tokens == bucket.capacity
+
+
+def test_aimd_grows_additively_and_shrinks_multiplicatively():
+    limiter = AdaptiveConcurrencyLimiter(initial=4, max_limit=5, target_latency=1.0)
+    limiter.on_success(0.1)
+    assert limiter.limit == pytest.approx(4.25)
+    limiter.on_success(2.0)
+    assert limiter.limit == pytest.approx(4.25 * 0.9)
+    limiter.on_rate_limited()
+    assert limiter.limit == pytest.approx(4.25 * 0.9 / 2)
+    limiter.on_timeout()
+    assert limiter.current_limit == 1
+    for _ in range(100):
+        limiter.on_success(0.1)
+    assert limiter.limit == 5
+    for _ in range(10):
+        limiter.on_rate_limited()
+    assert limiter.current_limit == limiter.min_limit == 1
+
+
+async def test_limiter_queues_calls_beyond_the_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial=2, max_limit=2, target_latency=1.0)
+    await limiter.acquire()
+    await limiter.acquire()
+    waiter = asyncio.ensure_future(limiter.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    limiter.release()
+    await asyncio.wait_for(waiter, 1)
+    assert limiter.in_flight == 2
+
+
+async def test_throttled_calls_are_retried_and_shrink_the_limit(backoffs):
+    scheduler = _scheduler(initial_concurrency=8, max_concurrency=8)
+    call, attempts = _flaky(StatusError(429), StatusError(503))
+
+    assert await scheduler.run(call) == "ok"
+    assert len(attempts) == 3 and len(backoffs) == 2
+    assert scheduler.rate_limited_count == 1
+    assert scheduler.concurrency.limit < 8
+    assert scheduler.concurrency.in_flight == 0
+
+
+async def test_client_errors_and_exhausted_retries_raise(backoffs):
+    scheduler = _scheduler(max_retries=2)
+    call, attempts = _flaky(StatusError(400))
+    with pytest.raises(StatusError):
+        await scheduler.run(call)
+    assert len(attempts) == 1
+
+    call, attempts = _flaky(*[StatusError(500)] * 5)
+    with pytest.raises(StatusError):
+        await scheduler.run(call)
+    assert len(attempts) == 3
+    assert scheduler.concurrency.in_flight == 0
+
+
+async def test_timeouts_are_retried_once_and_shrink_the_limit(backoffs):
+    scheduler = _scheduler(initial_concurrency=8, max_concurrency=8, timeout=0.05)
+    call, attempts = _flaky(delay=10)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await scheduler.run(call)
+    assert len(attempts) == 2
+    assert scheduler.timed_out_count == 2
+    assert scheduler.concurrency.limit == 2
+    assert scheduler.concurrency.in_flight == 0
+    # Hung attempts do not count as latencies
+    assert not scheduler.latencies
+
+
+async def test_no_retry_starts_past_the_deadline(backoffs):
+    scheduler = _scheduler()
+    call, attempts = _flaky(StatusError(503))
+    # Every backoff is at least a second
+    with call_deadline(time.monotonic() + 0.5):
+        with pytest.raises(StatusError):
+            await scheduler.run(call)
+    assert len(attempts) == 1 and not backoffs
+
+
+async def test_token_cost_is_charged_once_per_call(backoffs):
+    scheduler = _scheduler(tokens_per_minute=60_000)
+    call, attempts = _flaky(StatusError(429), StatusError(429))
+
+    await scheduler.run(call, cost=1000)
+    assert len(attempts) == 3
+    assert scheduler.tokens.tokens == pytest.approx(59_000, abs=50)
+
+    await scheduler.run(_flaky()[0], cost=1000, actual_cost=lambda result: 250)
+    assert scheduler.tokens.tokens == pytest.approx(58_750, abs=50)
+
+
+async def test_token_cost_of_failed_calls_is_refunded(backoffs):
+    scheduler = _scheduler(tokens_per_minute=60_000, max_retries=1, timeout=0.01)
+    scheduler.tokens.tokens = 30_000
+
+    with pytest.raises(StatusError):
+        await scheduler.run(_flaky(StatusError(500), StatusError(500))[0], cost=1000)
+    assert scheduler.tokens.tokens == pytest.approx(30_000, abs=50)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await scheduler.run(_flaky(delay=1.0)[0], cost=1000)
+    assert scheduler.tokens.tokens == pytest.approx(30_000, abs=50)
+
+    with pytest.raises(StatusError):
+        async with scheduler.stream(_flaky(StatusError(400))[0], cost=1000):
+            pass
+    assert scheduler.tokens.tokens == pytest.approx(30_000, abs=50)
+
+
+async def test_slow_attempts_are_hedged():
+    scheduler = _scheduler(hedge=True)
+    scheduler.latencies.extend([0.01] * 20)
+    calls = []
+
+    async def call():
+        calls.append(None)
+        # The first attempt hangs, its duplicate answers at once
+        await asyncio.sleep(10 if len(calls) == 1 else 0)
+        return len(calls)
+
+    start = time.monotonic()
+    assert await scheduler.run(call, hedge=True) == 2
+    assert time.monotonic() - start < 1
+    assert scheduler.hedged_count == 1
+    await asyncio.sleep(0)
+    assert scheduler.concurrency.in_flight == 0
+
+
+async def test_calls_not_marked_safe_are_never_hedged():
+    scheduler = _scheduler(hedge=True)
+    scheduler.latencies.extend([0.001] * 20)
+    call, attempts = _flaky(delay=0.05)
+    await scheduler.run(call)
+    assert len(attempts) == 1 and scheduler.hedged_count == 0
+
+
+async def test_stream_holds_the_slot_until_the_block_exits():
+    scheduler = _scheduler()
+    async with scheduler.stream(_flaky(result="stream")[0]) as stream:
+        assert stream == "stream"
+        assert scheduler.concurrency.in_flight == 1
+    assert scheduler.concurrency.in_flight == 0
+
+    with pytest.raises(RuntimeError):
+        async with scheduler.stream(_flaky()[0]):
+            raise RuntimeError("reader failed")
+    assert scheduler.concurrency.in_flight == 0
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1", True), ("true", True), (" Yes ", True),
+    ("0", False), ("false", False), ("FALSE", False), (" off\n", False), ("No", False), ("", False),
+])
+def test_parse_flag(value, expected):
+    assert _parse_flag(value) is expected
+
+
+def test_limits_are_read_from_the_environment(monkeypatch):
+    monkeypatch.setenv("OPENAI_RPM", "120")
+    monkeypatch.setenv("OPENAI_HEDGE", " Off ")
+    monkeypatch.setenv("OPENAI_TIMEOUT", "5")
+    scheduler = ServiceScheduler.from_env("openai")
+    assert scheduler.limits.requests_per_minute == 120
+    assert scheduler.limits.hedge is False
+    assert scheduler.limits.timeout == 5
+    assert scheduler.limits.tokens_per_minute == 200_000
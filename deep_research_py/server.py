@@ -0,0 +1,318 @@
+"""HTTP service running research jobs on one shared event loop.
+
+    POST   /jobs              {"query", "breadth", "depth", "follow_ups", "time_limit", "engine", "report_mode"} -> 202 {"id", ...}
+    GET    /jobs              status of every known job
+    GET    /jobs/{id}         status, and the report once the job is done
+    GET    /jobs/{id}/events  Server-Sent Events: progress, learnings and report tokens
+    DELETE /jobs/{id}         cancels a queued or running job
+
+All jobs share the runtime's clients, the response cache and the per-service schedulers, so
+rate limits apply to the service as a whole.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+from aiohttp import web
+
+from .batch import BatchJob
+from .dedup import ResearchRegistry
+from .engines import ENGINES
+from .events import event_sink
+from .journal import RunJournal
+from .report import REPORT_MODE, write_report_stream
+from .runtime import get_runtime
+from .tracing import reset_tracer
+
+SERVER_MAX_JOBS = int(os.environ.get("DEEP_RESEARCH_SERVER_MAX_JOBS", "4"))
+SERVER_MAX_QUEUED = int(os.environ.get("DEEP_RESEARCH_SERVER_MAX_QUEUED", "100"))
+# Finished jobs (with their events and report) kept for late readers
+SERVER_MAX_FINISHED = int(os.environ.get("DEEP_RESEARCH_SERVER_MAX_FINISHED", "100"))
+SERVER_MAX_SPANS = int(os.environ.get("DEEP_RESEARCH_SERVER_MAX_SPANS", "100000"))
+
+# Seconds between SSE comments that keep idle connections open through proxies
+SSE_KEEPALIVE = 15.0
+
+FINAL_STATUSES = ("done", "failed", "cancelled")
+
+
+class ResearchJob:
+    """A submitted research job, its event history and its live subscribers."""
+
+    def __init__(self, job: BatchJob, engine: str, report_mode: str = REPORT_MODE):
+        self.job = job
+        self.engine = engine
+        self.report_mode = report_mode
+        self.status = "queued"
+        self.created_at = time.time()
+        self.run_id: Optional[str] = None
+        self.report: Optional[str] = None
+        self.error: Optional[str] = None
+        self.learnings: List[str] = []
+        self.visited_urls: List[str] = []
+        self.events: List[Dict[str, Any]] = []
+        self.task: Optional["asyncio.Task[None]"] = None
+        self._subscribers: Set["asyncio.Queue[Dict[str, Any]]"] = set()
+
+    @property
+    def id(self) -> str:
+        return self.job.id
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINAL_STATUSES
+
+    def publish(self, event: str, data: Dict[str, Any]) -> None:
+        record = {"id": len(self.events), "event": event, "data": data}
+        self.events.append(record)
+        for queue in self._subscribers:
+            queue.put_nowait(record)
+
+    def set_status(self, status: str, **data: Any) -> None:
+        self.status = status
+        self.publish("status", {"status": status, **data})
+
+    def subscribe(self, after: int = -1) -> "asyncio.Queue[Dict[str, Any]]":
+        """Queue receiving the events after id `after`: the stored ones first, then live ones."""
+        queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        for record in self.events[after + 1:]:
+            queue.put_nowait(record)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: "asyncio.Queue[Dict[str, Any]]") -> None:
+        self._subscribers.discard(queue)
+
+    def to_dict(self, include_report: bool = False) -> Dict[str, Any]:
+        info: Dict[str, Any] = {
+            "id": self.id,
+            "query": self.job.query,
+            "breadth": self.job.breadth,
+            "depth": self.job.depth,
+            "engine": self.engine,
+            "report_mode": self.report_mode,
+            "status": self.status,
+            "run_id": self.run_id,
+            "created_at": self.created_at,
+            "learnings": len(self.learnings),
+            "urls": len(self.visited_urls),
+        }
+        if self.error:
+            info["error"] = self.error
+        if include_report and self.report is not None:
+            info["report"] = self.report
+        return info
+
+
+class JobManager:
+    """Runs submitted jobs with at most `max_jobs` researching at the same time."""
+
+    def __init__(self, max_jobs: int = SERVER_MAX_JOBS, max_queued: int = SERVER_MAX_QUEUED,
+                 max_finished: int = SERVER_MAX_FINISHED):
+        self.max_jobs = max_jobs
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, ResearchJob]" = OrderedDict()
+        self._slots = asyncio.Semaphore(max_jobs)
+
+    @property
+    def active(self) -> int:
+        return sum(not job.finished for job in self.jobs.values())
+
+    def submit(self, job: BatchJob, engine: str = "dfs", report_mode: str = REPORT_MODE) -> ResearchJob:
+        if self.active >= self.max_jobs + self.max_queued:
+            raise OverflowError("Too many jobs queued")
+        research_job = ResearchJob(job, engine, report_mode)
+        self.jobs[research_job.id] = research_job
+        research_job.publish("status", {"status": "queued"})
+        research_job.task = asyncio.create_task(self._run(research_job))
+        research_job.task.add_done_callback(lambda task: self._on_done(research_job, task))
+        return research_job
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.finished or job.task is None:
+            return False
+        job.task.cancel()
+        return True
+
+    async def _run(self, job: ResearchJob) -> None:
+        try:
+            async with self._slots:
+                journal = RunJournal.create(job.job.combined_query, job.job.breadth, job.job.depth)
+                job.run_id = journal.run_id
+                job.set_status("running", run_id=journal.run_id)
+
+                research = ENGINES[job.engine]
+                registry = ResearchRegistry()
+                with event_sink(job.publish):
+                    results = await research(
+                        query=job.job.combined_query,
+                        breadth=job.job.breadth,
+                        depth=job.job.depth,
+                        journal=journal,
+                        registry=registry,
+                        deadline=job.job.deadline()
+                    )
+                job.learnings = results["learnings"]
+                job.visited_urls = results["visited_urls"]
+                job.publish("learnings", {"learnings": job.learnings, "urls": job.visited_urls})
+
+                parts = []
+                async for chunk in write_report_stream(
+                    prompt=job.job.combined_query,
+                    learnings=job.learnings,
+                    visited_urls=job.visited_urls,
+                    store=registry.learnings,
+                    mode=job.report_mode
+                ):
+                    parts.append(chunk)
+                    job.publish("report", {"text": chunk})
+                job.report = "".join(parts)
+            job.set_status("done")
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.set_status("failed", error=job.error)
+
+    def _on_done(self, job: ResearchJob, task: "asyncio.Task[None]") -> None:
+        # Also covers jobs cancelled before their task got to run at all
+        if task.cancelled() and not job.finished:
+            job.set_status("cancelled")
+        self._forget_finished()
+
+    def _forget_finished(self) -> None:
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self.jobs[job_id]
+
+    async def shutdown(self) -> None:
+        tasks = [job.task for job in self.jobs.values() if job.task and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+MANAGER_KEY = web.AppKey("manager", JobManager)
+
+
+def _manager(request: web.Request) -> JobManager:
+    return request.app[MANAGER_KEY]
+
+
+def _get_job(request: web.Request) -> ResearchJob:
+    job = _manager(request).jobs.get(request.match_info["job_id"])
+    if job is None:
+        raise web.HTTPNotFound(text=json.dumps({"error": "Unknown job"}), content_type="application/json")
+    return job
+
+
+async def create_job(request: web.Request) -> web.Response:
+    try:
+        data = await request.json()
+        engine = data.get("engine", "dfs")
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {', '.join(ENGINES)}")
+        report_mode = data.get("report_mode", REPORT_MODE)
+        if report_mode not in ("auto", "single", "map-reduce"):
+            raise ValueError("report_mode must be 'auto', 'single' or 'map-reduce'")
+        job = BatchJob.from_dict(data, default_id=uuid.uuid4().hex[:12])
+        if job.id in _manager(request).jobs:
+            raise ValueError(f"Job {job.id} already exists")
+    except (ValueError, KeyError, TypeError) as e:
+        return web.json_response({"error": f"Invalid job: {e}"}, status=400)
+
+    try:
+        research_job = _manager(request).submit(job, engine, report_mode)
+    except OverflowError as e:
+        return web.json_response({"error": str(e)}, status=503)
+    return web.json_response(
+        {**research_job.to_dict(), "events": f"/jobs/{research_job.id}/events"}, status=202
+    )
+
+
+async def list_jobs(request: web.Request) -> web.Response:
+    return web.json_response([job.to_dict() for job in _manager(request).jobs.values()])
+
+
+async def get_job(request: web.Request) -> web.Response:
+    return web.json_response(_get_job(request).to_dict(include_report=True))
+
+
+async def cancel_job(request: web.Request) -> web.Response:
+    job = _get_job(request)
+    if not _manager(request).cancel(job.id):
+        return web.json_response({"error": f"Job is already {job.status}"}, status=409)
+    return web.json_response({"id": job.id, "status": "cancelling"}, status=202)
+
+
+async def job_events(request: web.Request) -> web.StreamResponse:
+    """Streams the job's events as SSE, replaying them after `Last-Event-ID` when reconnecting."""
+    job = _get_job(request)
+    try:
+        after = int(request.headers.get("Last-Event-ID", "-1"))
+    except ValueError:
+        after = -1
+
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+
+    queue = job.subscribe(after)
+    try:
+        while True:
+            try:
+                record = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                await response.write(b": keepalive\n\n")
+                continue
+            await response.write(
+                f"id: {record['id']}\nevent: {record['event']}\n"
+                f"data: {json.dumps(record['data'])}\n\n".encode("utf-8")
+            )
+            if record["event"] == "status" and record["data"]["status"] in FINAL_STATUSES:
+                break
+    except ConnectionResetError:
+        # The client went away; the job itself keeps running
+        pass
+    finally:
+        job.unsubscribe(queue)
+    return response
+
+
+async def health(request: web.Request) -> web.Response:
+    manager = _manager(request)
+    return web.json_response({"status": "ok", "active_jobs": manager.active, "max_jobs": manager.max_jobs})
+
+
+def create_app(max_jobs: int = SERVER_MAX_JOBS, max_queued: int = SERVER_MAX_QUEUED) -> web.Application:
+    app = web.Application()
+
+    async def on_startup(app: web.Application) -> None:
+        # Spans of a long-lived process are capped instead of growing with every job
+        reset_tracer(max_spans=SERVER_MAX_SPANS)
+        app[MANAGER_KEY] = JobManager(max_jobs=max_jobs, max_queued=max_queued)
+
+    async def on_shutdown(app: web.Application) -> None:
+        await app[MANAGER_KEY].shutdown()
+        get_runtime().close_page_executor()
+
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    app.router.add_get("/health", health)
+    app.router.add_post("/jobs", create_job)
+    app.router.add_get("/jobs", list_jobs)
+    app.router.add_get("/jobs/{job_id}", get_job)
+    app.router.add_delete("/jobs/{job_id}", cancel_job)
+    app.router.add_get("/jobs/{job_id}/events", job_events)
+    return app
+
+
+def run_server(host: str = "127.0.0.1", port: int = 8080, max_jobs: Optional[int] = None) -> None:
+    web.run_app(create_app(max_jobs=max_jobs or SERVER_MAX_JOBS), host=host, port=port)
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from .server import create_app
+
+
+@pytest.fixture
+async def client(fake_runtime, tmp_path, monkeypatch):
+    # Run journals go to ./runs
+    monkeypatch.chdir(tmp_path)
+    async with TestClient(TestServer(create_app(max_jobs=2))) as client:
+        yield client
+
+
+async def read_events(response):
+    """Parses an SSE body into (event, data) pairs."""
+    events = []
+    for block in (await response.text()).split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def test_a_submitted_job_streams_its_events_until_done(client):
+    response = await client.post("/jobs", json={"id": "solar", "query": "solar panel prices",
+                                                "breadth": 2, "depth": 1})
+    assert response.status == 202
+    created = await response.json()
+    assert created["id"] == "solar" and created["events"] == "/jobs/solar/events"
+
+    response = await client.get(created["events"])
+    assert response.headers["Content-Type"] == "text/event-stream"
+    events = await read_events(response)
+    statuses = [data["status"] for event, data in events if event == "status"]
+    assert statuses == ["queued", "running", "done"]
+    learnings = [data for event, data in events if event == "learnings"]
+    assert len(learnings) == 1 and learnings[0]["learnings"]
+    report = "".join(data["text"] for event, data in events if event == "report")
+    assert report
+
+    job = await (await client.get("/jobs/solar")).json()
+    assert job["status"] == "done" and job["report"] == report
+    assert job["learnings"] == len(learnings[0]["learnings"])
+
+
+async def test_reconnecting_replays_only_later_events(client):
+    await client.post("/jobs", json={"id": "wind", "query": "wind turbines", "breadth": 1, "depth": 1})
+    events = await read_events(await client.get("/jobs/wind/events"))
+
+    replayed = await read_events(
+        await client.get("/jobs/wind/events", headers={"Last-Event-ID": str(len(events) - 2)})
+    )
+    assert replayed == events[-1:]
+
+
+async def test_unknown_jobs_are_not_found(client):
+    for response in (await client.get("/jobs/missing"), await client.get("/jobs/missing/events"),
+                     await client.delete("/jobs/missing")):
+        assert response.status == 404
+        assert await response.json() == {"error": "Unknown job"}
+
+
+async def test_invalid_and_duplicate_jobs_are_rejected(client):
+    response = await client.post("/jobs", json={"query": "q", "engine": "nope"})
+    assert response.status == 400
+
+    response = await client.post("/jobs", json={"id": "dup", "query": "q", "breadth": 1, "depth": 1})
+    assert response.status == 202
+    response = await client.post("/jobs", json={"id": "dup", "query": "q"})
+    assert response.status == 400
+    assert "already exists" in (await response.json())["error"]
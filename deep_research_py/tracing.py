@@ -0,0 +1,275 @@
+import asyncio
+import functools
+import heapq
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Dollar price per million tokens, used to estimate the cost of each chat completion
+OPENAI_INPUT_COST_PER_MTOK = float(os.environ.get("OPENAI_INPUT_COST_PER_MTOK", "1.10"))
+OPENAI_OUTPUT_COST_PER_MTOK = float(os.environ.get("OPENAI_OUTPUT_COST_PER_MTOK", "4.40"))
+# Prompt tokens served from the provider's prompt prefix cache are billed at this price instead
+OPENAI_CACHED_INPUT_COST_PER_MTOK = float(os.environ.get("OPENAI_CACHED_INPUT_COST_PER_MTOK", "0.55"))
+
+_current_node: ContextVar[Optional[str]] = ContextVar("current_node", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_current_usage: ContextVar[Optional["Usage"]] = ContextVar("current_usage", default=None)
+
+
+@dataclass
+class Span:
+    """One timed stage of a run, attributed to a node of the research tree."""
+    name: str
+    category: str
+    node: Optional[str]
+    parent: Optional[str]
+    lane: int
+    start: float
+    duration: float = 0.0
+    queue_wait: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Part of prompt_tokens that hit the provider's prompt prefix cache
+    cached_tokens: int = 0
+    bytes: int = 0
+    cache_hit: bool = False
+    error: Optional[str] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def cost(self) -> float:
+        return (
+            (self.prompt_tokens - self.cached_tokens) * OPENAI_INPUT_COST_PER_MTOK
+            + self.cached_tokens * OPENAI_CACHED_INPUT_COST_PER_MTOK
+            + self.completion_tokens * OPENAI_OUTPUT_COST_PER_MTOK
+        ) / 1_000_000
+
+
+@dataclass
+class Usage:
+    """Tokens and estimated cost of the spans finished inside a `track_usage` block."""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    cost: float = 0.0
+
+    @property
+    def tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def add(self, span: Span) -> None:
+        self.prompt_tokens += span.prompt_tokens
+        self.completion_tokens += span.completion_tokens
+        self.cached_tokens += span.cached_tokens
+        self.cost += span.cost
+
+
+@contextmanager
+def track_usage() -> Iterator[Usage]:
+    """Adds up the usage of every span finished inside the block, including in tasks it starts.
+
+    Unlike the tracer's summaries this only counts one run, even when several share a process.
+    """
+    usage = Usage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+class Tracer:
+    """Collects spans for a run and exports them as a Chrome trace or a per-stage summary.
+
+    `max_spans` keeps only the most recent spans, for long-lived processes such as the server.
+    """
+
+    def __init__(self, max_spans: Optional[int] = None) -> None:
+        self.origin = time.perf_counter()
+        self.spans: Deque[Span] = deque(maxlen=max_spans)
+        # Lane of each running task; a finished task's lane is freed for the next new task
+        self._lanes: Dict[int, int] = {}
+        self._free_lanes: List[int] = []
+
+    def _lane(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            return 0
+        lane = self._lanes.get(id(task))
+        if lane is None:
+            lane = heapq.heappop(self._free_lanes) if self._free_lanes else len(self._lanes) + 1
+            self._lanes[id(task)] = lane
+            task.add_done_callback(self._release_lane)
+        return lane
+
+    def _release_lane(self, task: "asyncio.Task[Any]") -> None:
+        lane = self._lanes.pop(id(task), None)
+        if lane is not None:
+            heapq.heappush(self._free_lanes, lane)
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **attrs: Any) -> Iterator[Span]:
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            category=category,
+            node=_current_node.get(),
+            parent=parent.name if parent else None,
+            lane=self._lane(),
+            start=time.perf_counter() - self.origin,
+            attrs=attrs,
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.duration = time.perf_counter() - self.origin - span.start
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # An async generator finalized from another context
+                pass
+            self.spans.append(span)
+            usage = _current_usage.get()
+            if usage is not None:
+                usage.add(span)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Aggregates spans per stage name, slowest total time first."""
+        stages: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            stage = stages.setdefault(span.name, {
+                "name": span.name,
+                "calls": 0,
+                "errors": 0,
+                "total_time": 0.0,
+                "max_time": 0.0,
+                "queue_wait": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cached_tokens": 0,
+                "cost": 0.0,
+                "bytes": 0,
+                "cache_hits": 0,
+            })
+            stage["calls"] += 1
+            stage["errors"] += span.error is not None
+            stage["total_time"] += span.duration
+            stage["max_time"] = max(stage["max_time"], span.duration)
+            stage["queue_wait"] += span.queue_wait
+            stage["prompt_tokens"] += span.prompt_tokens
+            stage["completion_tokens"] += span.completion_tokens
+            stage["cached_tokens"] += span.cached_tokens
+            stage["cost"] += span.cost
+            stage["bytes"] += span.bytes
+            stage["cache_hits"] += span.cache_hit
+        return sorted(stages.values(), key=lambda stage: stage["total_time"], reverse=True)
+
+    def node_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Aggregates spans per research tree node.
+
+        A node's time is the wall time from its first span starting to its last one ending;
+        its stages nest and overlap, so their durations are not summed.
+        """
+        nodes: Dict[str, Dict[str, Any]] = {}
+        for span in self.spans:
+            if span.node is None:
+                continue
+            node = nodes.setdefault(span.node, {
+                "start": span.start, "end": span.start + span.duration, "time": 0.0,
+                "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+                "cost": 0.0, "bytes": 0, "cache_hits": 0,
+            })
+            node["start"] = min(node["start"], span.start)
+            node["end"] = max(node["end"], span.start + span.duration)
+            node["time"] = node["end"] - node["start"]
+            node["prompt_tokens"] += span.prompt_tokens
+            node["completion_tokens"] += span.completion_tokens
+            node["cached_tokens"] += span.cached_tokens
+            node["cost"] += span.cost
+            node["bytes"] += span.bytes
+            node["cache_hits"] += span.cache_hit
+        return nodes
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Trace-event JSON that chrome://tracing and Perfetto can open."""
+        events = []
+        for span in self.spans:
+            args = {k: v for k, v in asdict(span).items()
+                    if k not in ("name", "category", "lane", "start", "duration", "attrs")}
+            args.update(span.attrs)
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": span.start * 1_000_000,
+                "dur": span.duration * 1_000_000,
+                "pid": 1,
+                "tid": span.lane,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_chrome_trace(), f, default=str)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """Returns the process-wide tracer."""
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def reset_tracer(max_spans: Optional[int] = None) -> None:
+    """Starts a fresh tracer, discarding the spans collected so far."""
+    global _tracer
+    _tracer = Tracer(max_spans)
+
+
+def trace_span(name: str, category: str = "stage", **attrs: Any):
+    """Context manager timing a block as a span of the process-wide tracer."""
+    return get_tracer().span(name, category, **attrs)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def node_context(node_id: str) -> Iterator[None]:
+    """Attributes spans opened inside the block to a research tree node."""
+    token = _current_node.set(node_id)
+    try:
+        yield
+    finally:
+        _current_node.reset(token)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """Decorator timing every call of a coroutine function as a stage span."""
+    def decorator(fn: F) -> F:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with trace_span(name):
+                return await fn(*args, **kwargs)
+        return wrapper  # type: ignore[return-value]
+    return decorator
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from .tracing import Tracer, node_context
+
+
+async def test_lanes_of_finished_tasks_are_released_and_reused():
+    tracer = Tracer()
+
+    async def work():
+        with tracer.span("work"):
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*(asyncio.ensure_future(work()) for _ in range(3)))
+    await asyncio.sleep(0)
+    assert tracer._lanes == {}
+    assert sorted(span.lane for span in tracer.spans) == [1, 2, 3]
+
+    await asyncio.ensure_future(work())
+    await asyncio.sleep(0)
+    assert tracer.spans[-1].lane == 1
+    assert tracer._lanes == {}
+
+
+async def test_node_summary_counts_nested_stages_once():
+    tracer = Tracer()
+    with node_context("0.1"):
+        with tracer.span("research_serp_query"):
+            with tracer.span("process_serp_result"):
+                with tracer.span("openai.chat", "openai") as call:
+                    call.prompt_tokens = 100
+                    call.completion_tokens = 20
+                    await asyncio.sleep(0.01)
+
+    node = tracer.node_summary()["0.1"]
+    outer = tracer.spans[-1]
+    assert outer.name == "research_serp_query"
+    assert node["time"] == pytest.approx(outer.duration)
+    assert (node["prompt_tokens"], node["completion_tokens"]) == (100, 20)
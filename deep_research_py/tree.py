@@ -0,0 +1,145 @@
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .ai.providers import count_tokens
+
+# Token budget of the prior learnings given to query generation
+QUERY_CONTEXT_TOKEN_BUDGET = int(os.environ.get("DEEP_RESEARCH_QUERY_CONTEXT_BUDGET", "4000"))
+
+
+class TreeNode:
+    """One researched SERP query; learnings and URLs are ids into the tree's tables."""
+    __slots__ = ("id", "parent", "children", "query", "learnings", "urls")
+
+    def __init__(self, node_id: str, parent: Optional["TreeNode"], query: str = ""):
+        self.id = node_id
+        self.parent = parent
+        self.children: List["TreeNode"] = []
+        self.query = query
+        self.learnings: Tuple[int, ...] = ()
+        self.urls: Tuple[int, ...] = ()
+
+    def ancestors(self) -> Iterator["TreeNode"]:
+        """The node itself, then its parent, up to the root."""
+        node: Optional[TreeNode] = self
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def walk(self) -> Iterator["TreeNode"]:
+        """The node and everything below it, depth first in query order."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(sorted(node.children, key=_position, reverse=True))
+
+
+def _position(node: TreeNode) -> int:
+    return int(node.id.rsplit(".", 1)[-1])
+
+
+class ResearchTree:
+    """Run-wide research tree shared by all branches.
+
+    Each learning and URL is stored once and referenced by id from the node that found it,
+    so a branch's view of what its ancestors learned is a walk up the parent pointers rather
+    than a copy of every ancestor's lists.
+    """
+
+    def __init__(self):
+        self.root = TreeNode("0", None)
+        self.nodes: Dict[str, TreeNode] = {"0": self.root}
+        self.learning_texts: List[str] = []
+        self.url_texts: List[str] = []
+        self._learning_ids: Dict[str, int] = {}
+        self._url_ids: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _intern(self, text: str, ids: Dict[str, int], texts: List[str]) -> int:
+        index = ids.get(text)
+        if index is None:
+            index = ids[text] = len(texts)
+            texts.append(text)
+        return index
+
+    def node(self, node_id: str) -> TreeNode:
+        """Returns the node, creating it and any missing ancestors."""
+        node = self.nodes.get(node_id)
+        if node is None:
+            parent = self.node(node_id.rsplit(".", 1)[0]) if "." in node_id else self.root
+            node = self.nodes[node_id] = TreeNode(node_id, parent)
+            parent.children.append(node)
+        return node
+
+    def record(self, node_id: str, query: str, learnings: Iterable[str], urls: Iterable[str]) -> TreeNode:
+        """Stores what a researched node found."""
+        node = self.node(node_id)
+        node.query = query
+        node.learnings = tuple(dict.fromkeys(
+            self._intern(text, self._learning_ids, self.learning_texts) for text in learnings
+        ))
+        node.urls = tuple(dict.fromkeys(
+            self._intern(url, self._url_ids, self.url_texts) for url in urls
+        ))
+        return node
+
+    def path_learnings(self, node_id: str) -> List[str]:
+        """Learnings of the node and all its ancestors, root first."""
+        node = self.nodes.get(node_id)
+        if node is None:
+            return []
+        path = list(node.ancestors())[::-1]
+        return [self.learning_texts[i] for i in dict.fromkeys(i for n in path for i in n.learnings)]
+
+    def subtree(self, node_id: str) -> Tuple[List[str], List[str]]:
+        """Learnings and URLs found at the node or anywhere below it, in tree order."""
+        node = self.nodes.get(node_id)
+        if node is None:
+            return [], []
+        learning_ids: Dict[int, None] = {}
+        url_ids: Dict[int, None] = {}
+        for descendant in node.walk():
+            learning_ids.update(dict.fromkeys(descendant.learnings))
+            url_ids.update(dict.fromkeys(descendant.urls))
+        return [self.learning_texts[i] for i in learning_ids], [self.url_texts[i] for i in url_ids]
+
+    def context(self, node_ids: Iterable[str], budget: int = QUERY_CONTEXT_TOKEN_BUDGET) -> List[str]:
+        """Learnings of the nodes' ancestor paths that fit in `budget` tokens, nearest first kept.
+
+        The nodes' own learnings come first, then their parents', and so on up to the root, so
+        a tight budget drops what was learned furthest up the tree. Several nodes (siblings
+        planned in one batch) share the budget and their common ancestors. Returned root first.
+        """
+        level = [self.nodes[node_id] for node_id in dict.fromkeys(node_ids) if node_id in self.nodes]
+        seen_nodes: Set[str] = set()
+        seen: Set[int] = set()
+        # Learning ids per visited node, nearest nodes first
+        groups: List[List[int]] = []
+        used = 0
+        while level:
+            parents = []
+            for node in level:
+                if node.id in seen_nodes:
+                    continue
+                seen_nodes.add(node.id)
+                group: List[int] = []
+                groups.append(group)
+                for index in node.learnings:
+                    if index in seen:
+                        continue
+                    tokens = count_tokens(self.learning_texts[index])
+                    if used + tokens > budget:
+                        return self._texts(groups)
+                    seen.add(index)
+                    group.append(index)
+                    used += tokens
+                if node.parent is not None:
+                    parents.append(node.parent)
+            level = parents
+        return self._texts(groups)
+
+    def _texts(self, groups: List[List[int]]) -> List[str]:
+        return [self.learning_texts[index] for group in reversed(groups) for index in group]
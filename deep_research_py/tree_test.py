@@ -0,0 +1,55 @@
+from .tree import ResearchTree
+
+
+def _tree() -> ResearchTree:
+    """0 -> 0.0 -> 0.0.0 and 0.0.1, 0 -> 0.1; shared learnings and URLs are stored once."""
+    tree = ResearchTree()
+    tree.record("0.0", "solar", ["root fact", "solar fact"], ["https://a", "https://b"])
+    tree.record("0.0.1", "solar costs", ["cost fact", "solar fact"], ["https://b", "https://c"])
+    tree.record("0.0.0", "solar jobs", ["jobs fact"], ["https://d"])
+    tree.record("0.1", "wind", ["wind fact", "root fact"], ["https://a"])
+    return tree
+
+
+def test_learnings_and_urls_are_interned():
+    tree = _tree()
+    assert tree.learning_texts == ["root fact", "solar fact", "cost fact", "jobs fact", "wind fact"]
+    assert tree.url_texts == ["https://a", "https://b", "https://c", "https://d"]
+    assert tree.nodes["0.1"].learnings == (4, 0)
+    assert len(tree) == 5
+
+
+def test_subtree_is_in_tree_order_without_repeats():
+    tree = _tree()
+    assert tree.subtree("0") == (
+        ["root fact", "solar fact", "jobs fact", "cost fact", "wind fact"],
+        ["https://a", "https://b", "https://d", "https://c"],
+    )
+    assert tree.subtree("0.0.1") == (["cost fact", "solar fact"], ["https://b", "https://c"])
+    assert tree.subtree("0.7") == ([], [])
+
+
+def test_path_learnings_run_from_the_root_down():
+    tree = _tree()
+    assert tree.path_learnings("0.0.1") == ["root fact", "solar fact", "cost fact"]
+    assert tree.path_learnings("0.9") == []
+
+
+def test_context_fits_the_budget_and_drops_the_furthest_ancestors(fake_runtime):
+    tree = _tree()
+    # One token per byte; root first, then each node's learnings in the order it found them
+    assert tree.context(["0.0.1"], budget=1000) == ["root fact", "cost fact", "solar fact"]
+    assert tree.context(["0.0.1"], budget=len("cost fact") + len("solar fact")) == ["cost fact", "solar fact"]
+    assert tree.context(["0.0.1"], budget=len("cost fact") + 1) == ["cost fact"]
+    assert tree.context(["0.0.1"], budget=0) == []
+
+
+def test_siblings_share_the_budget_and_their_ancestors(fake_runtime):
+    tree = _tree()
+    context = tree.context(["0.0.0", "0.0.1", "0.0.1"], budget=1000)
+    assert sorted(context) == ["cost fact", "jobs fact", "root fact", "solar fact"]
+    assert context[0] == "root fact"
+
+    budget = len("jobs fact") + len("cost fact")
+    assert sorted(tree.context(["0.0.0", "0.0.1"], budget=budget)) == ["cost fact", "jobs fact"]
+    assert tree.context(["0.5", "0.0.0"], budget=1000)[-1] == "jobs fact"